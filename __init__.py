@@ -3,11 +3,30 @@ A handy way of representing filesystems
 and arbitrary things as filesystems
 """
 from .errors import *
+from .instrumentation import *
+from .progress import *
+from .predicates import *
+from .snapshot import *
+from .inotify import *
+from .dispatcher import *
+from .blockCache import *
+from .readAhead import *
+from .textStream import *
 from .pollingItem import *
 from .ezFsItem import *
 from .ezFsFile import *
 from .ezFsDirectory import *
+from .ezFsMount import *
 from .ezFsFilesystem import *
 from .ezFsFilebasedFilesystem import *
+from .hashing import *
+from .duplicates import *
+from .sync import *
+from .compression import *
+from .handles import *
 from ._ezFs import *
+from .memoryFs import *
+from .diskCache import *
+from .processes import *
+from .catalog import *
 from .utils import *
\ No newline at end of file
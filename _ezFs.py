@@ -4,7 +4,9 @@
 A system for common access to any given filesystem from python
 """
 import typing
-from paths import UrlCompatible,asUrl,URL
+import threading
+from concurrent.futures import ThreadPoolExecutor,Future,wait,FIRST_COMPLETED
+from paths import UrlCompatible,asUrl
 import ezFs
 
 
@@ -24,24 +26,41 @@ class EzFs(ezFs.EzFsFilesystem):
     FILEBASED_FILESYSTEMS:typing.Optional[typing.List[
         typing.Type[ezFs.BaseFilebasedFs]]]=None
 
+    # guards finding the plugins, the first time an EzFs is created
+    _discoveryLock=threading.Lock()
+
     def __init__(self,url:typing.Optional[UrlCompatible]=None):
         # must instanciate shared class variables first thing
-        if self.FILESYSTEMS is None:
+        if EzFs.FILESYSTEMS is None:
+            self._discover()
+        # base constructor
+        ezFs.EzFsFilesystem.__init__(self,url)
+        # any local values to init
+
+    @classmethod
+    def _discover(cls)->None:
+        """
+        find the filesystem plugins (once, no matter how many threads
+        get here at the same time)
+        """
+        with cls._discoveryLock:
+            if EzFs.FILESYSTEMS is not None:
+                return
             from ezFs.plugins import PluginManager
-            self._plugins=PluginManager[typing.Type[ezFs.EzFsFilesystem]]('ezFs')
-            classes:typing.List[typing.Tuple[str,typing.Type[ezFs.EzFsFilesystem]]]=[]
-            for plugin in self._plugins:
+            plugins=PluginManager[typing.Type[ezFs.EzFsFilesystem]]('ezFs')
+            classes:typing.List[typing.Tuple[str,typing.Type[ezFs.EzFsFilesystem]]]=[] # noqa: E501 # pylint: disable=line-too-long
+            for plugin in plugins:
                 classes.append((str(plugin.name),plugin))
-            self.FILESYSTEMS=[]
-            self.FILEBASED_FILESYSTEMS=[]
+            filesystems:typing.List[typing.Type[ezFs.EzFsFilesystem]]=[]
+            filebasedFilesystems:typing.List[typing.Type[ezFs.BaseFilebasedFs]]=[] # noqa: E501 # pylint: disable=line-too-long
             for _,clazz in classes:
                 if issubclass(clazz,ezFs.BaseFilebasedFs):
-                    self.FILEBASED_FILESYSTEMS.append(clazz)
+                    filebasedFilesystems.append(clazz)
                 else:
-                    self.FILESYSTEMS.append(clazz)
-        # base constructor
-        ezFs.EzFsFilesystem.__init__(self,url)
-        # any local values to init
+                    filesystems.append(clazz)
+            # (FILESYSTEMS last, since other threads only check that one)
+            EzFs.FILEBASED_FILESYSTEMS=filebasedFilesystems
+            EzFs.FILESYSTEMS=filesystems
 
     def getUrlSupport(self,
         url:UrlCompatible
@@ -60,20 +79,35 @@ class EzFs(ezFs.EzFsFilesystem):
         """
         get a single item from the filesystem
         """
+        mounted=self.getMounted(url)
+        if mounted is not None:
+            return mounted
         url=asUrl(url)
         fs=self.getUrlSupport(url)
         return fs().get(url)
 
     def open(self,
         path:UrlCompatible,
-        accessMode:typing.Optional[str]=None
-        )->ezFs.EzFsFile:
+        accessMode:typing.Optional[str]=None,
+        compression:typing.Optional[str]=None
+        )->typing.Union[ezFs.EzFsFile,typing.IO]:
         """
         open any url, anywhere
+
+        :param compression: 'gzip', 'xz', 'bz2', or 'infer' to go by
+            the file extension (see compression.py)
         """
+        mounted=self.getMounted(path)
+        if mounted is not None:
+            if not isinstance(mounted,ezFs.EzFsFile):
+                raise ezFs.FileAccessException(path)
+            if compression is not None or mounted.filesystem.THREAD_SAFE:
+                return ezFs.openCompressed(mounted,accessMode or 'r',
+                    compression)
+            return mounted.open(accessMode)
         urlObj=asUrl(path)
         fs=self.getUrlSupport(urlObj)
-        return fs().open(urlObj,accessMode)
+        return fs().open(urlObj,accessMode,compression)
 
     def getFsForCompressed(self,
         path:typing.Union[str,typing.IO]
@@ -103,12 +137,16 @@ class EzFs(ezFs.EzFsFilesystem):
                     return fbfs(self,fname) # type: ignore
         return None
 
-    def addWatch(self,watchFn:ezFs.WatcherFn,pollingInterval:float=30):
+    def addWatch(self,
+        watchFn:ezFs.WatcherFn,
+        pollingInterval:float=30,
+        withEvents:bool=False,
+        debounce:typing.Optional[float]=None):
         """
         add a change watcher to this item
         """
         if self.cwd is not None:
-            self.cwd.addWatch(watchFn,pollingInterval)
+            self.cwd.addWatch(watchFn,pollingInterval,withEvents,debounce)
 
     def removeWatch(self,watchFn:ezFs.WatcherFn):
         """
@@ -117,25 +155,233 @@ class EzFs(ezFs.EzFsFilesystem):
         if self.cwd is not None:
             self.cwd.removeWatch(watchFn)
 
+    def get(self, # type: ignore
+        path:UrlCompatible,
+        idx:int=0
+        )->ezFs.EzFsItem:
+        """
+        get any url, anywhere
+
+        (relative paths are relative to the working directory)
+        """
+        if not isinstance(path,list) and '://' in str(path):
+            return self._getFsItem(path)
+        return ezFs.EzFsFilesystem.get(self,path,idx)
+
     def copy(self, # pylint: disable=arguments-renamed # type: ignore
         fromPath:UrlCompatible,
-        toPath:UrlCompatible
+        toPath:UrlCompatible,
+        jobs:int=1,
+        progress:typing.Optional[ezFs.Progress]=None
         )->None:
         """
-        Copy a file
+        Copy a file or directory
+
+        Can be on the same filesystem or across filesystems.
+
+        :param jobs: how many files to copy at the same time
+        :param progress: keeps track of how much has been copied
+        """
+        source=self.get(fromPath)
+        directory,name=self._destination(toPath)
+        if jobs<=1:
+            self._copyInto(source,directory,name,progress)
+            return
+        with ThreadPoolExecutor(jobs) as pool:
+            pending:typing.List[Future]=[]
+            self._copyInto(source,directory,name,progress,pool,pending)
+            for future in pending:
+                future.result()
+
+    def sync(self,
+        fromPath:UrlCompatible,
+        toPath:UrlCompatible,
+        checksum:bool=False,
+        delete:bool=False,
+        jobs:int=1,
+        progress:typing.Optional[ezFs.Progress]=None,
+        dryRun:bool=False
+        )->ezFs.SyncResult:
+        """
+        Mirror a directory onto another one, only transferring what
+        has changed (see sync.py)
+
+        Can be on the same filesystem or across filesystems.
+
+        :param checksum: also compare the contents of files that
+            look the same
+        :param delete: delete things in the destination that are not
+            in the source
+        :param jobs: how many files to transfer at the same time
+        :param progress: keeps track of how much has been transferred
+        :param dryRun: only work out what would be done
         """
-        source=self.filesystem.get(fromPath)
-        self.filesystem._copy(source,toPath) # pylint: disable=protected-access
+        source=self.get(fromPath)
+        destination=self.get(toPath)
+        if isinstance(destination,ezFs.EzFsMountPoint):
+            destination=destination.target
+        if not destination.exists and not dryRun:
+            directory,name=self._destination(toPath)
+            directory.mkdir(name,errorIfExists=False)
+            destination=directory.get(name)
+        if not isinstance(destination,ezFs.EzFsDirectory):
+            raise NotADirectoryError(str(destination.url))
+        return ezFs.syncTrees(source,destination,checksum,delete,jobs,
+            progress,dryRun)
 
     def move(self, # pylint: disable=arguments-renamed # type: ignore
         fromPath:UrlCompatible,
         toPath:UrlCompatible
         )->None:
         """
-        Move a file
+        Move a file or directory
+
+        Can be on the same filesystem or across filesystems.
+        """
+        self._move(self.get(fromPath),toPath)
+
+    def _destination(self,
+        toPath:UrlCompatible
+        )->typing.Tuple[ezFs.EzFsDirectory,str]:
+        """
+        find the (directory,name) that a path refers to
+        """
+        url=self._absoluteUrl(toPath)
+        if url.parent is None:
+            raise FileNotFoundError(str(url))
+        directory=self.get(url.parent)
+        if isinstance(directory,ezFs.EzFsMountPoint):
+            directory=directory.target
+        if not isinstance(directory,ezFs.EzFsDirectory):
+            raise FileNotFoundError(str(url.parent))
+        return directory,url.filename
+
+    def _copyInto(self,
+        fsItem:ezFs.EzFsItem,
+        directory:ezFs.EzFsDirectory,
+        name:str,
+        progress:typing.Optional[ezFs.Progress]=None,
+        pool:typing.Optional[ThreadPoolExecutor]=None,
+        pending:typing.Optional[typing.List[Future]]=None
+        )->None:
+        """
+        copy an item into a directory on any filesystem
+
+        :param pool: if given, files are copied on this pool
+            (and their futures appended to pending)
+        """
+        fs=fsItem.filesystem
+        if directory.filesystem is fs:
+            fs._copy(fsItem,ezFs.childUrl(directory.url,name)) # pylint: disable=protected-access
+            if progress is not None:
+                progress.add(1,fsItem.size or 0)
+        elif isinstance(fsItem,ezFs.EzFsDirectory):
+            # need to do a recursive copy
+            directory.mkdir(name,errorIfExists=False)
+            newDirectory=directory.get(name)
+            if isinstance(newDirectory,ezFs.EzFsMountPoint):
+                newDirectory=newDirectory.target
+            if not isinstance(newDirectory,ezFs.EzFsDirectory):
+                raise FileExistsError(str(newDirectory.url))
+            for child in fsItem.children:
+                self._copyInto(child,newDirectory,child.name,
+                    progress,pool,pending)
+        elif pool is not None and pending is not None:
+            pending.append(pool.submit(self._copyInto,
+                fsItem,directory,name,progress))
+        else:
+            # (a chunk at a time, rather than the whole file in memory)
+            ezFs.sync._copyFile(fsItem,directory,name,progress) # pylint: disable=protected-access
+            if progress is not None:
+                progress.add(1)
+
+    def diskUsage(self,
+        path:typing.Optional[UrlCompatible]=None,
+        jobs:int=1,
+        progress:typing.Optional[ezFs.Progress]=None
+        )->typing.Tuple[int,int]:
+        """
+        Add up how much space everything under a directory takes
+
+        :param jobs: how many directories to list at the same time
+        :param progress: keeps track of how much has been counted
+        :return: (number of items,total bytes)
+        """
+        if progress is None:
+            progress=ezFs.Progress(interval=0)
+        start=self.cwd if path is None else self.get(path)
+        if not isinstance(start,ezFs.EzFsDirectory):
+            progress.add(1,start.size or 0)
+            return progress.items,progress.numBytes
+        def listDirectory(directory:ezFs.EzFsDirectory
+            )->typing.List[ezFs.EzFsDirectory]:
+            subdirectories=[]
+            for item in directory.children:
+                if isinstance(item,ezFs.EzFsDirectory):
+                    subdirectories.append(item)
+                    progress.add(1)
+                else:
+                    progress.add(1,item.size or 0)
+            return subdirectories
+        if jobs<=1:
+            todo=[start]
+            while todo:
+                todo.extend(listDirectory(todo.pop()))
+        else:
+            with ThreadPoolExecutor(jobs) as pool:
+                running={pool.submit(listDirectory,start)}
+                while running:
+                    done,running=wait(running,return_when=FIRST_COMPLETED)
+                    for future in done:
+                        for directory in future.result():
+                            running.add(pool.submit(listDirectory,directory)) # noqa: E501 # pylint: disable=line-too-long
+        return progress.items,progress.numBytes
+
+    def findDuplicates(self,
+        urls:typing.Optional[typing.Iterable[UrlCompatible]]=None,
+        minSize:int=1,
+        algorithm:str='sha256',
+        cache:typing.Optional[ezFs.HashCache]=None,
+        jobs:int=8,
+        progress:typing.Optional[ezFs.Progress]=None
+        )->typing.Generator[typing.List[ezFs.EzFsItem],None,None]:
         """
-        source=self.filesystem.get(fromPath)
-        self.filesystem._move(source,toPath) # pylint: disable=protected-access
+        Find files with the same contents, anywhere under the given
+        urls (which can be on different filesystems)
+
+        :param urls: where to look (default=the working directory)
+        :param minSize: ignore files smaller than this
+        :param cache: a HashCache to keep the full hashes in
+        :param jobs: how many things to list/hash at the same time
+        :param progress: keeps track of how much has been hashed
+        :return: groups of identical files, as each one is confirmed
+        """
+        roots=[self.cwd] if urls is None else [self.get(url) for url in urls]
+        return ezFs.findDuplicates(roots,minSize,algorithm,cache,jobs,
+            progress)
+
+    def _copy(self,
+        fsItem:ezFs.EzFsItem,
+        newLocation:UrlCompatible)->None:
+        """
+        copy an item to anywhere
+        """
+        directory,name=self._destination(newLocation)
+        self._copyInto(fsItem,directory,name)
+
+    def _move(self,
+        fsItem:ezFs.EzFsItem,
+        newLocation:UrlCompatible)->None:
+        """
+        move an item to anywhere
+        """
+        directory,name=self._destination(newLocation)
+        fs=fsItem.filesystem
+        if directory.filesystem is fs:
+            fs._move(fsItem,ezFs.childUrl(directory.url,name)) # pylint: disable=protected-access
+        else:
+            self._copyInto(fsItem,directory,name)
+            fs._delete(fsItem) # pylint: disable=protected-access
 
     def _delete(self,fsItem:ezFs.EzFsItem)->None:
         """ """
@@ -150,27 +396,18 @@ class EzFs(ezFs.EzFsFilesystem):
             fsItem=self.filesystem.get(fsItem)
         fsItem.filesystem._rename(fsItem,newName) # noqa: E501 # pylint: disable=line-too-long,protected-access
 
-    def mount(self,
-        location:UrlCompatible,
-        otherFs:typing.Optional[ezFs.EzFsFilesystem]=None
-        )->URL:
-        r"""
-        mount this directory to a location on another filesystem
-
-        :param location: path where to mount
-        :param otherFs: filesystem to mount to (this is a virtual mounting
-            for ease of logical use only and does not physically mount the file)
-            .
-            If None, it WILL mount to the local filesystem and it WILL
-            be accessible to the rest of the system
-            .
-            Thus mount('/mnt/mything',None) IS NOT the same thing as
-            mount('/mnt/mything',OsFs())
-
-        TODO: implement this.  See also:
-            C:\Users\kurt\AppData\Local\Programs\Python\Python37\Lib\site-packages\fs-0.5.5a1-py3.7.egg\fs\mountfs.py
-        """ # noqa: E501 # pylint: disable=line-too-long
-        raise NotImplementedError()
+
+def _printItems(items:typing.Iterable[ezFs.EzFsItem],found:str='')->int:
+    """
+    print items as they come in, with a running count
+
+    :return: how many there were
+    """
+    count=0
+    for count,item in enumerate(items,1):
+        print('%8d  %s'%(count,item))
+    print('%d item(s)%s'%(count,found))
+    return count
 
 
 def cmdline(args:typing.Iterable[str])->int:
@@ -180,61 +417,143 @@ def cmdline(args:typing.Iterable[str])->int:
     :param args: command line arguments (WITHOUT the filename)
     """
     printhelp=False
+    args=list(args)
     if not args:
         printhelp=True
     else:
         import os
-        fs=EzFs(os.curdir)
+        # options that affect everything else
+        stats:typing.Optional[ezFs.SnapshotMetricsSink]=None
+        profiler=None
+        profileFile:typing.Optional[str]=None
+        jobs=1
+        catalogFile:typing.Optional[str]=None
         for arg in args:
-            if arg.startswith('-'):
-                av=arg.split('=',1)
-                av[0]=av[0].strip()
-                if av[0] in ['-h','--help']:
-                    printhelp=True
-                elif av[0]=='--tree':
-                    fs.printTree()
-                elif av[0] in ['--cd','--chadir']:
-                    if len(av)>1:
-                        fs.cd(av[1])
-                    print('\n$ cd %s'%fs.workingDirectory)
-                elif av[0] in ['--dir','--ls']:
-                    if len(av)>1:
-                        print('\n$ ls %s/%s'%(fs.cwd,av[1]))
-                        items=[x for x in fs.ls(av[1])]
-                    else:
-                        print('\n$ ls %s'%fs.cwd)
-                        items=[x for x in fs.ls()]
-                    print('%d item(s):'%len(items))
-                    for item in items:
-                        print('   %s'%item)
-                elif av[0] in ['--flat']:
-                    if len(av)>1:
-                        print('\n$ flat %s/%s'%(fs.cwd,av[1]))
-                        items=[x for x in fs.getAll(av[1])]
+            av=arg.split('=',1)
+            av[0]=av[0].strip()
+            if av[0]=='--stats':
+                stats=ezFs.SnapshotMetricsSink()
+            elif av[0]=='--profile':
+                import cProfile
+                profileFile=av[1] if len(av)>1 else 'ezFs.prof'
+                profiler=cProfile.Profile()
+            elif av[0]=='--jobs' and len(av)>1:
+                jobs=max(1,int(av[1]))
+            elif av[0]=='--catalog' and len(av)>1:
+                catalogFile=av[1]
+        # (from here on, whatever happens, the stats and profile are
+        # still written out at the end)
+        if stats is not None:
+            ezFs.addMetricsSink(stats)
+        if profiler is not None:
+            profiler.enable()
+        catalog:typing.Optional[ezFs.Catalog]=None
+        try:
+            fs=EzFs(os.curdir)
+            if catalogFile is not None:
+                # answer --find and --regex from the catalog
+                catalog=ezFs.Catalog(fs.workingDirectory,catalogFile)
+                progress=ezFs.Progress('catalogued')
+                relisted=catalog.refresh(progress)
+                print('catalog %s: %d item(s), %d director(ies) re-listed'%(
+                    catalogFile,len(catalog),relisted))
+            for arg in args:
+                if arg.startswith('-'):
+                    av=arg.split('=',1)
+                    av[0]=av[0].strip()
+                    if av[0] in ['-h','--help']:
+                        printhelp=True
+                    elif av[0] in ['--stats','--profile','--jobs','--catalog']:
+                        pass # already taken care of
+                    elif av[0]=='--tree':
+                        fs.printTree()
+                    elif av[0] in ['--cd','--chadir']:
+                        if len(av)>1:
+                            fs.cd(av[1])
+                        print('\n$ cd %s'%fs.workingDirectory)
+                    elif av[0] in ['--dir','--ls']:
+                        if len(av)>1:
+                            print('\n$ ls %s/%s'%(fs.cwd,av[1]))
+                            _printItems(fs.ls(av[1]))
+                        else:
+                            print('\n$ ls %s'%fs.cwd)
+                            _printItems(fs.ls())
+                    elif av[0] in ['--flat']:
+                        if len(av)>1:
+                            print('\n$ flat %s/%s'%(fs.cwd,av[1]))
+                            _printItems(fs.getAll(av[1]))
+                        else:
+                            print('\n$ flat %s'%fs.cwd)
+                            _printItems(fs.getAll())
+                    elif av[0] in ['--find']:
+                        if len(av)>1:
+                            print('\n$ find %s'%av[1])
+                            if catalog is not None:
+                                _printItems(catalog.glob(av[1]),' found')
+                            else:
+                                _printItems(fs.find(av[1]),' found')
+                    elif av[0] in ['--regex']:
+                        if len(av)>1:
+                            print('\n$ regex %s'%fs.workingDirectory)
+                            if catalog is not None:
+                                _printItems(catalog.regexFind(av[1]),' found')
+                            else:
+                                _printItems(fs.regexFind(av[1]),' found')
+                    elif av[0] in ['--du']:
+                        path=av[1] if len(av)>1 else None
+                        print('\n$ du %s'%(fs.cwd if path is None else path))
+                        progress=ezFs.Progress('counted')
+                        fs.diskUsage(path,jobs,progress)
+                        progress.report(True)
+                    elif av[0] in ['--dupes']:
+                        urls=av[1].split(',') if len(av)>1 else None
+                        print('\n$ dupes %s'%(
+                            fs.cwd if urls is None else av[1]))
+                        progress=ezFs.Progress('hashed')
+                        groups=0
+                        for group in fs.findDuplicates(urls,jobs=jobs,
+                            progress=progress):
+                            groups+=1
+                            print('\r%d bytes x %d'%(group[0].size or 0,len(group))) # noqa: E501 # pylint: disable=line-too-long
+                            for item in group:
+                                print('    %s'%item)
+                        progress.report(True)
+                        print('%d group(s) of duplicates'%groups)
+                    elif av[0] in ['--sync']:
+                        paths=av[1].split(',') if len(av)>1 else []
+                        if len(paths)!=2:
+                            print('ERR: expected --sync=src,dst')
+                            printhelp=True
+                            continue
+                        print('\n$ sync %s %s'%(paths[0],paths[1]))
+                        progress=ezFs.Progress('synced')
+                        print(fs.sync(paths[0],paths[1],jobs=jobs,progress=progress)) # noqa: E501 # pylint: disable=line-too-long
+                        progress.report(True)
+                    elif av[0] in ['--copy','--cp']:
+                        paths=av[1].split(',') if len(av)>1 else []
+                        if len(paths)!=2:
+                            print('ERR: expected --copy=src,dst')
+                            printhelp=True
+                            continue
+                        print('\n$ copy %s %s'%(paths[0],paths[1]))
+                        progress=ezFs.Progress('copied')
+                        fs.copy(paths[0],paths[1],jobs,progress)
+                        progress.report(True)
                     else:
-                        print('\n$ flat%s'%fs.cwd)
-                        items=[x for x in fs.getAll()]
-                    print('%d item(s):'%len(items))
-                    for item in items:
-                        print('   %s'%(item))
-                elif av[0] in ['--find']:
-                    if len(av)>1:
-                        print('\n$ find %s'%av[1])
-                        items=list(fs.find(av[1]))
-                        print('%d item(s) found:'%len(items))
-                        for item in items:
-                            print('   %s'%item)
-                elif av[0] in ['--regex']:
-                    if len(av)>1:
-                        print('\n$ regex %s'%fs.workingDirectory)
-                        items=[item for item in fs.regexFind(av[1])]
-                        print('%d item(s) found:'%len(items))
-                        for item in items:
-                            print('   %s'%item)
+                        print('ERR: unknown argument "'+av[0]+'"')
                 else:
-                    print('ERR: unknown argument "'+av[0]+'"')
-            else:
-                print('ERR: unknown argument "'+arg+'"')
+                    print('ERR: unknown argument "'+arg+'"')
+        finally:
+            if catalog is not None:
+                catalog.close()
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(profileFile)
+                print('\nProfile saved to %s'%profileFile)
+            if stats is not None:
+                ezFs.removeMetricsSink(stats)
+                print('\nStatistics:')
+                stats.printStats()
     if printhelp:
         print('Usage:')
         print('  _ezFs.py [options]')
@@ -243,9 +562,18 @@ def cmdline(args:typing.Iterable[str])->int:
         print('   --chadir=path ...... change directory')
         print('   --dir[=path] ....... list directory')
         print('   --ls[=path] ........ list directory')
+        print('   --flat[=path] ...... list everything under a directory')
         print('   --tree ............. print file tree')
         print('   --regex[=path] ..... find files by regex')
         print('   --find[=path] ...... find files by glob')
+        print('   --du[=path] ........ add up how much space is used')
+        print('   --dupes[=url,...] .. find duplicate files (across filesystems)') # noqa: E501 # pylint: disable=line-too-long
+        print('   --copy=src,dst ..... copy a file or directory')
+        print('   --sync=src,dst ..... mirror a directory, only copying changes') # noqa: E501 # pylint: disable=line-too-long
+        print('   --catalog=file.db .. answer --find/--regex from a catalog (built or refreshed first)') # noqa: E501 # pylint: disable=line-too-long
+        print('   --jobs=n ........... how many things to do at once')
+        print('   --stats ............ print per-operation statistics at the end') # noqa: E501 # pylint: disable=line-too-long
+        print('   --profile[=file] ... save a cProfile of the run')
         return -1
     return 0
 
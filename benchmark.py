@@ -0,0 +1,482 @@
+#!/usr/bin/env
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for the core hot paths
+
+Everything runs against an in-process fake backend (latency://)
+that can add per-call latency and limit bandwidth, so the numbers
+are reproducible without a real network.
+
+Results can be saved as json and compared against a stored
+baseline to flag regressions.
+"""
+import typing
+import time
+import json
+import platform
+import statistics
+import ezFs
+from ezFs.latencyFs import EzFsLatencyFilesystem
+from ezFs.plugins import PluginManager
+
+
+BenchmarkFn=typing.Callable[[],typing.Any]
+BenchmarkResults=typing.Dict[str,typing.Any]
+
+
+class BenchmarkCase:
+    """
+    A single thing to time
+    """
+
+    def __init__(self,
+        name:str,
+        fn:BenchmarkFn,
+        setup:typing.Optional[BenchmarkFn]=None):
+        """
+        :param name: name of the benchmark (used to compare runs)
+        :param fn: the thing to time
+        :param setup: called (untimed) before every run of fn
+        """
+        self.name=name
+        self.fn=fn
+        self.setup=setup
+
+    def run(self,repeat:int=5)->typing.Dict[str,float]:
+        """
+        time the benchmark
+
+        :return: timing statistics in seconds
+        """
+        times:typing.List[float]=[]
+        for _ in range(repeat):
+            if self.setup is not None:
+                self.setup()
+            start=time.perf_counter()
+            self.fn()
+            times.append(time.perf_counter()-start)
+        return {
+            'median':statistics.median(times),
+            'mean':statistics.mean(times),
+            'min':min(times),
+            'max':max(times),
+            'runs':len(times)}
+
+
+class BenchmarkSuite:
+    """
+    All of the benchmarks for the core hot paths
+    """
+
+    def __init__(self,
+        latency:float=0.0,
+        bandwidth:typing.Optional[float]=None,
+        scales:typing.Optional[typing.List[typing.Tuple[int,int]]]=None,
+        fileSize:int=256*1024,
+        repeat:int=5):
+        """
+        :param latency: seconds of latency per backend call
+        :param bandwidth: bytes per second (None=unlimited)
+        :param scales: list of (depth,width) trees to test lookups on
+        :param fileSize: size of the file used for read/copy tests
+        :param repeat: how many times to run each benchmark
+        """
+        self.latency=latency
+        self.bandwidth=bandwidth
+        if scales is None:
+            scales=[(2,10),(4,10),(4,100)]
+        self.scales=scales
+        self.fileSize=fileSize
+        self.repeat=repeat
+
+    def makeFs(self)->EzFsLatencyFilesystem:
+        """
+        create a fresh, empty fake filesystem
+        """
+        return EzFsLatencyFilesystem(
+            latency=self.latency,bandwidth=self.bandwidth)
+
+    def buildSpine(self,
+        fs:EzFsLatencyFilesystem,
+        depth:int,
+        width:int
+        )->str:
+        """
+        build a tree that is `depth` directories deep with `width`
+        items in each directory
+
+        :return: path of the deepest file
+        """
+        latency=fs.latency
+        fs.latency=0.0 # building is not what we are timing
+        path=''
+        for level in range(depth):
+            directory=fs.get(path or '/')
+            for i in range(width-1):
+                fs.get(f'{path}/file{i}.txt').write(f'{level} {i}\n')
+            directory.mkdir(f'dir{level}')
+            path=f'{path}/dir{level}'
+        fs.get(f'{path}/leaf.txt').write('leaf\n')
+        fs.latency=latency
+        return f'{path}/leaf.txt'
+
+    def buildTree(self,
+        fs:EzFsLatencyFilesystem,
+        depth:int=3,
+        width:int=10,
+        branching:int=3
+        )->None:
+        """
+        build a bushy tree with `branching` subdirectories
+        and `width` files in every directory
+        """
+        latency=fs.latency
+        fs.latency=0.0
+        todo=[('',0)]
+        while todo:
+            path,level=todo.pop()
+            for i in range(width):
+                fs.get(f'{path}/file{i}.txt').write(f'{path} {i}\n')
+            if level<depth:
+                directory=fs.get(path or '/')
+                for i in range(branching):
+                    directory.mkdir(f'dir{i}')
+                    todo.append((f'{path}/dir{i}',level+1))
+        fs.latency=latency
+
+    def cases(self,
+        only:typing.Optional[str]=None
+        )->typing.Generator[BenchmarkCase,None,None]:
+        """
+        generate the benchmarks
+
+        :param only: only benchmarks whose name contains this
+            (the fixtures for the others are not even built)
+        """
+        def wanted(*names:str)->bool:
+            return only is None or any(only in name for name in names)
+        # lookups at various scales
+        for depth,width in self.scales:
+            if not wanted(f'get[depth={depth},width={width}]'):
+                continue
+            fs=self.makeFs()
+            leaf=self.buildSpine(fs,depth,width)
+            yield BenchmarkCase(f'get[depth={depth},width={width}]',
+                lambda fs=fs,leaf=leaf:fs.get(leaf))
+        # searching and traversal
+        algos=('TREE','NEAREST','DEAPTH-FIRST')
+        if wanted('glob','regexFind','getAll','find[where]',
+            'find[where, tree walk]',*(f'walk[{algo}]' for algo in algos)):
+            yield from self._searchCases(algos)
+        # big directories
+        if wanted('list[10000 items]','len[10000 items]'):
+            fs=self.makeFs()
+            self.buildTree(fs,0,10000,0)
+            big=fs.get('/')
+            yield BenchmarkCase('list[10000 items]',
+                lambda:sum(1 for _ in big.children))
+            yield BenchmarkCase('len[10000 items]',
+                lambda:len(big))
+        data=b'0123456789abcde\n'*(self.fileSize//16)
+        # reading and writing
+        if wanted('read[whole]','read[64k chunks]','readline',
+            'read[random 4k]','append[1000 lines]'):
+            yield from self._readWriteCases(data)
+        # copying
+        if wanted('copy[same filesystem]','copy[cross filesystem]'):
+            yield from self._copyCases(data)
+        # mirroring
+        if wanted('sync[no changes]','sync[big file changed]'):
+            yield from self._syncCases()
+        # plugin startup
+        if wanted('plugin startup'):
+            def pluginStartup()->None:
+                PluginManager('ezFs').reload()
+                ezFs.EzFs()
+            yield BenchmarkCase('plugin startup',pluginStartup)
+        # watch polling
+        if wanted('watch polling'):
+            yield from self._pollCases()
+        # tree snapshots
+        if wanted('snapshot[full]','snapshot[one change]'):
+            yield from self._snapshotCases()
+
+    def _searchCases(self,
+        algos:typing.Iterable[str]
+        )->typing.Generator[BenchmarkCase,None,None]:
+        """
+        searching and traversal benchmarks
+        """
+        fs=self.makeFs()
+        self.buildTree(fs)
+        yield BenchmarkCase('glob',
+            lambda:list(fs.glob('dir*/dir1/*.txt')))
+        yield BenchmarkCase('regexFind',
+            lambda:list(fs.regexFind(r'dir\d')))
+        yield BenchmarkCase('getAll',
+            lambda:list(fs.getAll()))
+        where=ezFs.NameMatches('file1*')&ezFs.SizeBetween(1)
+        yield BenchmarkCase('find[where]',
+            lambda:list(fs.find(where=where)))
+        yield BenchmarkCase('find[where, tree walk]',
+            lambda:list(ezFs.EzFsDirectory.find(fs.get('/'),where=where)))
+        for algo in algos:
+            yield BenchmarkCase(f'walk[{algo}]',
+                lambda algo=algo:fs.walk(lambda item,context:None,None,algo))
+
+    def _readWriteCases(self,
+        data:bytes
+        )->typing.Generator[BenchmarkCase,None,None]:
+        """
+        reading and writing benchmarks
+        """
+        fs=self.makeFs()
+        fs.get('/big.bin').write(data)
+        fs.get('/lines.txt').write(b'a line of text\n'*200)
+        yield BenchmarkCase('read[whole]',
+            lambda:fs.get('/big.bin').read())
+        def readChunks()->None:
+            with fs.open('/big.bin','r') as f:
+                while f.read(64*1024):
+                    pass
+        yield BenchmarkCase('read[64k chunks]',readChunks)
+        def readLines()->None:
+            with fs.open('/lines.txt','r') as f:
+                while f.readline():
+                    pass
+        yield BenchmarkCase('readline',readLines)
+        offsets=[(i*7919*997)%max(1,len(data)-4096) for i in range(200)]
+        def readRandom()->None:
+            ezFs.BlockCache.shared().clear()
+            with fs.open('/big.bin','r') as f:
+                for offset in offsets:
+                    f.seek(offset)
+                    f.read(4096)
+        yield BenchmarkCase('read[random 4k]',readRandom)
+        # writing
+        def appendLines()->None:
+            with fs.open('/log.txt','a') as f:
+                for i in range(1000):
+                    f.append(f'log line {i}\n')
+        yield BenchmarkCase('append[1000 lines]',appendLines,
+            lambda:fs.get('/log.txt').write(b''))
+
+    def _copyCases(self,
+        data:bytes
+        )->typing.Generator[BenchmarkCase,None,None]:
+        """
+        copying benchmarks
+        """
+        src=self.makeFs()
+        dst=self.makeFs()
+        src.get('/src.bin').write(data)
+        top=ezFs.EzFs()
+        top.addMount('latency:///src',src)
+        top.addMount('latency:///dst',dst)
+        def cleanup()->None:
+            for fs,name in ((src,'/copy.bin'),(dst,'/copy.bin')):
+                item=fs.get(name)
+                if item.exists:
+                    item.delete()
+        yield BenchmarkCase('copy[same filesystem]',
+            lambda:top.copy('latency:///src/src.bin','latency:///src/copy.bin'), # noqa: E501 # pylint: disable=line-too-long
+            cleanup)
+        yield BenchmarkCase('copy[cross filesystem]',
+            lambda:top.copy('latency:///src/src.bin','latency:///dst/copy.bin'), # noqa: E501 # pylint: disable=line-too-long
+            cleanup)
+
+    def _syncCases(self)->typing.Generator[BenchmarkCase,None,None]:
+        """
+        mirroring benchmarks
+        """
+        src=self.makeFs()
+        dst=self.makeFs()
+        self.buildTree(src)
+        bigData=bytes(range(256))*max(1,(4<<20)//256)
+        src.get('/big.bin').write(bigData)
+        ezFs.syncTrees(src.get('/'),dst.get('/'))
+        yield BenchmarkCase('sync[no changes]',
+            lambda:ezFs.syncTrees(src.get('/'),dst.get('/')))
+        def changeBigFile()->None:
+            time.sleep(0.001) # (so the mtime moves on)
+            src.get('/big.bin').write(bigData[:1000]+b'changed'+bigData[1007:]) # noqa: E501 # pylint: disable=line-too-long
+        yield BenchmarkCase('sync[big file changed]',
+            lambda:ezFs.syncTrees(src.get('/'),dst.get('/')),
+            changeBigFile)
+
+    def _pollCases(self)->typing.Generator[BenchmarkCase,None,None]:
+        """
+        watch polling benchmarks
+        """
+        fs=self.makeFs()
+        self.buildTree(fs,1,10,2)
+        watched=[fs.get(f'/file{i}.txt') for i in range(10)]
+        for item in watched:
+            item.addWatch(lambda item:None,0)
+        def poll()->None:
+            for _ in range(10):
+                for item in watched:
+                    item._test_poll() # pylint: disable=protected-access
+        yield BenchmarkCase('watch polling',poll)
+
+    def _snapshotCases(self)->typing.Generator[BenchmarkCase,None,None]:
+        """
+        tree snapshot benchmarks
+        """
+        fs=self.makeFs()
+        self.buildTree(fs)
+        root=fs.get('/')
+        snapshot=ezFs.takeSnapshot(root)
+        yield BenchmarkCase('snapshot[full]',
+            lambda:ezFs.takeSnapshot(root))
+        def snapshotOneChange()->None:
+            fs.get('/dir1/dir2/file0.txt').write('changed')
+            ezFs.compareSnapshots(snapshot,ezFs.takeSnapshot(root,snapshot))
+        yield BenchmarkCase('snapshot[one change]',snapshotOneChange)
+
+    def run(self,
+        only:typing.Optional[str]=None,
+        verbose:bool=True
+        )->BenchmarkResults:
+        """
+        run all of the benchmarks
+
+        :param only: only run benchmarks whose name contains this
+        :return: results that can be saved as json
+        """
+        results:typing.Dict[str,typing.Dict[str,float]]={}
+        for case in self.cases(only):
+            if only is not None and only not in case.name:
+                continue
+            results[case.name]=case.run(self.repeat)
+            if verbose:
+                print('%-32s %10.3f ms'%(
+                    case.name,results[case.name]['median']*1000))
+        return {
+            'meta':{
+                'python':platform.python_version(),
+                'platform':platform.platform(),
+                'time':time.time(),
+                'latency':self.latency,
+                'bandwidth':self.bandwidth,
+                'fileSize':self.fileSize,
+                'repeat':self.repeat},
+            'results':results}
+
+
+def saveResults(results:BenchmarkResults,filename:str)->None:
+    """
+    save benchmark results as json
+    """
+    with open(filename,'w',encoding='utf-8') as f:
+        json.dump(results,f,indent=2)
+
+
+def loadResults(filename:str)->BenchmarkResults:
+    """
+    load benchmark results from json
+    """
+    with open(filename,'r',encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare(baseline:BenchmarkResults,
+    current:BenchmarkResults,
+    threshold:float=0.1,
+    verbose:bool=True
+    )->typing.List[str]:
+    """
+    compare two sets of benchmark results
+
+    :param threshold: how much slower (as a fraction) counts as a regression
+    :return: names of all benchmarks that regressed
+    """
+    regressions:typing.List[str]=[]
+    for name,now in current['results'].items():
+        before=baseline['results'].get(name)
+        if before is None or not before['median']:
+            continue
+        ratio=now['median']/before['median']
+        regressed=ratio>1.0+threshold
+        if regressed:
+            regressions.append(name)
+        if verbose:
+            print('%-32s %10.3f ms -> %10.3f ms  %6.2fx%s'%(
+                name,before['median']*1000,now['median']*1000,ratio,
+                '  REGRESSION' if regressed else ''))
+    return regressions
+
+
+def cmdline(args:typing.Iterable[str])->int:
+    """
+    Run the command line
+
+    :param args: command line arguments (WITHOUT the filename)
+    """
+    printhelp=False
+    suite=BenchmarkSuite()
+    only:typing.Optional[str]=None
+    saveTo:typing.Optional[str]=None
+    baseline:typing.Optional[str]=None
+    threshold=0.1
+    for arg in args:
+        if arg.startswith('-'):
+            av=arg.split('=',1)
+            av[0]=av[0].strip()
+            if av[0] in ['-h','--help']:
+                printhelp=True
+            elif av[0]=='--latency' and len(av)>1:
+                suite.latency=float(av[1])
+            elif av[0]=='--bandwidth' and len(av)>1:
+                suite.bandwidth=float(av[1])
+            elif av[0]=='--scales' and len(av)>1:
+                suite.scales=[typing.cast(typing.Tuple[int,int],
+                    tuple(int(x) for x in scale.split('x')))
+                    for scale in av[1].split(',')]
+            elif av[0]=='--size' and len(av)>1:
+                suite.fileSize=int(av[1])
+            elif av[0]=='--repeat' and len(av)>1:
+                suite.repeat=int(av[1])
+            elif av[0]=='--only' and len(av)>1:
+                only=av[1]
+            elif av[0]=='--save' and len(av)>1:
+                saveTo=av[1]
+            elif av[0]=='--compare' and len(av)>1:
+                baseline=av[1]
+            elif av[0]=='--threshold' and len(av)>1:
+                threshold=float(av[1])
+            else:
+                print('ERR: unknown argument "'+av[0]+'"')
+                printhelp=True
+        else:
+            print('ERR: unknown argument "'+arg+'"')
+            printhelp=True
+    if printhelp:
+        print('Usage:')
+        print('  benchmark.py [options]')
+        print('Options:')
+        print('   --latency=s ........ seconds of latency per backend call')
+        print('   --bandwidth=b ...... bytes per second (default=unlimited)')
+        print('   --scales=DxW,... ... depth x width of trees for get()')
+        print('   --size=bytes ....... size of file for read/copy tests')
+        print('   --repeat=n ......... how many times to run each one')
+        print('   --only=name ........ only run benchmarks containing name')
+        print('   --save=file.json ... save results')
+        print('   --compare=file.json  compare against a saved baseline')
+        print('   --threshold=f ...... fraction slower that is a regression')
+        return -1
+    results=suite.run(only)
+    if saveTo is not None:
+        saveResults(results,saveTo)
+    if baseline is not None:
+        print('\nCompared to %s:'%baseline)
+        regressions=compare(loadResults(baseline),results,threshold)
+        if regressions:
+            print('%d regression(s)'%len(regressions))
+            return 1
+    return 0
+
+
+if __name__=='__main__':
+    import sys
+    sys.exit(cmdline(sys.argv[1:]))
@@ -0,0 +1,253 @@
+#!/usr/bin/env
+# -*- coding: utf-8 -*-
+"""
+A shared in-memory cache of file blocks, for random-access reads
+
+Reading a few bytes here and there from a remote file (a parquet
+footer, a zip central directory, sqlite pages) would otherwise be a
+round trip every time.  Instead, reads are rounded out to aligned
+fixed-size blocks, runs of missing blocks are fetched with a single
+ranged read, and the blocks are kept in one LRU shared by every file
+and limited to a total number of bytes.
+
+Files are told apart by filesystem and url, since two filesystems can
+use the same url for different files (eg two mem:// volumes), and a
+filesystem's blocks are thrown away when it goes away.
+
+A file's blocks are thrown away when it is written to, and when its
+validator (size, mtime and etag) changes.  Validators are looked up
+at most every VALIDATE_SECONDS, so that cached reads do not turn into
+a round trip just to check the validator.
+"""
+import typing
+import time
+import threading
+import weakref
+from collections import OrderedDict
+import ezFs
+
+
+# (size,mtime,etag)
+Validator=typing.Tuple[typing.Optional[int],typing.Optional[float],typing.Optional[str]] # noqa: E501 # pylint: disable=line-too-long
+
+# (id(filesystem),url)
+FileKey=typing.Tuple[int,str]
+
+
+class _CachedFile:
+    """
+    What the cache knows about one file
+    """
+    __slots__=('validator','checked','blocks')
+
+    def __init__(self,validator:Validator,checked:float):
+        """ """
+        self.validator=validator
+        self.checked=checked
+        self.blocks:typing.Set[int]=set()
+
+
+class BlockCache:
+    """
+    An LRU of fixed-size file blocks, shared by all files
+
+    Use BlockCache.shared() rather than creating your own.
+    """
+
+    # how often to look up whether a cached file has changed
+    VALIDATE_SECONDS:float=1.0
+
+    _shared:typing.Optional["BlockCache"]=None
+    _sharedLock=threading.Lock()
+
+    @classmethod
+    def shared(cls)->"BlockCache":
+        """
+        the cache for this process
+        """
+        with cls._sharedLock:
+            if cls._shared is None:
+                cls._shared=cls()
+            return cls._shared
+
+    def __init__(self,
+        maxBytes:int=64<<20,
+        blockSize:int=64<<10):
+        """
+        :param maxBytes: most bytes to keep (0=do not cache at all)
+        :param blockSize: size of each block
+        """
+        self.maxBytes=maxBytes
+        self.blockSize=blockSize
+        self.usedBytes=0
+        self.hits=0
+        self.misses=0
+        self.fetches=0
+        self._blocks:typing.Dict[typing.Tuple[FileKey,int],bytes]=OrderedDict() # (file key,block number):data # noqa: E501 # pylint: disable=line-too-long
+        self._files:typing.Dict[FileKey,_CachedFile]={}
+        self._filesystems:typing.Set[int]=set() # id(filesystem)
+        self._goneFilesystems:typing.List[int]=[] # (appended to by the gc)
+        self._lock=threading.RLock()
+
+    def __len__(self)->int:
+        """
+        number of blocks in the cache
+        """
+        return len(self._blocks)
+
+    def clear(self)->None:
+        """
+        empty the cache
+        """
+        with self._lock:
+            self._blocks.clear()
+            self._files.clear()
+            self.usedBytes=0
+            self._forgetGoneFilesystems()
+
+    def _key(self,item:"ezFs.EzFsItem")->FileKey:
+        """
+        what a file is cached under
+
+        (the caller holds the lock)
+        """
+        self._forgetGoneFilesystems()
+        filesystem=item.filesystem
+        filesystemId=id(filesystem)
+        if filesystemId not in self._filesystems:
+            self._filesystems.add(filesystemId)
+            # (the id could be reused by a new filesystem once this one
+            # is gone, so its blocks must be gone by then too)
+            weakref.finalize(filesystem,
+                self._goneFilesystems.append,filesystemId)
+        return filesystemId,item._urlKey # pylint: disable=protected-access
+
+    def _forgetGoneFilesystems(self)->None:
+        """
+        throw away everything cached for filesystems that no longer exist
+
+        (the caller holds the lock)
+        """
+        while self._goneFilesystems:
+            filesystemId=self._goneFilesystems.pop()
+            self._filesystems.discard(filesystemId)
+            for key in [key for key in self._files if key[0]==filesystemId]:
+                self.invalidate(key)
+
+    def invalidate(self,item:typing.Union["ezFs.EzFsItem",FileKey])->None:
+        """
+        throw away everything cached for a file
+        """
+        with self._lock:
+            key=item if isinstance(item,tuple) else self._key(item)
+            cached=self._files.pop(key,None)
+            if cached is None:
+                return
+            for number in cached.blocks:
+                data=self._blocks.pop((key,number),None)
+                if data is not None:
+                    self.usedBytes-=len(data)
+
+    def _check(self,item:"ezFs.EzFsFile",key:FileKey)->_CachedFile:
+        """
+        get what we know about a file, throwing away its blocks if
+        it has changed since they were cached
+
+        (the caller holds the lock)
+        """
+        now=time.monotonic()
+        cached=self._files.get(key)
+        if cached is not None and now-cached.checked<self.VALIDATE_SECONDS:
+            return cached
+        validator=item._validator() # pylint: disable=protected-access
+        if cached is not None:
+            if cached.validator==validator:
+                cached.checked=now
+                return cached
+            self.invalidate(key)
+        cached=_CachedFile(validator,now)
+        self._files[key]=cached
+        return cached
+
+    def read(self,
+        item:"ezFs.EzFsFile",
+        offset:int,
+        numBytes:int
+        )->bytes:
+        """
+        read part of a file through the cache
+
+        :param item: a file that supports ranged reads
+        """
+        if numBytes<=0:
+            return b''
+        if numBytes>self.maxBytes//4:
+            # too big to be worth caching (and would push out everything)
+            return item._readRange(offset,numBytes) # pylint: disable=protected-access
+        blockSize=self.blockSize
+        with self._lock:
+            key=self._key(item)
+            cached=self._check(item,key)
+            size=cached.validator[0]
+            end=offset+numBytes
+            if size is not None:
+                end=min(end,size)
+            if end<=offset:
+                return b''
+            first=offset//blockSize
+            last=(end-1)//blockSize
+            found:typing.Dict[int,bytes]={}
+            missing:typing.List[int]=[]
+            for number in range(first,last+1):
+                data=self._blocks.get((key,number))
+                if data is None:
+                    missing.append(number)
+                else:
+                    self._blocks.move_to_end((key,number)) # type: ignore
+                    found[number]=data
+            self.hits+=len(found)
+            self.misses+=len(missing)
+        # fetch each run of missing blocks with one request
+        i=0
+        while i<len(missing):
+            j=i
+            while j+1<len(missing) and missing[j+1]==missing[j]+1:
+                j+=1
+            runStart=missing[i]*blockSize
+            data=item._readRange(runStart,(missing[j]-missing[i]+1)*blockSize) # noqa: E501 # pylint: disable=line-too-long,protected-access
+            self.fetches+=1
+            for number in missing[i:j+1]:
+                start=(number-missing[i])*blockSize
+                found[number]=data[start:start+blockSize]
+            self._store(key,cached,missing[i:j+1],found)
+            i=j+1
+        ret=b''.join(found[number] for number in range(first,last+1))
+        start=offset-first*blockSize
+        return ret[start:start+end-offset]
+
+    def _store(self,
+        key:FileKey,
+        cached:_CachedFile,
+        numbers:typing.List[int],
+        found:typing.Dict[int,bytes]
+        )->None:
+        """
+        add newly fetched blocks, pushing out the least recently used
+        """
+        with self._lock:
+            if self._files.get(key) is not cached:
+                return # (invalidated while we were fetching)
+            for number in numbers:
+                data=found[number]
+                old=self._blocks.pop((key,number),None)
+                if old is not None:
+                    self.usedBytes-=len(old)
+                self._blocks[(key,number)]=data
+                cached.blocks.add(number)
+                self.usedBytes+=len(data)
+            while self.usedBytes>self.maxBytes and self._blocks:
+                (oldKey,number),data=self._blocks.popitem(last=False) # type: ignore # noqa: E501 # pylint: disable=line-too-long
+                self.usedBytes-=len(data)
+                oldFile=self._files.get(oldKey)
+                if oldFile is not None:
+                    oldFile.blocks.discard(number)
@@ -0,0 +1,665 @@
+#!/usr/bin/env
+# -*- coding: utf-8 -*-
+"""
+A local SQLite catalog of a directory tree
+
+Searching a big remote tree means listing every directory, every time.
+A catalog takes a snapshot of the tree (path, type, size, mtime and
+optionally a content hash) so glob, regexFind and predicate queries
+can be answered from indexes instead.
+
+It can be kept fresh by refresh(), which only re-lists directories
+whose mtime has changed, or by watch(), which re-lists a directory
+whenever its watcher fires.
+
+Usage:
+    catalog=ezFs.Catalog(fs.get('/archive'),'archive.db')
+    catalog.scan()
+    for entry in catalog.find(where=ezFs.SizeBetween(1<<30)):
+        print(entry.url,entry.size)
+"""
+import typing
+import re
+import bisect
+import collections
+import fnmatch
+import sqlite3
+import threading
+import time
+import ezFs
+
+
+_SCHEMA=(
+    '''CREATE TABLE IF NOT EXISTS items(
+        path TEXT PRIMARY KEY,
+        parent TEXT NOT NULL,
+        name TEXT NOT NULL,
+        isDir INTEGER NOT NULL,
+        size INTEGER,
+        mtime REAL,
+        hash TEXT,
+        depth INTEGER NOT NULL)''',
+    'CREATE INDEX IF NOT EXISTS itemsParent ON items(parent)',
+    'CREATE INDEX IF NOT EXISTS itemsName ON items(name)',
+    'CREATE INDEX IF NOT EXISTS itemsSize ON items(size)',
+    'CREATE INDEX IF NOT EXISTS itemsMtime ON items(mtime)',
+    'CREATE INDEX IF NOT EXISTS itemsDepth ON items(depth)',
+    '''CREATE TABLE IF NOT EXISTS meta(
+        key TEXT PRIMARY KEY,
+        value TEXT)''')
+
+_COLUMNS='path,name,isDir,size,mtime,hash,depth'
+
+# how many rows to insert at a time while scanning
+_BATCH_SIZE=1000
+
+# the first glob wildcard in a string
+_GLOB_WILDCARD=re.compile(r'[*?[]')
+
+Row=typing.Tuple[str,str,str,int,typing.Optional[int],
+    typing.Optional[float],typing.Optional[str],int]
+SqlWhere=typing.Tuple[str,typing.List[typing.Any],bool] # (sql,params,exact)
+
+
+class CatalogEntry:
+    """
+    A single item in the catalog
+
+    It has the same name, isDir, size and mtime as an EzFsItem,
+    so predicates can be checked against it.  Use .item to get
+    the real thing.
+    """
+    __slots__=('catalog','path','name','isDir','size','mtime','hash','depth')
+
+    def __init__(self,
+        catalog:"Catalog",
+        path:str,
+        name:str,
+        isDir:bool,
+        size:typing.Optional[int],
+        mtime:typing.Optional[float],
+        hash:typing.Optional[str], # pylint: disable=redefined-builtin
+        depth:int):
+        """ """
+        self.catalog=catalog
+        self.path=path
+        self.name=name
+        self.isDir=bool(isDir)
+        self.size=size
+        self.mtime=mtime
+        self.hash=hash
+        self.depth=depth
+
+    @property
+    def url(self)->str:
+        """
+        full url of the item
+        """
+        return self.catalog.urlFor(self.path,self.isDir)
+
+    @property
+    def item(self)->"ezFs.EzFsItem":
+        """
+        look up the live item (this may be a round trip)
+        """
+        if not self.path:
+            return self.catalog.root
+        return self.catalog.root.get(self.path.split('/'))
+
+    def __str__(self)->str:
+        return self.url
+
+    def __repr__(self)->str:
+        return f'CatalogEntry({self.url!r})'
+
+
+class Catalog:
+    """
+    A local SQLite catalog of a directory tree
+    """
+
+    def __init__(self,
+        root:"ezFs.EzFsDirectory",
+        dbFile:str=':memory:'):
+        """
+        :param root: the directory to catalog
+        :param dbFile: where to keep the database
+        """
+        self.root=root
+        self.dbFile=dbFile
+        self._rootUrl=ezFs.childUrl(str(root.url),'')
+        self._lock=threading.RLock()
+        self._db=sqlite3.connect(dbFile,check_same_thread=False)
+        self._db.create_function('REGEXP',2,_regexp,deterministic=True)
+        with self._db:
+            for sql in _SCHEMA:
+                self._db.execute(sql)
+        self._watching:typing.List[typing.Tuple[ezFs.EzFsItem,ezFs.WatcherFn]]=[] # noqa: E501 # pylint: disable=line-too-long
+        self.hashAlgorithm:typing.Optional[str]=self._getMeta('hashAlgorithm')
+
+    def close(self)->None:
+        """
+        stop watching and close the database
+        """
+        self.unwatch()
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self)->"Catalog":
+        return self
+
+    def __exit__(self,*args)->None:
+        self.close()
+
+    def __len__(self)->int:
+        """
+        number of items in the catalog (not counting the root)
+        """
+        with self._lock:
+            return self._db.execute(
+                'SELECT COUNT(*) FROM items WHERE depth>0').fetchone()[0]
+
+    def _getMeta(self,key:str)->typing.Optional[str]:
+        """
+        get a value from the meta table
+        """
+        with self._lock:
+            row=self._db.execute(
+                'SELECT value FROM meta WHERE key=?',(key,)).fetchone()
+        return None if row is None else row[0]
+
+    def _setMeta(self,key:str,value:typing.Optional[str])->None:
+        """
+        set a value in the meta table
+        """
+        with self._lock,self._db:
+            self._db.execute('INSERT OR REPLACE INTO meta VALUES (?,?)',
+                (key,value))
+
+    @property
+    def lastScan(self)->typing.Optional[float]:
+        """
+        when the catalog was last scanned or refreshed
+        """
+        value=self._getMeta('lastScan')
+        return None if value is None else float(value)
+
+    def urlFor(self,path:str,isDir:bool=False)->str:
+        """
+        get the full url of a catalog path
+        """
+        if not path:
+            return self._rootUrl
+        return self._rootUrl+path+('/' if isDir else '')
+
+    def pathFor(self,item:"ezFs.EzFsItem")->str:
+        """
+        get the catalog path of an item
+
+        :raises ValueError: if the item is not under the root
+        """
+        url=str(item.url)
+        if not url.startswith(self._rootUrl):
+            if url+'/'==self._rootUrl:
+                return ''
+            raise ValueError(f'{url} is not under {self._rootUrl}')
+        return url[len(self._rootUrl):].rstrip('/')
+
+    # ---- building
+
+    def scan(self,
+        hashAlgorithm:typing.Optional[str]=None,
+        progress:typing.Optional["ezFs.Progress"]=None
+        )->int:
+        """
+        (re)build the whole catalog from the live filesystem
+
+        :param hashAlgorithm: also hash the contents of every file
+            with this hashlib algorithm (eg 'sha256')
+        :param progress: report progress here
+        :return: number of items catalogued
+        """
+        self.hashAlgorithm=hashAlgorithm
+        with self._lock,self._db:
+            self._db.execute('DELETE FROM items')
+            self._db.execute('INSERT INTO items VALUES (?,?,?,?,?,?,?,?)',
+                self._row('','',self.root,0))
+            count=self._scanFrom('',self.root,1,progress)
+        self._setMeta('hashAlgorithm',hashAlgorithm)
+        self._setMeta('lastScan',str(time.time()))
+        return count
+
+    def _row(self,
+        path:str,
+        parent:str,
+        item:"ezFs.EzFsItem",
+        depth:int
+        )->Row:
+        """
+        create a database row for an item
+        """
+        isDir=isinstance(item,ezFs.EzFsDirectory)
+        digest:typing.Optional[str]=None
+        if not isDir and self.hashAlgorithm is not None:
+            digest=_hashContents(item,self.hashAlgorithm)
+        return (path,parent,item.name,int(isDir),
+            None if isDir else item.size,item.mtime,digest,depth)
+
+    def _scanFrom(self,
+        path:str,
+        directory:"ezFs.EzFsDirectory",
+        depth:int,
+        progress:typing.Optional["ezFs.Progress"]=None
+        )->int:
+        """
+        add everything under a directory (breadth-first)
+
+        (the caller holds the lock and the transaction)
+
+        :param depth: depth of the directory's children
+        :return: number of items added
+        """
+        count=0
+        batch:typing.List[Row]=[]
+        todo=collections.deque([(path,directory,depth)])
+        while todo:
+            path,directory,depth=todo.popleft()
+            prefix=path+'/' if path else ''
+            for child in directory.children:
+                childPath=prefix+child.name
+                batch.append(self._row(childPath,path,child,depth))
+                if isinstance(child,ezFs.EzFsDirectory):
+                    todo.append((childPath,child,depth+1))
+            if len(batch)>=_BATCH_SIZE or not todo:
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO items VALUES (?,?,?,?,?,?,?,?)',
+                    batch)
+                count+=len(batch)
+                if progress is not None:
+                    progress.add(len(batch))
+                batch=[]
+        return count
+
+    def _deleteTree(self,path:str)->None:
+        """
+        remove an item and everything under it
+
+        (the caller holds the lock and the transaction)
+        """
+        self._db.execute(
+            'DELETE FROM items WHERE path=? OR (path>=? AND path<?)',
+            (path,path+'/',path+'0')) # ('0' sorts right after '/')
+
+    def refresh(self,
+        progress:typing.Optional["ezFs.Progress"]=None
+        )->int:
+        """
+        bring the catalog up to date by re-listing only the directories
+        whose mtime has changed
+
+        NOTE: on most filesystems a directory's mtime only changes when
+        things are added, removed or renamed, so files changed in place
+        are only noticed when their directory is re-listed for some
+        other reason (or by watch())
+
+        :return: number of directories that were re-listed
+        """
+        if self.lastScan is None:
+            self.scan(self.hashAlgorithm,progress)
+            return 1
+        with self._lock:
+            directories=self._db.execute(
+                'SELECT path,mtime,depth FROM items WHERE isDir=1 ORDER BY path' # noqa: E501 # pylint: disable=line-too-long
+                ).fetchall()
+        relisted=0
+        for path,mtime,depth in directories:
+            with self._lock:
+                if path and self._db.execute(
+                    'SELECT 1 FROM items WHERE path=?',(path,)).fetchone() is None: # noqa: E501 # pylint: disable=line-too-long
+                    continue # removed while re-listing its parent
+            directory=self.root if not path else self._live(path)
+            if directory is None:
+                with self._lock,self._db:
+                    self._deleteTree(path)
+                continue
+            if mtime is not None and directory.mtime==mtime:
+                continue
+            self._relist(path,directory,depth+1,progress)
+            relisted+=1
+        self._setMeta('lastScan',str(time.time()))
+        return relisted
+
+    def _live(self,path:str)->typing.Optional["ezFs.EzFsDirectory"]:
+        """
+        get a live directory, or None if it is not there any more
+        """
+        try:
+            directory=self.root.get(path.split('/'))
+        except FileNotFoundError:
+            return None
+        if not isinstance(directory,ezFs.EzFsDirectory) \
+            or not directory.exists:
+            return None
+        return directory
+
+    def refreshDirectory(self,
+        directory:typing.Union[str,"ezFs.EzFsDirectory"]
+        )->None:
+        """
+        re-list a single directory
+
+        :param directory: a directory, or its catalog path
+        """
+        if isinstance(directory,str):
+            path=directory
+            live=self.root if not path else self._live(path)
+        else:
+            path=self.pathFor(directory)
+            live=directory if directory.exists else None
+        if live is None:
+            with self._lock,self._db:
+                self._deleteTree(path)
+            return
+        depth=0 if not path else path.count('/')+1
+        self._relist(path,live,depth+1)
+
+    def _relist(self,
+        path:str,
+        directory:"ezFs.EzFsDirectory",
+        depth:int,
+        progress:typing.Optional["ezFs.Progress"]=None
+        )->None:
+        """
+        compare a live directory listing with the catalog and fix
+        whatever is different
+        """
+        live={child.name:child for child in directory.children}
+        prefix=path+'/' if path else ''
+        with self._lock,self._db:
+            stored={name:(isDir,size,mtime) for name,isDir,size,mtime
+                in self._db.execute(
+                    'SELECT name,isDir,size,mtime FROM items WHERE parent=? AND depth=?', # noqa: E501 # pylint: disable=line-too-long
+                    (path,depth))}
+            for name in stored.keys()-live.keys():
+                self._deleteTree(prefix+name)
+            for name,child in live.items():
+                isDir=isinstance(child,ezFs.EzFsDirectory)
+                old=stored.get(name)
+                if old is not None and old[0]==int(isDir):
+                    if isDir or (old[1]==child.size and old[2]==child.mtime):
+                        continue # (changed directories are found by mtime)
+                childPath=prefix+name
+                if old is not None:
+                    self._deleteTree(childPath)
+                self._db.execute(
+                    'INSERT OR REPLACE INTO items VALUES (?,?,?,?,?,?,?,?)',
+                    self._row(childPath,path,child,depth))
+                if progress is not None:
+                    progress.add()
+                if isDir:
+                    self._scanFrom(childPath,
+                        typing.cast(ezFs.EzFsDirectory,child),depth+1,progress) # noqa: E501 # pylint: disable=line-too-long
+            # remember the new mtime so we don't do this again
+            self._db.execute('UPDATE items SET mtime=? WHERE path=?',
+                (directory.mtime,path))
+
+    def watch(self,pollingInterval:float=30)->None:
+        """
+        keep the catalog fresh by watching every directory in it
+
+        (a directory is re-listed whenever its watcher fires)
+        """
+        self.unwatch()
+        with self._lock:
+            paths=[row[0] for row in self._db.execute(
+                'SELECT path FROM items WHERE isDir=1')]
+        def onChange(item:typing.Any)->None:
+            self.refreshDirectory(item)
+        for path in paths:
+            directory=self.root if not path else self._live(path)
+            if directory is None:
+                continue
+            directory.addWatch(onChange,pollingInterval)
+            self._watching.append((directory,onChange))
+
+    def unwatch(self)->None:
+        """
+        stop watching
+        """
+        for directory,onChange in self._watching:
+            directory.removeWatch(onChange)
+        self._watching=[]
+
+    # ---- queries
+
+    def _select(self,
+        where:str,
+        params:typing.Sequence[typing.Any]
+        )->typing.Generator[CatalogEntry,None,None]:
+        """
+        run a query and generate entries in path order
+        """
+        with self._lock:
+            rows=self._db.execute(
+                f'SELECT {_COLUMNS} FROM items WHERE depth>0 AND ({where}) ORDER BY path', # noqa: E501 # pylint: disable=line-too-long
+                tuple(params)).fetchall()
+        for row in rows:
+            yield CatalogEntry(self,*row)
+
+    def glob(self,
+        expression:str,
+        ignoreCase:bool=False
+        )->typing.Generator[CatalogEntry,None,None]:
+        """
+        find everything matching a glob expression (relative to the root)
+
+        works just like EzFsDirectory.glob()
+        """
+        segments=[segment for segment in expression.split('/')
+            if segment and segment!='.']
+        if not segments:
+            return
+        flags=re.IGNORECASE if ignoreCase else 0
+        regexes=[re.compile(fnmatch.translate(segment),flags)
+            for segment in segments]
+        sql='depth=?'
+        params:typing.List[typing.Any]=[len(segments)]
+        pattern='/'.join(segments)
+        if not ignoreCase:
+            sql+=' AND path GLOB ?'
+            params.append(_sqliteGlob(pattern))
+            prefix=_GLOB_WILDCARD.split(pattern,1)[0]
+            if prefix:
+                # lets sqlite use the primary key index
+                sql+=' AND path>=? AND path<?'
+                params.extend((prefix,prefix+'\U0010ffff'))
+        for entry in self._select(sql,params):
+            # sqlite's * also matches '/', so check each segment
+            names=entry.path.split('/')
+            if all(regex.match(name) for regex,name in zip(regexes,names)):
+                yield entry
+
+    def regexFind(self,
+        expression:typing.Union[str,typing.Pattern],
+        ignoreCase:bool=False
+        )->typing.Generator[CatalogEntry,None,None]:
+        """
+        find everything, at any depth, whose name matches a
+        regular expression
+        """
+        if isinstance(expression,str):
+            expression=re.compile(expression,re.IGNORECASE if ignoreCase else 0) # noqa: E501 # pylint: disable=line-too-long
+        sql='name REGEXP ?'
+        params:typing.List[typing.Any]=[expression.pattern]
+        if expression.flags&re.IGNORECASE:
+            params=['(?i)'+expression.pattern]
+        else:
+            prefix=ezFs.ezFsDirectory._regexPrefix(expression.pattern) # pylint: disable=protected-access
+            if prefix:
+                sql+=' AND name>=? AND name<?'
+                params.extend((prefix,prefix+'\U0010ffff'))
+        yield from self._select(sql,params)
+
+    def find(self,
+        expression:typing.Optional[str]=None,
+        ignoreCase:bool=False,
+        where:typing.Union["ezFs.Predicate",typing.Callable[[typing.Any],bool],None]=None, # noqa: E501 # pylint: disable=line-too-long
+        prune:typing.Optional["ezFs.Predicate"]=None
+        )->typing.Generator[CatalogEntry,None,None]:
+        """
+        find entries by glob expression, by predicate, or both
+
+        works just like EzFsDirectory.find(), except that as much of
+        the predicate as possible is answered by the database
+        """
+        predicate=ezFs.asPredicate(where)
+        if expression is not None:
+            for entry in self.glob(expression,ignoreCase):
+                if predicate is None or predicate.matches(entry,entry.depth): # type: ignore # noqa: E501 # pylint: disable=line-too-long
+                    yield entry
+            return
+        sql,params,exact='1',[],True
+        if predicate is not None:
+            sql,params,exact=_predicateSql(predicate)
+        pruned:typing.List[str]=[]
+        if prune is not None:
+            pruned=self._prunedPaths(prune)
+        for entry in self._select(sql,params):
+            if pruned and _isUnder(entry.path,pruned):
+                continue
+            if exact or predicate.matches(entry,entry.depth): # type: ignore
+                yield entry
+
+    def _prunedPaths(self,prune:"ezFs.Predicate")->typing.List[str]:
+        """
+        get the paths (with trailing '/') of directories that
+        should not be gone into, sorted, without any nested ones
+        """
+        sql,params,exact=_predicateSql(prune)
+        found:typing.List[str]=[]
+        for entry in self._select(f'isDir=1 AND ({sql})',params):
+            if not exact and not prune.matches(entry,entry.depth):
+                continue
+            found.append(entry.path+'/')
+        # (sorted the way bisect sees it, which is not always the way
+        # the database does, eg 'a-b/' comes before 'a/')
+        found.sort()
+        paths:typing.List[str]=[]
+        for path in found:
+            if paths and path.startswith(paths[-1]):
+                continue # already under a pruned directory
+            paths.append(path)
+        return paths
+
+
+def _isUnder(path:str,directories:typing.List[str])->bool:
+    """
+    is the path inside of any of the (sorted, non-nested) directories?
+    """
+    i=bisect.bisect_right(directories,path)
+    return i>0 and path.startswith(directories[i-1])
+
+
+def _regexp(expression:str,value:typing.Optional[str])->bool:
+    """
+    the REGEXP function for sqlite
+    """
+    if value is None:
+        return False
+    return _compiled(expression).match(value) is not None
+
+
+_REGEX_CACHE:typing.Dict[str,typing.Pattern]={}
+
+
+def _compiled(expression:str)->typing.Pattern:
+    """
+    compile a regular expression (cached)
+    """
+    ret=_REGEX_CACHE.get(expression)
+    if ret is None:
+        ret=re.compile(expression)
+        _REGEX_CACHE[expression]=ret
+    return ret
+
+
+def _sqliteGlob(expression:str)->str:
+    """
+    convert a python glob to a sqlite GLOB ([!x] is [^x] in sqlite)
+    """
+    return expression.replace('[!','[^')
+
+
+def _predicateSql(predicate:"ezFs.Predicate")->SqlWhere:
+    """
+    translate a predicate into a sql WHERE clause
+
+    :return: (sql,params,exact) where exact is False if the
+        results still need to be checked with predicate.matches()
+    """
+    if isinstance(predicate,ezFs.NameMatches):
+        if predicate.ignoreCase:
+            return '1',[],False
+        return 'name GLOB ?',[_sqliteGlob(predicate.expression)],True
+    if isinstance(predicate,ezFs.TypeIs):
+        return 'isDir=?',[int(predicate.kind=='dir')],True
+    if isinstance(predicate,ezFs.SizeBetween):
+        return _rangeSql('size',predicate.minSize,predicate.maxSize,True)
+    if isinstance(predicate,ezFs.ModifiedBetween):
+        return _rangeSql('mtime',predicate.after,predicate.before,False)
+    if isinstance(predicate,ezFs.DepthBetween):
+        return _rangeSql('depth',predicate.minDepth,predicate.maxDepth,True)
+    if isinstance(predicate,ezFs.AllOf):
+        clauses:typing.List[str]=[]
+        params:typing.List[typing.Any]=[]
+        exact=True
+        for p in predicate.predicates:
+            sql,ps,e=_predicateSql(p)
+            clauses.append(f'({sql})')
+            params.extend(ps)
+            exact=exact and e
+        return ' AND '.join(clauses) or '1',params,exact
+    if isinstance(predicate,ezFs.AnyOf):
+        clauses=[]
+        params=[]
+        for p in predicate.predicates:
+            sql,ps,e=_predicateSql(p)
+            if not e:
+                return '1',[],False
+            clauses.append(f'({sql})')
+            params.extend(ps)
+        return ' OR '.join(clauses) or '0',params,True
+    if isinstance(predicate,ezFs.Not):
+        sql,params,exact=_predicateSql(predicate.predicate)
+        if not exact:
+            return '1',[],False
+        return f'NOT ({sql})',params,True
+    return '1',[],False
+
+
+def _rangeSql(column:str,
+    low:typing.Any,
+    high:typing.Any,
+    inclusive:bool
+    )->SqlWhere:
+    """
+    a sql range test where unknown (NULL) values never match
+    """
+    clauses=[f'{column} IS NOT NULL']
+    params:typing.List[typing.Any]=[]
+    if low is not None:
+        clauses.append(f'{column}>=?')
+        params.append(low)
+    if high is not None:
+        clauses.append(f'{column}<=?' if inclusive else f'{column}<?')
+        params.append(high)
+    return ' AND '.join(clauses),params,True
+
+
+def _hashContents(item:"ezFs.EzFsItem",algorithm:str)->typing.Optional[str]:
+    """
+    hash the contents of a file
+    """
+    if not isinstance(item,ezFs.EzFsFile):
+        return None
+    return ezFs.hashItem(item,algorithm)
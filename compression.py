@@ -0,0 +1,455 @@
+#!/usr/bin/env
+# -*- coding: utf-8 -*-
+"""
+Streaming compression and decompression of files (gzip, xz and bz2)
+
+open(url,mode,compression='infer') wraps the file in a stdlib codec,
+so that compressed logs can be read a line at a time, or written,
+without the whole thing ever being in memory.  The compressed side
+is always read and written IO_BUFFER_SIZE at a time, so remote
+filesystems see a few big requests rather than lots of little ones.
+
+gzip files can be seeked around in cheaply: every CHECKPOINT_INTERVAL
+of uncompressed data, a copy of the decompressor is kept, so seeking
+backwards starts from the nearest checkpoint rather than from the
+beginning of the file.  (No more than MAX_CHECKPOINTS are kept, by
+spacing them further apart as the file goes on.)  xz and bz2 can be
+seeked too, but backwards means starting over, just as with the
+stdlib.
+
+When writing with more than one worker, the data is cut into
+COMPRESSION_BLOCK_SIZE blocks that are compressed on every core at
+once, each as an independent gzip member (or xz/bz2 stream).  The
+result is one valid file, since all three formats allow streams to
+be concatenated, but compresses a little worse than a single stream.
+"""
+import typing
+import os
+import io
+import bisect
+import zlib
+import lzma
+import bz2
+import concurrent.futures
+import ezFs
+
+
+# how much of the compressed file to read or write at a time
+IO_BUFFER_SIZE=1<<20
+
+# how much to compress at a time when using several workers
+COMPRESSION_BLOCK_SIZE=1<<20
+
+# how often to remember where we are in a gzip file
+CHECKPOINT_INTERVAL=4<<20
+
+# most checkpoints to keep for a gzip file (past this, every other one
+# is dropped and the interval doubled, so big files do not use up all
+# memory)
+MAX_CHECKPOINTS=64
+
+COMPRESSIONS:typing.Tuple[str,...]=('gzip','xz','bz2')
+
+# file extension:compression
+COMPRESSION_EXTENSIONS:typing.Dict[str,str]={
+    '.gz':'gzip','.gzip':'gzip','.tgz':'gzip',
+    '.xz':'xz','.lzma':'xz','.txz':'xz',
+    '.bz2':'bz2','.tbz2':'bz2'}
+
+
+def inferCompression(url:"ezFs.UrlCompatible")->typing.Optional[str]:
+    """
+    guess the compression of a file from its name
+
+    :return: one of COMPRESSIONS, or None if it does not look compressed
+    """
+    name=str(url).rsplit('/',1)[-1].lower()
+    return COMPRESSION_EXTENSIONS.get(os.path.splitext(name)[1])
+
+
+def _compressor(compression:str,level:typing.Optional[int]):
+    """
+    create a streaming compressor
+    """
+    if compression=='gzip':
+        return zlib.compressobj(9 if level is None else level,zlib.DEFLATED,31) # noqa: E501 # pylint: disable=line-too-long
+    if compression=='xz':
+        return lzma.LZMACompressor(preset=level)
+    return bz2.BZ2Compressor(9 if level is None else level)
+
+
+def _compress(compression:str,
+    level:typing.Optional[int],
+    data:bytes
+    )->bytes:
+    """
+    compress a block as a complete, independent stream
+    """
+    compressor=_compressor(compression,level)
+    return compressor.compress(data)+compressor.flush()
+
+
+class _RawFile(io.RawIOBase):
+    """
+    An open EzFsFile as a python raw stream, so it can be buffered
+    """
+
+    def __init__(self,item:"ezFs.EzFsFile"):
+        """ """
+        io.RawIOBase.__init__(self)
+        self.item=item
+
+    def readable(self)->bool:
+        return True
+
+    def writable(self)->bool:
+        return True
+
+    def seekable(self)->bool:
+        return True
+
+    def readinto(self,buffer)->int:
+        data=self.item.read(len(buffer))
+        if isinstance(data,str):
+            data=data.encode('utf-8')
+        buffer[:len(data)]=data
+        return len(data)
+
+    def write(self,data)->int:
+        return self.item.write(bytes(data))
+
+    def seek(self,offset:int,whence:int=0)->int:
+        return self.item.seek(offset,whence)
+
+    def tell(self)->int:
+        return self.item.tell()
+
+    def flush(self)->None:
+        if not self.closed:
+            self.item.flush()
+
+    def close(self)->None:
+        if not self.closed:
+            io.RawIOBase.close(self)
+            self.item.close()
+
+
+class _Checkpoint(typing.NamedTuple):
+    """
+    Somewhere we can pick up decompressing a gzip file from
+    """
+    position:int # in the uncompressed data
+    rawPosition:int # in the compressed data
+    decompressor:typing.Any # (a copy, which must be copied again to use)
+    started:bool # has the decompressor seen any of its member yet?
+
+
+class GzipReader(io.RawIOBase):
+    """
+    Decompresses a (possibly multi-member) gzip file, keeping
+    checkpoints so that seeking backwards is cheap
+    """
+
+    def __init__(self,
+        raw:typing.BinaryIO,
+        checkpointInterval:int=CHECKPOINT_INTERVAL):
+        """
+        :param raw: the compressed file
+        :param checkpointInterval: how often to remember where we are
+        """
+        io.RawIOBase.__init__(self)
+        self.raw=raw
+        self.checkpointInterval=checkpointInterval
+        self._checkpoints:typing.List[_Checkpoint]=[
+            _Checkpoint(0,0,zlib.decompressobj(31),False)]
+        self._restart(self._checkpoints[0])
+
+    def _restart(self,checkpoint:_Checkpoint)->None:
+        """
+        carry on decompressing from a checkpoint
+        """
+        self.raw.seek(checkpoint.rawPosition)
+        self._rawPosition=checkpoint.rawPosition # where _input starts
+        self._input=b''
+        self._decompressor=checkpoint.decompressor.copy()
+        self._started=checkpoint.started
+        self._position=checkpoint.position
+        self._output=memoryview(b'')
+        self._eof=False
+        # (no need for checkpoints where we already have them)
+        self._nextCheckpoint=max(checkpoint.position,
+            self._checkpoints[-1].position)+self.checkpointInterval
+
+    def readable(self)->bool:
+        return True
+
+    def seekable(self)->bool:
+        return True
+
+    def tell(self)->int:
+        return self._position
+
+    def _decompressMore(self,maxBytes:int)->None:
+        """
+        decompress up to maxBytes more into self._output
+        """
+        while not self._output and not self._eof:
+            if not self._input:
+                if self._position>=self._nextCheckpoint:
+                    # all input so far has been used, so this is a
+                    # clean place to pick up from later
+                    self._checkpoints.append(_Checkpoint(self._position,
+                        self._rawPosition,self._decompressor.copy(),
+                        self._started))
+                    if len(self._checkpoints)>MAX_CHECKPOINTS:
+                        self._checkpoints=self._checkpoints[::2]
+                        self.checkpointInterval*=2
+                    self._nextCheckpoint=self._position+self.checkpointInterval # noqa: E501 # pylint: disable=line-too-long
+                # (reading no more than a checkpoint's worth at a time,
+                # so that checkpoints are not spaced further apart)
+                self._input=self.raw.read(
+                    min(IO_BUFFER_SIZE,self.checkpointInterval))
+                if not self._input:
+                    if self._started:
+                        raise EOFError('Compressed file ended before the end-of-stream marker was reached') # noqa: E501 # pylint: disable=line-too-long
+                    self._eof=True
+                    break
+            if not self._started:
+                # skip any zero padding between members
+                data=self._input.lstrip(b'\0')
+                self._rawPosition+=len(self._input)-len(data)
+                self._input=data
+                if not data:
+                    continue
+                self._started=True
+            data=self._input
+            decompressor=self._decompressor
+            output=decompressor.decompress(data,maxBytes)
+            if decompressor.eof:
+                # on to the next member
+                rest=decompressor.unused_data
+                self._decompressor=zlib.decompressobj(31)
+                self._started=False
+            else:
+                rest=decompressor.unconsumed_tail
+            self._rawPosition+=len(data)-len(rest)
+            self._input=rest
+            self._output=memoryview(output)
+
+    def readinto(self,buffer)->int:
+        if not self._output:
+            self._decompressMore(max(len(buffer),IO_BUFFER_SIZE))
+        numBytes=min(len(buffer),len(self._output))
+        buffer[:numBytes]=self._output[:numBytes]
+        self._output=self._output[numBytes:]
+        self._position+=numBytes
+        return numBytes
+
+    def seek(self,offset:int,whence:int=0)->int:
+        if whence==1:
+            offset+=self._position
+        elif whence==2:
+            while self.read(IO_BUFFER_SIZE):
+                pass
+            offset+=self._position
+        offset=max(offset,0)
+        # start again from the nearest checkpoint if we have to go
+        # backwards, or if there is one between here and there
+        i=bisect.bisect_right([c.position for c in self._checkpoints],offset)-1 # noqa: E501 # pylint: disable=line-too-long
+        checkpoint=self._checkpoints[i]
+        if offset<self._position or checkpoint.position>self._position:
+            self._restart(checkpoint)
+        while self._position<offset:
+            if not self.read(min(offset-self._position,IO_BUFFER_SIZE)):
+                break
+        return self._position
+
+    def close(self)->None:
+        if not self.closed:
+            io.RawIOBase.close(self)
+            self.raw.close()
+
+
+class _XzFile(lzma.LZMAFile):
+    """
+    An LZMAFile that closes the file underneath it too
+    """
+
+    def __init__(self,raw:typing.BinaryIO):
+        """ """
+        lzma.LZMAFile.__init__(self,raw,'rb')
+        self._raw=raw
+
+    def close(self)->None:
+        try:
+            lzma.LZMAFile.close(self)
+        finally:
+            self._raw.close()
+
+
+class _Bz2File(bz2.BZ2File):
+    """
+    A BZ2File that closes the file underneath it too
+    """
+
+    def __init__(self,raw:typing.BinaryIO):
+        """ """
+        bz2.BZ2File.__init__(self,raw,'rb')
+        self._raw=raw
+
+    def close(self)->None:
+        try:
+            bz2.BZ2File.close(self)
+        finally:
+            self._raw.close()
+
+
+class CompressingWriter(io.RawIOBase):
+    """
+    Compresses everything written to it into another file
+
+    With more than one worker, blocks are compressed in parallel as
+    independent streams.
+    """
+
+    def __init__(self,
+        raw:typing.BinaryIO,
+        compression:str='gzip',
+        level:typing.Optional[int]=None,
+        workers:int=1):
+        """
+        :param raw: where the compressed data goes
+        :param compression: one of COMPRESSIONS
+        :param level: compression level (None=the codec's default)
+        :param workers: how many blocks to compress at the same time
+        """
+        io.RawIOBase.__init__(self)
+        self.raw=raw
+        self.compression=compression
+        self.level=level
+        self.workers=workers
+        self._block:typing.List[bytes]=[]
+        self._blockBytes=0
+        self._compressor=None
+        self._pool:typing.Optional[concurrent.futures.ThreadPoolExecutor]=None
+        self._pending:typing.List[concurrent.futures.Future]=[]
+        if workers>1:
+            self._pool=concurrent.futures.ThreadPoolExecutor(workers,
+                thread_name_prefix='ezFs-compress')
+        else:
+            self._compressor=_compressor(compression,level)
+
+    def writable(self)->bool:
+        return True
+
+    def write(self,data)->int:
+        numBytes=len(data)
+        if self._compressor is not None:
+            compressed=self._compressor.compress(data)
+            if compressed:
+                self.raw.write(compressed)
+            return numBytes
+        self._block.append(bytes(data))
+        self._blockBytes+=numBytes
+        if self._blockBytes>=COMPRESSION_BLOCK_SIZE:
+            self._submitBlock()
+        return numBytes
+
+    def _submitBlock(self)->None:
+        """
+        send the current block off to be compressed
+        """
+        block=b''.join(self._block)
+        self._block=[]
+        self._blockBytes=0
+        self._pending.append(self._pool.submit( # type: ignore
+            _compress,self.compression,self.level,block))
+        # write out what's done, in order, without getting too far ahead
+        while self._pending and (self._pending[0].done()
+            or len(self._pending)>self.workers*2):
+            self.raw.write(self._pending.pop(0).result())
+
+    def close(self)->None:
+        if self.closed:
+            return
+        try:
+            if self._compressor is not None:
+                self.raw.write(self._compressor.flush())
+            else:
+                if self._block:
+                    self._submitBlock()
+                for future in self._pending:
+                    self.raw.write(future.result())
+                self._pending=[]
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+            io.RawIOBase.close(self)
+            self.raw.close()
+
+
+def openCompressed(item:"ezFs.EzFsFile",
+    mode:str='rb',
+    compression:typing.Optional[str]='infer',
+    level:typing.Optional[int]=None,
+    workers:typing.Optional[int]=None,
+    encoding:typing.Optional[str]=None,
+    errors:typing.Optional[str]=None,
+    newline:typing.Optional[str]=None
+    )->typing.IO:
+    """
+    open a file, compressing or decompressing as it is read or written
+
+    :param mode: 'r', 'w' or 'a' (appends a new stream), plus 't' for
+        text (otherwise it is binary)
+    :param compression: one of COMPRESSIONS, 'infer' to go by the
+        file extension, or None for no compression at all
+    :param level: compression level (None=the codec's default)
+    :param workers: how many cores to compress on when writing
+        (default=all of them)
+    :param encoding: text encoding for 't' modes (default=utf-8)
+    :param errors: text decoding errors for 't' modes (default=strict)
+    :param newline: line endings for 't' modes, the same as for open()
+    :return: a python file object (with its own position if the
+        filesystem is THREAD_SAFE, see handles.py)
+    """
+    if compression=='infer':
+        compression=inferCompression(item.url) # type: ignore
+    if compression is not None and compression not in COMPRESSIONS:
+        raise ValueError(f'Unknown compression "{compression}" (expected one of {", ".join(COMPRESSIONS)})') # noqa: E501 # pylint: disable=line-too-long
+    if '+' in mode or ('r' in mode and ('w' in mode or 'a' in mode)):
+        # (the codecs only go one way, and so do handles, see handles.py)
+        raise ValueError(f'Cannot open a file for both reading and writing (mode "{mode}") when it is compressed or on a THREAD_SAFE filesystem') # noqa: E501 # pylint: disable=line-too-long
+    reading='r' in mode
+    accessMode='r' if reading else 'a' if 'a' in mode else 'w'
+    raw:io.RawIOBase
+    if item.filesystem.THREAD_SAFE:
+        # (a handle of our own, rather than the item's position)
+        raw=ezFs.EzFsHandle(item,accessMode)
+    else:
+        item.open(accessMode+'b')
+        raw=_RawFile(item)
+    stream:typing.IO
+    if reading:
+        buffered=io.BufferedReader(raw,IO_BUFFER_SIZE)
+        if compression is None:
+            stream=buffered
+        elif compression=='gzip':
+            stream=io.BufferedReader(GzipReader(buffered),IO_BUFFER_SIZE)
+        elif compression=='xz':
+            stream=_XzFile(buffered)
+        else:
+            stream=_Bz2File(buffered)
+    else:
+        bufferedWriter=io.BufferedWriter(raw,IO_BUFFER_SIZE)
+        if compression is None:
+            stream=bufferedWriter
+        else:
+            if workers is None:
+                workers=os.cpu_count() or 1
+            stream=io.BufferedWriter(
+                CompressingWriter(bufferedWriter,compression,level,workers),
+                IO_BUFFER_SIZE)
+    if 't' in mode:
+        return io.TextIOWrapper(stream,encoding or 'utf-8',errors,newline) # type: ignore # noqa: E501 # pylint: disable=line-too-long
+    return stream
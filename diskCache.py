@@ -0,0 +1,791 @@
+#!/usr/bin/env
+# -*- coding: utf-8 -*-
+"""
+A local disk cache tier for slow (usually remote) filesystems
+
+Wrap any filesystem (or directory) in an EzFsCachingFilesystem and
+the first time a file is opened for reading, the whole thing is
+copied into a local cache directory.  After that it is read straight
+from local disk, and has a real fileno() so it can be mmap'ed or
+handed to anything else that wants an os file.
+
+Whether a cached copy is still good is decided by the remote file's
+validator (size, mtime and etag), which is looked up at most every
+`revalidate` seconds.
+
+The cache is limited by total size, and the least recently used
+files are thrown away first.  Any number of processes may share one
+cache directory: the index is a sqlite database, copies are written
+to a temporary file and renamed into place, and only one process
+fetches a given file at a time.
+
+Usage:
+    remote=ezFs.EzFs().get('smb://nas/reference')
+    fs=ezFs.EzFsCachingFilesystem(remote,'/var/cache/reference',
+        maxBytes=20<<30)
+    with fs.open('genome.fa','rb') as f:
+        data=mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+"""
+import typing
+import os
+import time
+import hashlib
+import sqlite3
+import tempfile
+import threading
+import weakref
+from contextlib import contextmanager
+from paths import UrlCompatible,MimeTypeCompatible
+import ezFs
+try:
+    import fcntl
+except ImportError:
+    # other processes may fetch the same file at the same time,
+    # which is wasteful but harmless
+    fcntl=None # type: ignore
+
+
+# how much to copy at a time
+FETCH_BUFFER_SIZE=1<<20
+
+# connections inherited from the parent process, kept so that they
+# are never closed (see DiskCache._afterFork())
+_abandonedConnections:typing.List[sqlite3.Connection]=[]
+
+
+class DiskCache:
+    """
+    Whole-file copies of remote files in a local directory
+    """
+
+    # every open cache in this process
+    _instances:"weakref.WeakSet[DiskCache]"=weakref.WeakSet()
+
+    def __init__(self,
+        directory:str,
+        maxBytes:int=10<<30,
+        revalidate:typing.Optional[float]=60.0):
+        """
+        :param directory: where to keep the cache (created if need be)
+        :param maxBytes: most bytes to keep on disk
+        :param revalidate: seconds between checking whether a cached
+            file has changed (0=every time it is opened,
+            None=never, keep it until it gets evicted)
+        """
+        self.directory=os.path.abspath(directory)
+        self.maxBytes=maxBytes
+        self.revalidate=revalidate
+        self.hits=0
+        self.misses=0
+        self.bytesFetched=0
+        os.makedirs(os.path.join(self.directory,'locks'),exist_ok=True)
+        self._lock=threading.RLock()
+        self._db=self._connect()
+        DiskCache._instances.add(self)
+        with self._db:
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('''CREATE TABLE IF NOT EXISTS files (
+                url TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                remoteSize INTEGER,
+                mtime REAL,
+                etag TEXT,
+                validated REAL NOT NULL,
+                lastUsed REAL NOT NULL)''')
+            self._db.execute('''CREATE INDEX IF NOT EXISTS filesByUse
+                ON files (lastUsed)''')
+
+    def _connect(self)->sqlite3.Connection:
+        """
+        open the index
+        """
+        return sqlite3.connect(os.path.join(self.directory,'index.db'),
+            timeout=60,check_same_thread=False)
+
+    @classmethod
+    def _afterFork(cls)->None:
+        """
+        give every cache in a child process a connection of its own,
+        and its open cached files positions of their own
+        (see processes.py)
+        """
+        for cache in list(cls._instances):
+            # (the parent's connection must not be used, or even
+            # closed, in the child)
+            _abandonedConnections.append(cache._db)
+            cache._lock=threading.RLock()
+            cache._db=cache._connect()
+        for item in list(EzFsCachedFile._openFiles):
+            local=item._local # pylint: disable=protected-access
+            if local is not None and not local.closed:
+                reopened=open(local.name,'rb') # pylint: disable=consider-using-with # noqa: E501
+                reopened.seek(local.tell())
+                local.close()
+                item._local=reopened # pylint: disable=protected-access
+
+    def close(self)->None:
+        """
+        close the index
+        """
+        with self._lock:
+            self._db.close()
+        DiskCache._instances.discard(self)
+
+    def __enter__(self)->"DiskCache":
+        return self
+
+    def __exit__(self,*args)->None:
+        self.close()
+
+    def __len__(self)->int:
+        """
+        number of files in the cache
+        """
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM files').fetchone()[0] # noqa: E501 # pylint: disable=line-too-long
+
+    @property
+    def usedBytes(self)->int:
+        """
+        total size of everything in the cache
+        """
+        with self._lock:
+            return int(self._db.execute('SELECT TOTAL(size) FROM files').fetchone()[0]) # noqa: E501 # pylint: disable=line-too-long
+
+    def _filename(self,name:str)->str:
+        """
+        where a cached copy lives
+        """
+        return os.path.join(self.directory,name[:2],name)
+
+    @contextmanager
+    def _fetchLock(self,name:str)->typing.Generator[None,None,None]:
+        """
+        keep other threads and processes from fetching the same file
+
+        (fetches are spread over 256 lock files, by name)
+        """
+        if fcntl is None:
+            yield
+            return
+        lockFile=os.path.join(self.directory,'locks',name[:2])
+        fd=os.open(lockFile,os.O_RDWR|os.O_CREAT,0o644)
+        try:
+            fcntl.flock(fd,fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd) # (also unlocks)
+
+    def _row(self,url:str)->typing.Optional[typing.Tuple]:
+        """
+        get (name,remoteSize,mtime,etag,validated) for a cached file
+        """
+        with self._lock:
+            return self._db.execute(
+                'SELECT name,remoteSize,mtime,etag,validated FROM files WHERE url=?', # noqa: E501 # pylint: disable=line-too-long
+                (url,)).fetchone()
+
+    def path(self,item:"ezFs.EzFsFile")->str:
+        """
+        get the local copy of a file, fetching it if it is not cached
+        or has changed
+
+        NOTE: the copy can be evicted (by any process) at any time, so
+        open it straight away, or better yet, use open() instead.
+
+        :raises FileNotFoundError: if the remote file does not exist
+        """
+        url=item._urlKey # pylint: disable=protected-access
+        name=hashlib.sha1(url.encode('utf-8')).hexdigest()
+        filename=self._filename(name)
+        started=time.time()
+        row=self._row(url)
+        if row is not None and os.path.exists(filename):
+            validated=row[4]
+            fresh=True
+            if self.revalidate is not None \
+                and started-validated>=self.revalidate:
+                fresh=tuple(row[1:4])==item._validator() # pylint: disable=protected-access
+                validated=started
+            if fresh:
+                with self._lock,self._db:
+                    self._db.execute(
+                        'UPDATE files SET lastUsed=?,validated=? WHERE url=?', # noqa: E501 # pylint: disable=line-too-long
+                        (started,validated,url))
+                self.hits+=1
+                return filename
+        with self._fetchLock(name):
+            # somebody else may have fetched it while we waited
+            row=self._row(url)
+            if row is not None and row[4]>=started \
+                and os.path.exists(filename):
+                self.hits+=1
+                return filename
+            self.misses+=1
+            self._fetch(item,url,name,filename)
+        self.evict(keep=url)
+        return filename
+
+    def _fetch(self,
+        item:"ezFs.EzFsFile",
+        url:str,
+        name:str,
+        filename:str
+        )->None:
+        """
+        copy a file into the cache
+        """
+        # get the validator first, so a change while we are copying
+        # is noticed the next time around
+        validator=item._validator() # pylint: disable=protected-access
+        os.makedirs(os.path.dirname(filename),exist_ok=True)
+        fd,tempName=tempfile.mkstemp(prefix='.fetch-',
+            dir=os.path.dirname(filename))
+        size=0
+        try:
+            with os.fdopen(fd,'wb') as f:
+                mode=item.fileAccessMode
+                item.open('rb')
+                try:
+                    while True:
+                        chunk=item.read(FETCH_BUFFER_SIZE)
+                        if not chunk:
+                            break
+                        if isinstance(chunk,str):
+                            chunk=chunk.encode('utf-8')
+                        f.write(chunk)
+                        size+=len(chunk)
+                finally:
+                    item.close()
+                    item.fileAccessMode=mode
+            os.replace(tempName,filename)
+        except BaseException:
+            try:
+                os.unlink(tempName)
+            except FileNotFoundError:
+                pass
+            raise
+        self.bytesFetched+=size
+        now=time.time()
+        with self._lock,self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO files VALUES (?,?,?,?,?,?,?,?)',
+                (url,name,size)+tuple(validator)+(now,now))
+
+    def open(self,item:"ezFs.EzFsFile")->typing.BinaryIO:
+        """
+        open the local copy of a file for reading, fetching it if
+        need be
+
+        (an open copy stays readable even if it gets evicted)
+        """
+        for _ in range(3):
+            filename=self.path(item)
+            try:
+                return open(filename,'rb') # pylint: disable=consider-using-with # noqa: E501
+            except FileNotFoundError:
+                # evicted by another process in the meantime
+                self.invalidate(item)
+        raise FileNotFoundError(str(item.url))
+
+    def invalidate(self,
+        item:typing.Union["ezFs.EzFsItem",str],
+        recursive:bool=False
+        )->None:
+        """
+        throw away the cached copy of a file
+
+        :param recursive: item is a directory, so throw away
+            everything under it
+        """
+        url=item if isinstance(item,str) else item._urlKey # pylint: disable=protected-access
+        with self._lock,self._db:
+            if recursive:
+                prefix=url.rstrip('/')+'/'
+                rows=self._db.execute(
+                    'SELECT url,name FROM files WHERE url>=? AND url<?',
+                    (prefix,prefix[:-1]+'0')).fetchall()
+            else:
+                rows=self._db.execute(
+                    'SELECT url,name FROM files WHERE url=?',
+                    (url,)).fetchall()
+            self._remove(rows)
+
+    def _remove(self,rows:typing.Iterable[typing.Tuple[str,str]])->None:
+        """
+        delete cached copies and their index entries
+
+        (the caller holds the lock and a transaction)
+        """
+        for url,name in rows:
+            try:
+                os.unlink(self._filename(name))
+            except FileNotFoundError:
+                pass
+            self._db.execute('DELETE FROM files WHERE url=?',(url,))
+
+    def evict(self,keep:typing.Optional[str]=None)->int:
+        """
+        throw away the least recently used files until the cache
+        fits in maxBytes
+
+        :param keep: url of a file not to throw away
+        :return: number of bytes freed
+        """
+        freed=0
+        with self._lock,self._db:
+            total=self._db.execute('SELECT TOTAL(size) FROM files').fetchone()[0] # noqa: E501 # pylint: disable=line-too-long
+            if total<=self.maxBytes:
+                return 0
+            victims:typing.List[typing.Tuple[str,str]]=[]
+            for url,name,size in self._db.execute(
+                'SELECT url,name,size FROM files ORDER BY lastUsed'):
+                if url==keep:
+                    continue
+                victims.append((url,name))
+                freed+=size
+                if total-freed<=self.maxBytes:
+                    break
+            self._remove(victims)
+        return freed
+
+    def clear(self)->None:
+        """
+        throw away everything
+        """
+        with self._lock,self._db:
+            self._remove(self._db.execute(
+                'SELECT url,name FROM files').fetchall())
+
+
+class EzFsCachedFile(ezFs.EzFsFile):
+    """
+    A file on a caching filesystem
+
+    Opened for reading, it is served from the local copy.  Anything
+    else goes to the remote file (and throws away the local copy).
+    """
+    __slots__=('target','_local')
+
+    # already on local disk (and the remote file buffers its own writes)
+    BLOCK_CACHE:bool=False
+    WRITE_BUFFER_SIZE:int=0
+
+    # files with a local copy open, in this process
+    _openFiles:"weakref.WeakSet[EzFsCachedFile]"=weakref.WeakSet()
+
+    def __init__(self,
+        url:UrlCompatible,
+        filesystem:"EzFsCachingFilesystem",
+        target:"ezFs.EzFsFile"):
+        """
+        :param target: the remote file
+        """
+        ezFs.EzFsFile.__init__(self,url,filesystem)
+        self.target:ezFs.EzFsFile=target
+        self._local:typing.Optional[typing.BinaryIO]=None
+
+    @property
+    def _cache(self)->DiskCache:
+        """
+        our filesystem's cache
+        """
+        return typing.cast(EzFsCachingFilesystem,self.filesystem).cache
+
+    @property
+    def exists(self)->bool:
+        """ does the item exist? """
+        return self.target.exists
+
+    @property
+    def size(self)->typing.Optional[int]:
+        """ size of the remote file """
+        return self.target.size
+
+    @property
+    def mtime(self)->typing.Optional[float]:
+        """ last modified time of the remote file """
+        return self.target.mtime
+
+    def setMtime(self,mtime:float)->bool:
+        """ set the last modified time of the remote file """
+        return self.target.setMtime(mtime)
+
+    @property
+    def etag(self)->typing.Optional[str]:
+        """ etag of the remote file """
+        return self.target.etag
+
+    def _checksum(self,algorithm:str)->typing.Optional[str]:
+        """
+        pass-through to the remote file
+        """
+        return self.target._checksum(algorithm) # pylint: disable=protected-access
+
+    def fileno(self)->int:
+        """
+        os file descriptor of the local copy (only while open for reading)
+        """
+        if self._local is None:
+            raise AttributeError('Only files open for reading have a fileno') # noqa: E501 # pylint: disable=line-too-long
+        return self._local.fileno()
+
+    def open(self,fileAccessMode:typing.Optional[str]=None)->"EzFsCachedFile": # noqa: E501 # pylint: disable=line-too-long
+        """
+        Open this file and return a file-like object
+
+        If not specified, file access mode will be self.accessMode
+        """
+        if fileAccessMode is not None:
+            self.fileAccessMode=fileAccessMode
+        mode=self._fileAccessMode
+        if 'w' in mode or 'a' in mode or '+' in mode:
+            self.target.open(mode)
+        else:
+            self._local=self._cache.open(self.target)
+            EzFsCachedFile._openFiles.add(self)
+        self._isOpen=True
+        return self
+
+    def read(self, # pylint: disable=arguments-differ
+        numBytes:typing.Optional[int]=None,
+        encoding:typing.Optional[str]=None,
+        errors:str='ignore',
+        mimeType:typing.Optional[MimeTypeCompatible]=None,
+        )->typing.Union[str,bytes]:
+        """
+        read n# of bytes, or the whole thing
+        """
+        if numBytes is None:
+            numBytes=-1
+        if self._local is not None:
+            data=self._local.read(numBytes)
+        elif self._isOpen:
+            data=self.target.read(numBytes if numBytes>=0 else None)
+            if isinstance(data,str):
+                data=data.encode('utf-8')
+        else:
+            with self._cache.open(self.target) as f:
+                data=f.read(numBytes)
+        if encoding is not None:
+            return data.decode(encoding,errors)
+        return data
+
+    def write(self, # type: ignore # pylint: disable=arguments-renamed
+        data:typing.Union[bytes,str],
+        encoding:str='utf-8',
+        errors:str='ignore',
+        mimeType:typing.Optional[MimeTypeCompatible]=None,
+        append:bool=False
+        )->int:
+        """
+        Write the data to the remote file
+        """
+        if self._local is not None:
+            raise ezFs.FileAccessException(f'{self.url} is open read-only')
+        try:
+            return self.target.write(data,encoding,errors,mimeType,append)
+        finally:
+            self._cache.invalidate(self.target)
+
+    def seek(self,offset:int,whence:int=0)->int:
+        """
+        jump to file location
+        """
+        if self._local is not None:
+            return self._local.seek(offset,whence)
+        return self.target.seek(offset,whence)
+
+    def tell(self)->int:
+        """
+        return current file location
+        """
+        if self._local is not None:
+            return self._local.tell()
+        return self.target.tell()
+
+    def close(self)->None:
+        """
+        close open file handles
+        """
+        if self._local is not None:
+            self._local.close()
+            self._local=None
+            EzFsCachedFile._openFiles.discard(self)
+        elif getattr(self,'_isOpen',False):
+            self.target.close()
+        self._isOpen=False
+
+    def flush(self)->None:
+        """
+        Complete all i/o operations now.
+        """
+        if self._local is None and self._isOpen:
+            self.target.flush()
+
+    def addWatch(self,
+        watchFn:"ezFs.WatcherFn",
+        pollingInterval:float=30,
+        withEvents:bool=False,
+        debounce:typing.Optional[float]=None
+        )->None:
+        """
+        pass-through to the remote file
+        """
+        self.target.addWatch(watchFn,pollingInterval,withEvents,debounce)
+
+    def removeWatch(self,
+        watchFn:"ezFs.WatcherFn"
+        )->None:
+        """
+        pass-through to the remote file
+        """
+        self.target.removeWatch(watchFn)
+
+
+class EzFsCachedDirectory(ezFs.EzFsDirectory):
+    """
+    A directory on a caching filesystem
+
+    Everything is passed through to the remote directory, but the
+    items that come back belong to the caching filesystem.
+    """
+    __slots__=('target',)
+
+    def __init__(self,
+        url:UrlCompatible,
+        filesystem:"EzFsCachingFilesystem",
+        target:"ezFs.EzFsDirectory"):
+        """
+        :param target: the remote directory
+        """
+        ezFs.EzFsDirectory.__init__(self,url,filesystem)
+        self.target:ezFs.EzFsDirectory=target
+
+    @property
+    def _cachingFs(self)->"EzFsCachingFilesystem":
+        """
+        our filesystem
+        """
+        return typing.cast(EzFsCachingFilesystem,self.filesystem)
+
+    @property
+    def exists(self)->bool:
+        """ does the item exist? """
+        return self.target.exists
+
+    @property
+    def mtime(self)->typing.Optional[float]:
+        """ last modified time of the remote directory """
+        return self.target.mtime
+
+    def setMtime(self,mtime:float)->bool:
+        """ set the last modified time of the remote directory """
+        return self.target.setMtime(mtime)
+
+    @property
+    def children(self)->typing.Iterable[ezFs.EzFsItem]:
+        """
+        pass-through to the remote directory
+        """
+        wrap=self._cachingFs._wrap # pylint: disable=protected-access
+        return (wrap(child) for child in self.target.children)
+
+    def listPage(self,
+        cursor:typing.Optional[str]=None,
+        limit:typing.Optional[int]=None
+        )->typing.Tuple[typing.List[ezFs.EzFsItem],typing.Optional[str]]:
+        """
+        pass-through to the remote directory
+        """
+        page,cursor=self.target.listPage(cursor,limit)
+        wrap=self._cachingFs._wrap # pylint: disable=protected-access
+        return [wrap(child) for child in page],cursor
+
+    def count(self)->int:
+        """
+        pass-through to the remote directory
+        """
+        return self.target.count()
+
+    def listPrefix(self,
+        prefix:str
+        )->typing.Generator[ezFs.EzFsItem,None,None]:
+        """
+        pass-through to the remote directory
+        """
+        wrap=self._cachingFs._wrap # pylint: disable=protected-access
+        for child in self.target.listPrefix(prefix):
+            yield wrap(child)
+
+    def listRange(self,
+        start:typing.Optional[str]=None,
+        stop:typing.Optional[str]=None
+        )->typing.Generator[ezFs.EzFsItem,None,None]:
+        """
+        pass-through to the remote directory
+        """
+        wrap=self._cachingFs._wrap # pylint: disable=protected-access
+        for child in self.target.listRange(start,stop):
+            yield wrap(child)
+
+    def _treeDigest(self)->typing.Optional[str]:
+        """
+        pass-through to the remote directory
+        """
+        return self.target._treeDigest() # pylint: disable=protected-access
+
+    def get(self,
+        path:typing.Union[UrlCompatible,typing.List[str]],
+        idx:int=0
+        )->ezFs.EzFsItem:
+        """
+        pass-through to the remote directory
+        """
+        if isinstance(path,list) and len(path)<=idx:
+            return self
+        return self._cachingFs._wrap(self.target.get(path,idx)) # pylint: disable=protected-access
+
+    def markDirty(self)->None:
+        """
+        pass-through to the remote directory
+        """
+        self.target.markDirty()
+
+    def _mkdir(self,
+        newDirectoryName:UrlCompatible
+        )->None:
+        """
+        pass-through to the remote directory
+        """
+        self.target._mkdir(newDirectoryName) # pylint: disable=protected-access
+
+    def addWatch(self,
+        watchFn:"ezFs.WatcherFn",
+        pollingInterval:float=30,
+        withEvents:bool=False,
+        debounce:typing.Optional[float]=None
+        )->None:
+        """
+        pass-through to the remote directory
+        """
+        self.target.addWatch(watchFn,pollingInterval,withEvents,debounce)
+
+    def removeWatch(self,
+        watchFn:"ezFs.WatcherFn"
+        )->None:
+        """
+        pass-through to the remote directory
+        """
+        self.target.removeWatch(watchFn)
+
+
+class EzFsCachingFilesystem(ezFs.EzFsFilesystem):
+    """
+    Another filesystem (or directory), with files cached on local disk
+
+    It has the same urls as what it wraps, so it can be mounted in
+    place of it.
+    """
+
+    # what kinds of items to create (derived classes may change these)
+    FILE_CLASS:typing.Type[EzFsCachedFile]=EzFsCachedFile
+    DIRECTORY_CLASS:typing.Type[EzFsCachedDirectory]=EzFsCachedDirectory
+
+    def __init__(self,
+        remote:"ezFs.EzFsDirectory",
+        cacheDirectory:typing.Union[str,DiskCache],
+        maxBytes:int=10<<30,
+        revalidate:typing.Optional[float]=60.0):
+        """
+        :param remote: what to cache
+        :param cacheDirectory: where to keep the cache
+            (or a DiskCache to share with other filesystems)
+        :param maxBytes: most bytes to keep on disk
+        :param revalidate: seconds between checking whether a cached
+            file has changed (0=every time it is opened,
+            None=never, keep it until it gets evicted)
+        """
+        if not isinstance(cacheDirectory,DiskCache):
+            cacheDirectory=DiskCache(cacheDirectory,maxBytes,revalidate)
+        self.cache:DiskCache=cacheDirectory
+        self.remote:ezFs.EzFsDirectory=remote
+        ezFs.EzFsFilesystem.__init__(self,remote.url,
+            remote.filesystem.caseSensitive)
+
+    def _config(self)->typing.Tuple[typing.Tuple,typing.Dict[str,typing.Any]]: # noqa: E501 # pylint: disable=line-too-long
+        """
+        what this filesystem was created with
+        """
+        return ((self.remote,self.cache.directory),
+            {'maxBytes':self.cache.maxBytes,
+            'revalidate':self.cache.revalidate})
+
+    def _wrap(self,item:ezFs.EzFsItem)->ezFs.EzFsItem:
+        """
+        make a remote item into one of ours
+        """
+        if isinstance(item,(EzFsCachedFile,EzFsCachedDirectory)):
+            return item
+        if isinstance(item,ezFs.EzFsFile):
+            return self.FILE_CLASS(typing.cast(UrlCompatible,item.url),self,item) # noqa: E501 # pylint: disable=line-too-long
+        if isinstance(item,ezFs.EzFsDirectory):
+            return self.DIRECTORY_CLASS(typing.cast(UrlCompatible,item.url),self,item) # noqa: E501 # pylint: disable=line-too-long
+        return item
+
+    def _target(self,fsItem:ezFs.EzFsItem)->ezFs.EzFsItem:
+        """
+        get the remote item behind one of ours
+        """
+        target=getattr(fsItem,'target',None)
+        if target is None:
+            target=self.remote.filesystem.get(typing.cast(UrlCompatible,fsItem.url)) # noqa: E501 # pylint: disable=line-too-long
+        return target
+
+    def _getFsItem(self,url:UrlCompatible)->ezFs.EzFsItem:
+        """
+        get a single item from the filesystem
+        """
+        return self._wrap(self.remote.filesystem.get(url))
+
+    def _forget(self,fsItem:ezFs.EzFsItem)->None:
+        """
+        throw away anything cached for an item
+        """
+        self.cache.invalidate(fsItem,isinstance(fsItem,ezFs.EzFsDirectory))
+
+    def _delete(self,fsItem:"ezFs.EzFsItem")->None:
+        """ delete """
+        self._forget(fsItem)
+        self._target(fsItem).delete()
+
+    def _rename(self,
+        fsItem:"ezFs.EzFsItem",
+        newName:UrlCompatible)->None:
+        """ rename """
+        self._forget(fsItem)
+        self._target(fsItem).rename(newName)
+
+    def _copy(self,
+        fsItem:"ezFs.EzFsItem",
+        newLocation:UrlCompatible)->None:
+        """ copy """
+        self.cache.invalidate(str(self._absoluteUrl(newLocation)))
+        self._target(fsItem).copy(newLocation)
+
+    def _move(self,
+        fsItem:"ezFs.EzFsItem",
+        newLocation:UrlCompatible)->None:
+        """ move """
+        self._forget(fsItem)
+        self.cache.invalidate(str(self._absoluteUrl(newLocation)))
+        self._target(fsItem).move(newLocation)
+
+    def _mkdir(self,
+        newDirectoryName:UrlCompatible
+        )->None:
+        """
+        pass-through to working directory
+        """
+        self.workingDirectory._mkdir(newDirectoryName) # type: ignore # pylint: disable=protected-access
@@ -0,0 +1,308 @@
+#!/usr/bin/env
+# -*- coding: utf-8 -*-
+"""
+Debounced, coalesced and batched delivery of watch events
+
+Events for each watcher are held for a short debounce window, events
+on the same url are merged (eg created then modified is just created,
+created then deleted is nothing at all), and what is left is handed to
+the watcher as one batch on a worker thread, so that a slow watcher
+does not hold up anybody else.  (A move is never merged into what
+happened at its old url, so created then moved is still both.)
+"""
+import typing
+import time
+import logging
+import threading
+import concurrent.futures
+from collections import OrderedDict
+import ezFs
+
+
+# a debounce window never holds events for longer than this many windows
+MAX_DELAY_WINDOWS=10
+
+OVERFLOW_POLICIES=('collapse','drop','block')
+
+_logger=logging.getLogger('ezFs')
+
+
+def coalesce(previous:"ezFs.ChangeEvent",
+    event:"ezFs.ChangeEvent"
+    )->typing.Optional["ezFs.ChangeEvent"]:
+    """
+    merge two events on the same url into one
+
+    :return: the merged event, or None if they cancel each other out
+    """
+    if previous.kind=='created':
+        if event.kind=='deleted':
+            return None
+        if event.kind=='modified':
+            return previous
+    elif previous.kind=='deleted':
+        if event.kind=='created' and event.isDir==previous.isDir:
+            return ezFs.ChangeEvent('modified',event.url,event.isDir)
+    elif previous.kind=='moved':
+        if event.kind=='modified':
+            return previous
+    return event
+
+
+class _Batch:
+    """
+    The events waiting to go to one watcher
+    """
+    __slots__=('item','fn','withEvents','events','firstEvent','deadline',
+        'running','collapsed','cancelled')
+
+    def __init__(self,
+        item:"ezFs.PollingItem",
+        fn:"ezFs.WatcherFn",
+        withEvents:bool):
+        """ """
+        self.item=item
+        self.fn=fn
+        self.withEvents=withEvents
+        self.events:typing.Dict[str,ezFs.ChangeEvent]=OrderedDict()
+        self.firstEvent:typing.Optional[float]=None
+        self.deadline:float=0.0
+        self.running=False
+        self.collapsed=False
+        self.cancelled=False # (the watch was removed)
+
+    def add(self,event:"ezFs.ChangeEvent")->int:
+        """
+        add an event, merging it with anything already waiting
+
+        :return: the change in the number of waiting events
+        """
+        before=len(self.events)
+        events=self.events
+        if event.kind=='moved' and event.oldUrl is not None:
+            source=events.get(event.oldUrl)
+            if source is not None and source.kind=='moved':
+                # moved twice is moved once
+                del events[event.oldUrl]
+                event=ezFs.ChangeEvent('moved',event.url,event.isDir,
+                    source.oldUrl)
+        previous=events.pop(event.url,None)
+        if previous is not None and event.kind=='deleted' \
+            and previous.kind=='moved' and previous.oldUrl is not None:
+            # moved here then deleted is the original being deleted
+            deleted=ezFs.ChangeEvent('deleted',previous.oldUrl,previous.isDir)
+            original=events.pop(previous.oldUrl,None)
+            merged=deleted if original is None else coalesce(original,deleted)
+            if merged is not None:
+                events[merged.url]=merged
+        else:
+            merged=event if previous is None else coalesce(previous,event)
+            if merged is not None:
+                events[merged.url]=merged
+        return len(events)-before
+
+    def collapse(self)->int:
+        """
+        too many events, so replace them all with a single "everything
+        under here may have changed"
+
+        :return: the change in the number of waiting events
+        """
+        before=len(self.events)
+        url=str(getattr(self.item,'url',''))
+        self.events=OrderedDict(((url,ezFs.ChangeEvent('modified',url,url.endswith('/'))),)) # noqa: E501 # pylint: disable=line-too-long
+        self.collapsed=True
+        return len(self.events)-before
+
+
+class EventDispatcher:
+    """
+    Delivers watch events on a pool of worker threads
+
+    Use EventDispatcher.shared() rather than creating your own.
+    """
+
+    _shared:typing.Optional["EventDispatcher"]=None
+    _sharedLock=threading.Lock()
+
+    @classmethod
+    def shared(cls)->"EventDispatcher":
+        """
+        the dispatcher for this process (started the first time it is used)
+        """
+        with cls._sharedLock:
+            if cls._shared is None:
+                cls._shared=cls()
+            return cls._shared
+
+    def __init__(self,
+        maxQueued:int=10000,
+        workers:int=4,
+        overflow:str='collapse'):
+        """
+        :param maxQueued: most events waiting to be delivered, in total
+        :param workers: number of threads calling watchers
+        :param overflow: what to do when there are too many events waiting
+            'collapse' - replace that watcher's events with a single
+                modified event for the item being watched
+            'drop' - throw the new event away
+            'block' - wait until there is room
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f'overflow must be one of {OVERFLOW_POLICIES}, not "{overflow}"') # noqa: E501 # pylint: disable=line-too-long
+        self.maxQueued=maxQueued
+        self.overflow=overflow
+        self.queued=0
+        self.delivered=0
+        self.dropped=0
+        self.collapsed=0
+        self._batches:typing.Dict[typing.Tuple[int,typing.Any],_Batch]={}
+        self._condition=threading.Condition()
+        self._pool=concurrent.futures.ThreadPoolExecutor(max_workers=workers,
+            thread_name_prefix='ezFs watcher')
+        self._running=True
+        self._thread=threading.Thread(target=self._run,
+            name='ezFs dispatcher',daemon=True)
+        self._thread.start()
+
+    def close(self)->None:
+        """
+        stop delivering events (anything still waiting is thrown away)
+        """
+        with self._condition:
+            if not self._running:
+                return
+            self._running=False
+            self._condition.notify_all()
+        self._thread.join(5)
+        self._pool.shutdown(wait=True)
+        with EventDispatcher._sharedLock:
+            if EventDispatcher._shared is self:
+                EventDispatcher._shared=None
+
+    def submit(self,
+        item:"ezFs.PollingItem",
+        fn:"ezFs.WatcherFn",
+        withEvents:bool,
+        events:typing.Iterable["ezFs.ChangeEvent"],
+        debounce:float=0.0
+        )->None:
+        """
+        queue up events for a watcher
+
+        :param debounce: seconds to wait for more events before
+            delivering (waits at most MAX_DELAY_WINDOWS times this)
+        """
+        with self._condition:
+            key=(id(item),fn)
+            batch=self._batches.get(key)
+            if batch is None:
+                batch=_Batch(item,fn,withEvents)
+                self._batches[key]=batch
+            now=time.monotonic()
+            if batch.firstEvent is None:
+                batch.firstEvent=now
+            for event in events:
+                if batch.collapsed:
+                    break
+                while self.queued>=self.maxQueued and event.url not in batch.events: # noqa: E501 # pylint: disable=line-too-long
+                    if self.overflow=='block' and self._running:
+                        self._condition.wait(0.1)
+                        continue
+                    if self.overflow=='collapse':
+                        self.queued+=batch.collapse()
+                        self.collapsed+=1
+                    else:
+                        self.dropped+=1
+                    break
+                else:
+                    self.queued+=batch.add(event)
+            batch.deadline=min(now+debounce,
+                batch.firstEvent+debounce*MAX_DELAY_WINDOWS)
+            self._condition.notify_all()
+
+    def cancel(self,
+        item:"ezFs.PollingItem",
+        fn:"ezFs.WatcherFn"
+        )->None:
+        """
+        throw away anything waiting for a watcher that has been removed
+        (and do not deliver a batch that is about to go out)
+        """
+        with self._condition:
+            batch=self._batches.pop((id(item),fn),None)
+            if batch is None:
+                return
+            self.queued-=len(batch.events)
+            batch.events=OrderedDict()
+            batch.cancelled=True
+            self._condition.notify_all()
+
+    def flush(self,timeout:typing.Optional[float]=None)->bool:
+        """
+        wait until everything queued so far has been delivered
+
+        :return: False if it timed out
+        """
+        deadline=None if timeout is None else time.monotonic()+timeout
+        with self._condition:
+            while any(b.events or b.running for b in self._batches.values()):
+                remaining=None if deadline is None else deadline-time.monotonic() # noqa: E501 # pylint: disable=line-too-long
+                if remaining is not None and remaining<=0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def _run(self)->None:
+        """
+        the background thread that hands batches to the workers
+        once their debounce window is up
+        """
+        with self._condition:
+            while self._running:
+                now=time.monotonic()
+                nextDeadline=None
+                for key,batch in list(self._batches.items()):
+                    if batch.running:
+                        continue
+                    if not batch.events:
+                        del self._batches[key]
+                        continue
+                    if batch.deadline>now:
+                        if nextDeadline is None or batch.deadline<nextDeadline:
+                            nextDeadline=batch.deadline
+                        continue
+                    events=list(batch.events.values())
+                    self.queued-=len(events)
+                    batch.events=OrderedDict()
+                    batch.firstEvent=None
+                    batch.collapsed=False
+                    batch.running=True
+                    self._pool.submit(self._deliver,batch,events)
+                self._condition.notify_all() # (there may be room now)
+                self._condition.wait(None if nextDeadline is None
+                    else nextDeadline-now)
+
+    def _deliver(self,
+        batch:_Batch,
+        events:typing.List["ezFs.ChangeEvent"]
+        )->None:
+        """
+        call a watcher (on a worker thread)
+        """
+        try:
+            with self._condition:
+                cancelled=batch.cancelled
+            if cancelled:
+                pass
+            elif batch.withEvents:
+                batch.fn(batch.item,events)
+            else:
+                batch.fn(batch.item)
+        except Exception: # pylint: disable=broad-except
+            _logger.warning('watcher %r failed',batch.fn,exc_info=True)
+        finally:
+            with self._condition:
+                batch.running=False
+                self.delivered+=1
+                self._condition.notify_all()
@@ -0,0 +1,131 @@
+#!/usr/bin/env
+# -*- coding: utf-8 -*-
+"""
+Find duplicate files, across any number of filesystems
+
+Comparing every file with every other file is hopeless, so this
+narrows things down in stages, each cheaper than the next:
+    1. group by size (from the listing, so nothing is read)
+    2. of those, group by a hash of the first and last few KB
+    3. of those, group by a hash of the whole file
+Files that are no bigger than the first and last few KB are fully
+hashed by stage 2 and skip stage 3.
+
+Hashing is done on a thread pool, and each group is returned as
+soon as it is confirmed rather than waiting for everything.
+"""
+import typing
+import hashlib
+from concurrent.futures import ThreadPoolExecutor,Future,wait,FIRST_COMPLETED
+import ezFs
+
+
+# how much of each end of a file the partial hash looks at
+PARTIAL_HASH_BYTES=16*1024
+
+
+def partialHash(item:"ezFs.EzFsFile",
+    numBytes:int=PARTIAL_HASH_BYTES
+    )->str:
+    """
+    hash the first and last numBytes of a file
+
+    (for files no bigger than 2*numBytes this hashes the whole file)
+
+    The ends are ranged reads, so a file the caller has open stays
+    open at the same position.
+    """
+    size=item.size or 0
+    hasher=hashlib.sha1()
+    hasher.update(item.readRange(0,numBytes))
+    if size>numBytes:
+        hasher.update(item.readRange(max(numBytes,size-numBytes),numBytes))
+    return hasher.hexdigest()
+
+
+def findDuplicates(roots:typing.Iterable["ezFs.EzFsItem"],
+    minSize:int=1,
+    algorithm:str='sha256',
+    cache:typing.Optional["ezFs.HashCache"]=None,
+    workers:int=8,
+    progress:typing.Optional["ezFs.Progress"]=None
+    )->typing.Generator[typing.List["ezFs.EzFsItem"],None,None]:
+    """
+    find files with the same contents
+
+    :param roots: directories (searched recursively) and files
+    :param minSize: ignore files smaller than this
+        (by default, empty files are not considered duplicates)
+    :param algorithm: hash algorithm for the final comparison
+    :param cache: a HashCache for the full hashes
+    :param workers: how many things to list/hash at the same time
+    :param progress: counts every hash done (a file that gets past
+        stage 2 is counted twice)
+    :return: groups of two or more identical files (each sorted by url)
+        as they are confirmed
+    """
+    with ThreadPoolExecutor(max_workers=workers,
+        thread_name_prefix='ezFs duplicates') as pool:
+        # stage 1: group by size
+        bySize:typing.Dict[int,typing.List[ezFs.EzFsItem]]={}
+        seen:typing.Set[str]=set()
+        listings=[pool.submit(_listFiles,root) for root in roots]
+        for listing in listings:
+            for item in listing.result():
+                size=item.size
+                url=str(item.url)
+                if size is None or size<minSize or url in seen:
+                    continue
+                seen.add(url)
+                bySize.setdefault(size,[]).append(item)
+        # stages 2 and 3: hash as little as possible
+        pending:typing.Dict[Future,typing.Tuple[typing.Any,ezFs.EzFsItem]]={} # noqa: E501 # pylint: disable=line-too-long
+        remaining:typing.Dict[typing.Any,int]={} # group key:hashes to go
+        groups:typing.Dict[typing.Any,typing.Dict[str,typing.List[ezFs.EzFsItem]]]={} # noqa: E501 # pylint: disable=line-too-long
+        def submit(key:typing.Any,items:typing.List[ezFs.EzFsItem],
+            fn:typing.Callable[[ezFs.EzFsItem],str])->None:
+            remaining[key]=len(items)
+            groups[key]={}
+            for item in items:
+                pending[pool.submit(fn,item)]=(key,item)
+        for size,items in bySize.items():
+            if len(items)>1:
+                submit(('partial',size),items,partialHash)
+        del bySize
+        while pending:
+            done,_=wait(pending,return_when=FIRST_COMPLETED)
+            for future in done:
+                key,item=pending.pop(future)
+                try:
+                    digest=future.result()
+                except OSError:
+                    digest=None # (could not read it, so leave it out)
+                if progress is not None:
+                    progress.add(1,item.size or 0,int(digest is None))
+                if digest is not None:
+                    groups[key].setdefault(digest,[]).append(item)
+                remaining[key]-=1
+                if remaining[key]:
+                    continue
+                del remaining[key]
+                stage,size=key[0],key[1]
+                for digest,items in groups.pop(key).items():
+                    if len(items)<2:
+                        continue
+                    if stage=='full' or size<=2*PARTIAL_HASH_BYTES:
+                        yield sorted(items,key=lambda item:str(item.url))
+                    else:
+                        submit(('full',size,digest),items,
+                            lambda item:ezFs.hashItem(item,algorithm,cache))
+
+
+def _listFiles(root:"ezFs.EzFsItem")->typing.List["ezFs.EzFsItem"]:
+    """
+    all of the files under a root
+    """
+    if isinstance(root,ezFs.EzFsMountPoint):
+        root=root.target
+    if not isinstance(root,ezFs.EzFsDirectory):
+        return [root]
+    return [item for item in root.getAll()
+        if not isinstance(item,ezFs.EzFsDirectory)]
@@ -61,3 +61,14 @@ class TooManyFilesException(EzFsException):
     def __init__(self,filePath:str,numFiles:int):
         err:str='Too many files (%d) found for operation'%numFiles
         EzFsException.__init__(self,filePath,err)
+
+
+class NoSpaceException(EzFsException):
+    """
+    Thrown when a filesystem has run out of room
+    """
+
+    def __init__(self,filePath:UrlCompatible,numBytes:int,available:int):
+        err:str='Not enough space to store %d byte(s) (%d available)'%(
+            numBytes,available)
+        EzFsException.__init__(self,filePath,err)
@@ -7,10 +7,41 @@ import typing
 from abc import abstractmethod
 import os
 import re
+import bisect
+import fnmatch
+import collections
+import itertools
 from paths import MimeTypeCompatible, asUrl,UrlCompatible,URL
 import ezFs
 
 
+# the first glob wildcard in a path segment
+_GLOB_WILDCARD=re.compile(r'[*?[]')
+
+# regular expression characters that end a literal prefix
+_REGEX_SPECIAL=frozenset('.^$*+?{}[]\\|()')
+
+
+def _regexPrefix(pattern:str)->str:
+    """
+    get the literal text that anything matching a regular expression
+    must start with (used to narrow down directory listings)
+
+    Gives up (returns '') rather than be wrong.
+    """
+    if '|' in pattern:
+        return ''
+    prefix:typing.List[str]=[]
+    for c in pattern:
+        if c in _REGEX_SPECIAL:
+            if c in '*?{' and prefix:
+                # the last character was optional
+                prefix.pop()
+            break
+        prefix.append(c)
+    return ''.join(prefix)
+
+
 # returns whether the walk should continue or not
 FileWalkerCallback=typing.Callable[[
     ezFs.EzFsItem,typing.Optional[typing.Any]
@@ -21,12 +52,105 @@ class EzFsDirectory(ezFs.EzFsItem):
     """
     A file system item that serves as a container for more items
     """
+    __slots__=()
+
+    # whether listings include things mounted inside of this directory
+    MERGE_MOUNTS:bool=True
+
+    # how many items to ask the backend for at a time
+    PAGE_SIZE:int=1000
+
     def __init__(self,
         url:UrlCompatible,
         filesystem:"ezFs.EzFsFilesystem"):
         """ """
         ezFs.EzFsItem.__init__(self,url,filesystem)
 
+    def __init_subclass__(cls,**kwargs):
+        """
+        Make sure anything mounted inside of a directory shows up
+        in its children, no matter how the derived class lists them
+        """
+        super().__init_subclass__(**kwargs)
+        prop=cls.__dict__.get('children')
+        if cls.MERGE_MOUNTS and isinstance(prop,property) \
+            and prop.fget is not None:
+            getChildren=prop.fget
+            def children(self)->typing.Iterable[ezFs.EzFsItem]:
+                return self._withMounts(self._adopt(getChildren(self)))
+            children.__doc__=getChildren.__doc__
+            cls.children=property(children) # type: ignore
+
+    def _adopt(self,
+        children:typing.Iterable[ezFs.EzFsItem]
+        )->typing.Iterable[ezFs.EzFsItem]:
+        """
+        point the parent of each child at us, so that nobody has to
+        look it up again later
+
+        (a list or {name:item} dict comes back as the same list or
+        dict, anything else as a generator)
+        """
+        if not isinstance(children,(list,tuple,dict)):
+            return self._adoptEach(children)
+        values=children.values() if isinstance(children,dict) else children
+        for child in values:
+            if child._parent is None: # pylint: disable=protected-access
+                child._parent=self # pylint: disable=protected-access
+        return children
+
+    def _adoptEach(self,
+        children:typing.Iterable[ezFs.EzFsItem]
+        )->typing.Generator[ezFs.EzFsItem,None,None]:
+        """
+        point the parent of each child at us as it goes by
+        """
+        for child in children:
+            if child._parent is None: # pylint: disable=protected-access
+                child._parent=self # pylint: disable=protected-access
+            yield child
+
+    def _withMounts(self,
+        children:typing.Iterable[ezFs.EzFsItem]
+        )->typing.Iterable[ezFs.EzFsItem]:
+        """
+        add any mount points to a directory listing
+        """
+        mounted=self._mountsHere()
+        if not mounted:
+            return children
+        return self._mergeMounts(children,mounted)
+
+    def _mountsHere(self)->typing.Dict[str,"EzFsDirectory"]:
+        """
+        get the things mounted directly inside of this directory
+
+        :return: {name:mountedDirectory}
+        """
+        fs=self._filesystem
+        mounts=getattr(fs,'_mounts',None)
+        if not mounts or self._name is None:
+            return {}
+        return mounts.mountsAt(fs._mountKey(self.url)) # type: ignore # pylint: disable=protected-access
+
+    def _mergeMounts(self,
+        children:typing.Iterable[ezFs.EzFsItem],
+        mounted:typing.Dict[str,"EzFsDirectory"]
+        )->typing.Generator[ezFs.EzFsItem,None,None]:
+        """
+        merge mount points into a directory listing
+
+        (a mount point hides whatever was there before)
+        """
+        caseSensitive=self.filesystem.caseSensitive
+        for child in children:
+            name=child.name if caseSensitive else child.name.lower()
+            if name not in mounted:
+                yield child
+        for name,target in mounted.items():
+            yield ezFs.EzFsMountPoint(ezFs.childUrl(self.url,name)+'/',
+                self.filesystem,target)
+
     @property
     def isDir(self)->bool:
         """ is this a directory? """
@@ -38,7 +162,7 @@ class EzFsDirectory(ezFs.EzFsItem):
         This is a getter/setter because EzFsFilesystem wants to override
         the functionality to change its working directory upon set.
         """
-        return self._url
+        return ezFs.EzFsItem.url.fget(self) # type: ignore
     @url.setter
     def url(self,url:UrlCompatible):
         url=URL(url)
@@ -46,9 +170,8 @@ class EzFsDirectory(ezFs.EzFsItem):
             u=str(url)
             if u[-1]!='/':
                 url=asUrl(u+'/')
-        self._url=url
+        self._setUrl(url)
 
-    @abstractmethod
     def mount(self,
         location:UrlCompatible,
         otherFs:typing.Optional["ezFs.EzFsFilesystem"]=None
@@ -65,9 +188,15 @@ class EzFsDirectory(ezFs.EzFsItem):
             .
             Thus mount('/mnt/mything',None) IS NOT the same thing as mount('/mnt/mything',OsFs())
 
-        TODO: implement this.  See also:
-        C:\Users\kurt\AppData\Local\Programs\Python\Python37\Lib\site-packages\fs-0.5.5a1-py3.7.egg\fs\mountfs.py  # noqa: E501 # pylint: disable=line-too-long
+        :return: the url of the new mount point
+
+        TODO: mounting to the local filesystem (otherFs=None) needs an
+        os-level driver such as FUSE or Dokan.
         """
+        if otherFs is None:
+            raise NotImplementedError('Mounting to the operating system requires a FUSE/Dokan driver') # noqa: E501 # pylint: disable=line-too-long
+        return otherFs.addMount(location,self)
+
     def printTree(self,indent:str='')->None:
         """
         Print the entire directory structure as a tree
@@ -79,19 +208,269 @@ class EzFsDirectory(ezFs.EzFsItem):
             child.printTree(indent)
 
     @property
-    @abstractmethod
     def children(self)->typing.Iterable[ezFs.EzFsItem]:
         """
-        returns a dict of {name:EzFsItem}
+        all items in this directory
 
-        DERIVED CLASSES MUST IMPLEMENT THIS!
+        DERIVED CLASSES MUST IMPLEMENT THIS, OR _listPage()!
+
+        When the backend pages, this streams one page at a time, and
+        the next page is not fetched until the caller gets to it.
+        """
+        if not self._pagesNatively:
+            raise NotImplementedError(
+                f'{self.__class__.__name__} must implement children or _listPage()') # noqa: E501 # pylint: disable=line-too-long
+        return self._withMounts(self._adopt(self._streamPages()))
+
+    def _streamPages(self)->typing.Generator[ezFs.EzFsItem,None,None]:
+        """
+        generate every item, one page at a time
+        """
+        cursor:typing.Optional[str]=None
+        while True:
+            page,cursor=self._listPage(cursor,self.PAGE_SIZE)
+            yield from page
+            if cursor is None:
+                break
+
+    @property
+    def _pagesNatively(self)->bool:
+        """
+        does the backend implement _listPage()?
+        """
+        return type(self)._listPage is not EzFsDirectory._listPage # pylint: disable=comparison-with-callable # noqa: E501 # pylint: disable=line-too-long
+
+    def _listPage(self,
+        cursor:typing.Optional[str],
+        limit:int
+        )->typing.Tuple[typing.List[ezFs.EzFsItem],typing.Optional[str]]:
+        """
+        get one page of the directory listing
+
+        Backends that can page (object stores, mail folders, etc)
+        should implement this instead of children.
+
+        :param cursor: where to continue from (None=the start).
+            This is whatever the previous call returned, and means
+            nothing to anybody but the backend.
+        :param limit: maximum number of items to return
+        :return: (items,cursor for the next page or None if that was the end)
+        """
+        raise NotImplementedError()
+
+    def listPage(self,
+        cursor:typing.Optional[str]=None,
+        limit:typing.Optional[int]=None
+        )->typing.Tuple[typing.List[ezFs.EzFsItem],typing.Optional[str]]:
+        """
+        get one page of the directory listing
+
+        :param cursor: the cursor returned with the previous page
+            (None=start at the beginning)
+        :param limit: maximum number of items (default=PAGE_SIZE)
+        :return: (items,cursor for the next page or None if that was the end)
+        """
+        if limit is None:
+            limit=self.PAGE_SIZE
+        if not self._pagesNatively:
+            # page over children, where the cursor is just an offset
+            start=0 if cursor is None else int(cursor)
+            page=list(itertools.islice(self.children,start,start+limit+1))
+            if len(page)<=limit:
+                return page,None
+            return page[:limit],str(start+limit)
+        page,nextCursor=self._listPage(cursor,limit)
+        page=list(self._adopt(page))
+        mounted=self._mountsHere()
+        if mounted:
+            # mount points hide what is under them and come last
+            caseSensitive=self.filesystem.caseSensitive
+            page=[child for child in page
+                if (child.name if caseSensitive else child.name.lower())
+                not in mounted]
+            if nextCursor is None:
+                page.extend(self._mergeMounts((),mounted))
+        return page,nextCursor
+
+    def _treeDigest(self)->typing.Optional[str]:
+        """
+        a cheap digest that changes whenever anything at all under
+        this directory changes (eg a version number or an ETag)
+
+        Backends that have one should implement this, so snapshots
+        can skip unchanged subtrees without listing them.
+
+        :return: the digest, or None if the backend has no such thing
         """
+        return None
+
+    def _count(self)->typing.Optional[int]:
+        """
+        number of items in the directory, if the backend can tell
+        without listing them all
+
+        :return: the count, or None if unknown
+        """
+        return None
+
+    def count(self)->int:
+        """
+        number of items in this directory
+
+        This is cheap if the backend implements _count(), otherwise
+        the directory is streamed through (but not kept).
+        """
+        if not self._mountsHere():
+            ret=self._count()
+            if ret is not None:
+                return ret
+        return sum(1 for _ in self.children)
 
     def __len__(self)->int:
         """
         access this like a list
         """
-        return len(list(self.children))
+        return self.count()
+
+    def _listPrefix(self,
+        prefix:str
+        )->typing.Optional[typing.Iterable[ezFs.EzFsItem]]:
+        """
+        list only the items whose names start with prefix
+
+        Backends that can do this without listing everything
+        (object stores, sorted archives, etc) should implement it.
+
+        :return: the items in name order, or None if the backend
+            cannot do it (and the whole directory must be listed)
+        """
+        return None
+
+    def _listRange(self,
+        start:typing.Optional[str],
+        stop:typing.Optional[str]
+        )->typing.Optional[typing.Iterable[ezFs.EzFsItem]]:
+        """
+        list only the items whose names are start<=name<stop
+
+        Backends that can do this without listing everything
+        should implement it.
+
+        :return: the items in name order, or None if the backend
+            cannot do it (and the whole directory must be listed)
+        """
+        return None
+
+    def listPrefix(self,
+        prefix:str
+        )->typing.Generator[ezFs.EzFsItem,None,None]:
+        """
+        get all items whose names start with prefix, in name order
+
+        (any mount points come last)
+        """
+        found=self._listPrefix(prefix)
+        if found is not None:
+            yield from self._pushedDown(found,
+                lambda name:name.startswith(prefix))
+            return
+        names,items=self._sortedSnapshot()
+        if not self.filesystem.caseSensitive:
+            prefix=prefix.lower()
+        for i in range(bisect.bisect_left(names,prefix),len(names)):
+            if not names[i].startswith(prefix):
+                break
+            yield items[i]
+
+    def listRange(self,
+        start:typing.Optional[str]=None,
+        stop:typing.Optional[str]=None
+        )->typing.Generator[ezFs.EzFsItem,None,None]:
+        """
+        get all items whose names are start<=name<stop, in name order
+
+        (any mount points come last)
+
+        :param start: first name (None=from the beginning)
+        :param stop: name to stop before (None=to the end)
+        """
+        found=self._listRange(start,stop)
+        if found is not None:
+            yield from self._pushedDown(found,
+                lambda name:(start is None or name>=start)
+                and (stop is None or name<stop))
+            return
+        names,items=self._sortedSnapshot()
+        if not self.filesystem.caseSensitive:
+            start=None if start is None else start.lower()
+            stop=None if stop is None else stop.lower()
+        first=0 if start is None else bisect.bisect_left(names,start)
+        last=len(names) if stop is None else bisect.bisect_left(names,stop)
+        yield from items[first:last]
+
+    def _pushedDown(self,
+        found:typing.Iterable[ezFs.EzFsItem],
+        accept:typing.Callable[[str],bool]
+        )->typing.Generator[ezFs.EzFsItem,None,None]:
+        """
+        add parents and mount points to what the backend found
+        """
+        mounted={name:target for name,target in self._mountsHere().items()
+            if accept(name)}
+        found=self._adopt(found)
+        if not mounted:
+            yield from found
+            return
+        yield from self._mergeMounts(found,mounted)
+
+    def _sortedSnapshot(self
+        )->typing.Tuple[typing.List[str],typing.List[ezFs.EzFsItem]]:
+        """
+        the listing sorted by name, so it can be searched with bisect
+
+        (taken fresh every time, since the directory can change
+        underneath us in any number of ways)
+
+        :return: (names,items) where names are lowercase if the
+            filesystem is not case sensitive
+        """
+        if self.filesystem.caseSensitive:
+            items=sorted(self.children,key=lambda item:item.name)
+            names=[item.name for item in items]
+        else:
+            items=sorted(self.children,key=lambda item:item.name.lower())
+            names=[item.name.lower() for item in items]
+        return names,items
+
+    def _childNamed(self,
+        name:str,
+        ignoreCase:bool=False
+        )->typing.Optional[ezFs.EzFsItem]:
+        """
+        find a child by name
+
+        :return: the child or None if there is no such thing
+        """
+        if not ignoreCase:
+            found=self._listPrefix(name)
+            if found is not None:
+                for child in self._pushedDown(found,
+                    lambda childName:childName.startswith(name)):
+                    if child.name==name:
+                        return child
+                if self.filesystem.caseSensitive:
+                    return None
+            elif self.filesystem.caseSensitive:
+                # (one pass over the listing beats sorting it)
+                for child in self.children:
+                    if child.name==name:
+                        return child
+                return None
+        name=name.lower()
+        for child in self.children:
+            if child.name.lower()==name:
+                return child
+        return None
 
     def __iter__(self)->typing.Generator[ezFs.EzFsItem,None,None]:
         """
@@ -105,10 +484,19 @@ class EzFsDirectory(ezFs.EzFsItem):
         (idx can be an index or a name)
         """
         if isinstance(idx,int):
-            for i,v in enumerate(self.children):
-                if i==idx:
-                    return v
-            raise IndexError()
+            if idx<0:
+                idx+=self.count()
+                if idx<0:
+                    raise IndexError()
+            # skip whole pages rather than item by item
+            cursor:typing.Optional[str]=None
+            while True:
+                page,cursor=self.listPage(cursor)
+                if idx<len(page):
+                    return page[idx]
+                idx-=len(page)
+                if cursor is None:
+                    raise IndexError()
         else:
             for v in self.children:
                 if v.name==idx:
@@ -159,6 +547,9 @@ class EzFsDirectory(ezFs.EzFsItem):
         if self.url is None:
             raise Exception('Attempting to get relative directory of an empty location') # noqa: E501 # pylint: disable=line-too-long
         subUrl=self.url.relative(subdir)
+        mounted=self.filesystem.getMounted(subUrl)
+        if mounted is not None:
+            return mounted
         return self.filesystem._getFsItem(subUrl)  # noqa: E501 # pylint: disable=line-too-long,disable=protected-access
     relative=getRelative
 
@@ -179,14 +570,27 @@ class EzFsDirectory(ezFs.EzFsItem):
 
     def open(self,
         path:UrlCompatible,
-        accessMode:typing.Optional[str]='rw'
-        )->ezFs.EzFsFile:
+        accessMode:typing.Optional[str]='rw',
+        compression:typing.Optional[str]=None
+        )->typing.Union[ezFs.EzFsFile,typing.IO]:
         """
         opens the file at the given path
+
+        :param compression: 'gzip', 'xz', 'bz2', or 'infer' to go by
+            the file extension, in which case this returns a python
+            file object that compresses/decompresses as it goes
+            (see compression.py)
+
+        If the filesystem is THREAD_SAFE, this always returns a python
+        file object with a position of its own (see handles.py), which
+        can be for reading or for writing, but not both (so the access
+        mode has to be given).
         """
         fileObj=self.get(path)
         if not isinstance(fileObj,ezFs.EzFsFile):
             raise ezFs.FileAccessException(path)
+        if compression is not None or fileObj.filesystem.THREAD_SAFE:
+            return ezFs.openCompressed(fileObj,accessMode or 'r',compression)
         return fileObj.open(accessMode)
 
     def delete(self, # pylint: disable=arguments-differ
@@ -269,12 +673,15 @@ class EzFsDirectory(ezFs.EzFsItem):
         """
         Find all files that match a given regular expression
         """
-        if ignoreCase:
-            expression=re.compile(expression,re.IGNORECASE)
-        else:
-            expression=re.compile(expression)
+        if isinstance(expression,str):
+            expression=re.compile(expression,re.IGNORECASE if ignoreCase else 0) # noqa: E501 # pylint: disable=line-too-long
+        # only list what could possibly match
+        # (the pattern's own flags, since it may have been compiled already)
+        prefix='' if expression.flags&re.IGNORECASE \
+            else _regexPrefix(expression.pattern)
+        candidates=self.listPrefix(prefix) if prefix else self.children
         # test each child against regular expression
-        for item in self.children:
+        for item in candidates:
             if not expression.match(item.name):
                 continue
             # if it is the end, add it, if there is more, keep searching deeper
@@ -295,6 +702,9 @@ class EzFsDirectory(ezFs.EzFsItem):
         works just like the built-in glob library in that it accepts the tricks
             *, ?, and character ranges expressed with []
 
+        Only the children that start with the literal part of each
+        path segment are listed (see listPrefix())
+
         idx is used internally to handle complex expressions like ./*/bin/*.exe
         """
         if isinstance(expression,list):
@@ -303,44 +713,133 @@ class EzFsDirectory(ezFs.EzFsItem):
             # convert string expression into a list
             if os.sep!='/':
                 expression=expression.replace(os.sep,'/')
-            while expression.startswith('./\\'):
+            while expression.startswith('./'):
                 expression=expression[2:]
             pathExpr=expression.split('/')
+        if len(pathExpr)<=idx:
+            return
         exp=pathExpr[idx]
         isLast=len(pathExpr)<=idx+1
-        isGlob=exp.find('?')>=0 or exp.find('*')>=0 or exp.find('[')>=0
-        if isGlob:
+        if not exp or exp=='.':
+            # indicates current directory
+            if isLast:
+                yield self
+            else:
+                yield from self.glob(pathExpr,ignoreCase,idx+1)
+            return
+        wildcard=_GLOB_WILDCARD.search(exp)
+        if wildcard is not None:
             # convert glob expression to regular expression
-            exp=re.escape(exp)
-            exp=exp.replace('\\\'\\*\\\'','.*?').replace('\\?','.?')
-            exp=exp.replace('\\[','[').replace('\\]',']').replace('\\-','-')
-            yield from self.regexFind(exp,ignoreCase,idx)
+            if ignoreCase or not self.filesystem.caseSensitive:
+                regex=re.compile(fnmatch.translate(exp),re.IGNORECASE)
+            else:
+                regex=re.compile(fnmatch.translate(exp))
+            prefix=exp[:wildcard.start()]
+            if prefix and not ignoreCase:
+                candidates=self.listPrefix(prefix)
+            else:
+                candidates=self.children
+            for item in candidates:
+                if not regex.match(item.name):
+                    continue
+                if isLast:
+                    yield item
+                elif isinstance(item,EzFsDirectory):
+                    yield from item.glob(pathExpr,ignoreCase,idx+1)
         else:
             # simply find the next child
-            child:typing.Optional[ezFs.EzFsItem]=None
-            if ignoreCase:
-                exp=exp.lower()
-                for c in self.children:
-                    name=c.name
-                    if name.lower()==exp:
-                        child=c
-                        break
-            elif exp is not None:
-                for c in self.children:
-                    if c==exp:
-                        child=c
-                        break
+            child=self._childNamed(exp,ignoreCase)
             # if it is the end, add it, if there is more, keep searching deeper
             if child is not None:
                 if isLast:
-                    yield from self.children
+                    yield child
                 elif isinstance(child,EzFsDirectory):
-                    yield from child.glob(expression,ignoreCase,idx+1)
-    find=glob
+                    yield from child.glob(pathExpr,ignoreCase,idx+1)
+
+    def find(self,
+        expression:typing.Union[str,typing.List[str],None]=None,
+        ignoreCase:bool=False,
+        where:typing.Union["ezFs.Predicate",typing.Callable[[ezFs.EzFsItem],bool],None]=None, # noqa: E501 # pylint: disable=line-too-long
+        prune:typing.Optional["ezFs.Predicate"]=None
+        )->typing.Generator[ezFs.EzFsItem,None,None]:
+        """
+        find items by glob expression, by predicate, or both
+
+        eg:
+            find('*.txt')
+            find(where=ezFs.SizeBetween(1<<20)&ezFs.TypeIs('file'))
+
+        :param expression: a glob expression (see glob()).  Without one,
+            everything under this directory is searched.
+        :param where: a predicate (see predicates.py) or a plain
+            function (item)->bool
+        :param prune: directories that match this are not gone into
+            (eg ezFs.NameMatches('.git'))
+        """
+        predicate=ezFs.asPredicate(where)
+        if expression is not None:
+            if isinstance(expression,str):
+                expression=expression.replace(os.sep,'/').split('/')
+            # (every match is as deep as the expression is long)
+            depth=sum(1 for exp in expression if exp and exp!='.')
+            for item in self.glob(expression,ignoreCase):
+                if predicate is None or predicate.matches(item,depth):
+                    yield item
+            return
+        if predicate is None:
+            predicate=ezFs.AllOf()
+        mounts=getattr(self._filesystem,'_mounts',None)
+        if not mounts:
+            found=self._find(predicate,prune)
+            if found is not None:
+                yield from found
+                return
+        yield from self._findAll(predicate,prune)
+
+    def _findAll(self,
+        predicate:"ezFs.Predicate",
+        prune:typing.Optional["ezFs.Predicate"]
+        )->typing.Generator[ezFs.EzFsItem,None,None]:
+        """
+        find by walking the tree (breadth-first)
+        """
+        seen:typing.Set[ezFs.EzFsItem]={self}
+        todo:typing.Deque[typing.Tuple[EzFsDirectory,int]]=collections.deque(
+            [(self,1)])
+        while todo:
+            directory,depth=todo.popleft()
+            descend=predicate.canDescend(depth)
+            for item in directory.children:
+                if item in seen:
+                    continue
+                seen.add(item)
+                if predicate.matches(item,depth):
+                    yield item
+                if descend and isinstance(item,EzFsDirectory) \
+                    and (prune is None or not prune.matches(item,depth)):
+                    todo.append((item,depth+1))
+
+    def _find(self,
+        where:"ezFs.Predicate",
+        prune:typing.Optional["ezFs.Predicate"]
+        )->typing.Optional[typing.Iterable[ezFs.EzFsItem]]:
+        """
+        find everything under this directory that matches a predicate
+
+        Backends that can filter on the server side should implement
+        this by translating the predicate (see predicates.py).
+        Anything the server cannot filter on must be checked here with
+        where.matches(item,depth), because the results are not checked
+        again.
+
+        :return: matching items, or None if the backend cannot do it
+            (and the tree must be walked)
+        """
+        return None
 
     def getAll(self,
         subdir:typing.Optional[str]=None,
-        _tape:typing.Optional[typing.Dict[ezFs.EzFsItem,None]]=None
+        _tape:typing.Optional[typing.Set[ezFs.EzFsItem]]=None
         )->typing.Generator[ezFs.EzFsItem,None,None]:
         """
         retrieves all children, grandchildren, etc
@@ -349,29 +848,26 @@ class EzFsDirectory(ezFs.EzFsItem):
         guranteed to only return each item once (and will not
         include the starting directory)
 
-        :parameter _tape: # ordered dict used internally for traversal
-
+        :parameter _tape: # items already seen, used internally for traversal
         """
-        weAreTopParent=False
         if _tape is None:
-            _tape={}
-            weAreTopParent=True
+            _tape=set()
         target:ezFs.EzFsItem=self
         if subdir is not None:
             target=self.relative(subdir)
             if not isinstance(target,EzFsDirectory):
                 return
-        _tape[target]=None
-        # add all children to the search list
-        for item in self.children:
-            if item not in _tape:
-                _tape[item]=None
-        if weAreTopParent:
-            for item in _tape:
+        _tape.add(target)
+        todo=collections.deque([target])
+        while todo:
+            directory=todo.popleft()
+            for item in directory.children:
+                if item in _tape:
+                    continue
+                _tape.add(item)
                 yield item
                 if isinstance(item,EzFsDirectory):
-                    # it appends its child items to the end of the tape
-                    item.getAll(None,_tape)
+                    todo.append(item)
 
     def get(self,
         path:typing.Union[UrlCompatible,typing.List[str]],
@@ -400,22 +896,8 @@ class EzFsDirectory(ezFs.EzFsItem):
             if self.parent is None:
                 raise FileNotFoundError('attempt to traverse past root')
             return self.parent.get(path,idx+1)
-        children:typing.List[ezFs.EzFsItem]=list(self.children)
-        child:typing.Optional[ezFs.EzFsItem]=None
-        # try the simple match first
-        for c in children:
-            if pathStep==c.name:
-                child=c
-            break
-        if child is None and not self.filesystem.caseSensitive:
-            # need to do a case-insensitive search
-            pathStep=pathStep.lower()
-            for c in children:
-                if str(c.name).lower()==pathStep:
-                    child=c
-                    break
+        child=self._childNamed(pathStep)
         if child is None: # nothing matched!
-            print(f'not found {pathStep} in {[c.name for c in children]}')
             raise FileNotFoundError(os.sep.join(path))
         if len(path)==idx+1:
             # if it is the last item in the path, then this
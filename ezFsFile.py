@@ -6,6 +6,8 @@ A filesystem item representing a file.
 It also doubles as a file-like object
 """
 import typing
+import functools
+import concurrent.futures
 from abc import abstractmethod
 from typing_extensions import Buffer
 from paths import MimeTypeCompatible,UrlCompatible
@@ -18,6 +20,26 @@ class EzFsFile(ezFs.EzFsItem,typing.IO):
 
     It also doubles as a file-like object
     """
+    __slots__=('_isOpen','_fileAccessMode','_pending','_pendingBytes',
+        '_readAhead')
+
+    # send ranged reads through the shared BlockCache
+    # (turn this off for backends where reads are already cheap)
+    BLOCK_CACHE:bool=True
+
+    # small writes to an open file are held back and sent to the
+    # backend together once there are this many bytes, or on
+    # flush()/close() (0=write straight through)
+    WRITE_BUFFER_SIZE:int=64*1024
+
+    # readRanges() reads ranges this close together as one
+    # (reading the gap is cheaper than another round trip)
+    RANGE_MERGE_GAP:int=32*1024
+
+    # most bytes to read ahead of sequential reads of an open file
+    # (see readAhead.py, 0=do not read ahead)
+    READ_AHEAD_MAX:int=4<<20
+
     def __init__(self,
         url:UrlCompatible,
         filesystem:"ezFs.EzFsFilesystem"):
@@ -25,6 +47,38 @@ class EzFsFile(ezFs.EzFsItem,typing.IO):
         ezFs.EzFsItem.__init__(self,url,filesystem)
         self._isOpen:bool=False
         self._fileAccessMode:str='rw'
+        self._pending:typing.Optional[typing.List[bytes]]=None
+        self._pendingBytes:int=0
+        self._readAhead:typing.Optional[ezFs.ReadAhead]=None
+
+    def __init_subclass__(cls,**kwargs):
+        """
+        Keep the BlockCache and write buffer right, no matter how the
+        derived class reads and writes
+
+        Sized reads of an open file go through the cache (if the
+        class supports ranged reads) and anything that changes the
+        file throws away what is cached for it.  Small writes to an
+        open file are buffered, and anything that could see them
+        sends them to the backend first.
+        """
+        super().__init_subclass__(**kwargs)
+        for name in ('write','_writeRange','truncate'):
+            fn=cls.__dict__.get(name)
+            if fn is not None and not getattr(fn,'__isabstractmethod__',False): # noqa: E501 # pylint: disable=line-too-long
+                setattr(cls,name,_invalidating(fn))
+        for name in ('read','seek','tell','open','close','flush','truncate',
+            '_writeRange','_readRange','_readRanges'):
+            fn=cls.__dict__.get(name)
+            if fn is not None and not getattr(fn,'__isabstractmethod__',False): # noqa: E501 # pylint: disable=line-too-long
+                setattr(cls,name,_flushingFirst(fn))
+        fn=cls.__dict__.get('write')
+        if fn is not None and not getattr(fn,'__isabstractmethod__',False):
+            cls._unbufferedWrite=fn # type: ignore
+            setattr(cls,'write',_bufferedWrite(fn))
+        fn=cls.__dict__.get('read')
+        if fn is not None and not getattr(fn,'__isabstractmethod__',False):
+            setattr(cls,'read',_cachedRead(fn))
 
     @property
     def isDir(self)->bool:
@@ -124,17 +178,22 @@ class EzFsFile(ezFs.EzFsItem,typing.IO):
         """
         For compatability with IO
         """
-        buf:typing.List[str]=[]
+        buf:typing.List[typing.Union[str,bytes]]=[]
         i=0
         while True:
             c=self.read(1)
-            if c=='\n':
+            if not c:
+                break # end of file
+            buf.append(c)
+            if c in ('\n',b'\n'):
                 break
             if __limit is not None:
                 i+=1
                 if i>=__limit:
                     break
-        return ''.join(buf)
+        if buf and isinstance(buf[0],bytes):
+            return b''.join(buf).decode('utf-8','ignore') # type: ignore
+        return ''.join(buf) # type: ignore
 
     def readlines(self,__hint:int=0)->list[str]:
         """
@@ -143,13 +202,89 @@ class EzFsFile(ezFs.EzFsItem,typing.IO):
         ret=[]
         i=0
         while True:
-            ret.append(self.readline())
-            if __hint is not None:
-                i+=1
+            line=self.readline()
+            if not line:
+                break
+            ret.append(line)
+            if __hint:
+                i+=len(line)
                 if i>=__hint:
                     break
         return ret
 
+    def _iterChunks(self,chunkSize:int)->typing.Iterator[bytes]:
+        """
+        read the file chunkSize bytes at a time
+
+        If the file is already open, this carries on from the current
+        position, otherwise it is opened for the duration.
+        """
+        wasOpen=self._isOpen
+        mode=self.fileAccessMode
+        if not wasOpen:
+            self.open('rb')
+        try:
+            while True:
+                data=self.read(chunkSize)
+                if not data:
+                    break
+                if isinstance(data,str):
+                    data=data.encode('utf-8')
+                yield data
+        finally:
+            if not wasOpen:
+                self.close()
+                self.fileAccessMode=mode
+
+    def iterText(self,
+        encoding:str='utf-8',
+        errors:str='ignore',
+        newline:typing.Optional[str]=None,
+        chunkSize:typing.Optional[int]=None
+        )->typing.Iterator[str]:
+        """
+        read the file as text, a chunk at a time, so that even a file
+        bigger than memory can be decoded (see textStream.py)
+
+        :param newline: the same as for open()
+        :param chunkSize: bytes to read at a time (default=TEXT_CHUNK_SIZE)
+        """
+        return ezFs.decodeChunks(
+            self._iterChunks(chunkSize or ezFs.TEXT_CHUNK_SIZE),
+            encoding,errors,newline)
+
+    def iterLines(self,
+        encoding:str='utf-8',
+        errors:str='ignore',
+        newline:typing.Optional[str]=None,
+        maxLineLength:typing.Optional[int]=None,
+        chunkSize:typing.Optional[int]=None
+        )->typing.Iterator[str]:
+        """
+        read the file as lines of text, without ever holding much more
+        than a chunk in memory
+
+        :param newline: the same as for open()
+        :param maxLineLength: cut lines longer than this into pieces
+        :param chunkSize: bytes to read at a time (default=TEXT_CHUNK_SIZE)
+        """
+        return ezFs.splitLines(
+            self.iterText(encoding,errors,newline,chunkSize),
+            newline,maxLineLength)
+
+    def openText(self,
+        encoding:str='utf-8',
+        errors:str='ignore',
+        newline:typing.Optional[str]=None
+        )->typing.TextIO:
+        """
+        open the file for reading as a python text stream, decoded
+        incrementally behind a large read buffer
+        (for readline(), iterating over lines, and so on)
+        """
+        return typing.cast(typing.TextIO,ezFs.openCompressed(self,'rt',None,
+            encoding=encoding,errors=errors,newline=newline))
+
     @abstractmethod
     def write(self, # type: ignore # pylint: disable=arguments-renamed
         data:typing.Union[bytes,str],
@@ -170,9 +305,161 @@ class EzFsFile(ezFs.EzFsItem,typing.IO):
         )->int:
         """
         Append the data to the file
+
+        If the file is open in 'a' mode, small appends are buffered
+        and sent to the backend together (see WRITE_BUFFER_SIZE).
         """
         return self.write(data,encoding,errors,mimeType,True)
 
+    @property
+    def supportsRangedWrite(self)->bool:
+        """
+        can part of this file be overwritten without rewriting the
+        whole thing? (see writeRange())
+        """
+        return type(self)._writeRange is not EzFsFile._writeRange # pylint: disable=comparison-with-callable # noqa: E501 # pylint: disable=line-too-long
+
+    def writeRange(self,offset:int,data:bytes)->int:
+        """
+        overwrite part of the file in place, extending it if need be
+        (nothing after the data is touched)
+
+        :raises NotImplementedError: if not supportsRangedWrite
+        """
+        self._writeRange(offset,data)
+        return len(data)
+
+    def _writeRange(self,offset:int,data:bytes)->None:
+        """
+        overwrite part of the file in place
+
+        derived classes that can do this should implement it, along
+        with truncate()
+        """
+        raise NotImplementedError(
+            f'{self.__class__.__name__} does not support ranged writes')
+
+    @property
+    def supportsRangedRead(self)->bool:
+        """
+        can part of this file be read without opening and seeking?
+        (see readRange())
+        """
+        return type(self)._readRange is not EzFsFile._readRange # pylint: disable=comparison-with-callable # noqa: E501 # pylint: disable=line-too-long
+
+    def readRange(self,offset:int,numBytes:int)->bytes:
+        """
+        read part of the file, without moving the current position
+
+        If the backend supports ranged reads, this goes through the
+        shared BlockCache, so that many small reads cost few round trips.
+        """
+        if self._pending:
+            self._flushPending()
+        if self.supportsRangedRead:
+            if self.BLOCK_CACHE:
+                return ezFs.BlockCache.shared().read(self,offset,numBytes)
+            return self._readRange(offset,numBytes)
+        if self._isOpen:
+            position=self.tell()
+            try:
+                self.seek(offset)
+                data=self.read(numBytes)
+            finally:
+                self.seek(position)
+        else:
+            mode=self.fileAccessMode
+            self.open('rb')
+            try:
+                self.seek(offset)
+                data=self.read(numBytes)
+            finally:
+                self.close()
+                self.fileAccessMode=mode
+        if isinstance(data,str):
+            data=data.encode('utf-8')
+        return data
+
+    def _readRange(self,offset:int,numBytes:int)->bytes:
+        """
+        read part of the file in a single backend call
+        (may return less at the end of the file)
+
+        derived classes that can do this should implement it
+        """
+        raise NotImplementedError(
+            f'{self.__class__.__name__} does not support ranged reads')
+
+    def readRanges(self,
+        ranges:typing.Iterable[typing.Tuple[int,int]],
+        workers:int=8
+        )->typing.List[memoryview]:
+        """
+        read several parts of the file at once, without moving the
+        current position (eg a footer plus some column chunks)
+
+        Ranges that overlap or are within RANGE_MERGE_GAP of each
+        other are read as one.  Then, if the backend can read many
+        ranges in one request (see _readRanges()), that is what
+        happens, otherwise the merged ranges are read concurrently.
+
+        :param ranges: [(offset,numBytes)]
+        :param workers: most ranges to read at the same time
+        :return: a memoryview for each range, in the same order
+            (shorter than asked for past the end of the file)
+        """
+        ranges=list(ranges)
+        # merge into [start,end,[indices of the ranges inside]]
+        merged:typing.List[typing.List]=[]
+        for i in sorted(range(len(ranges)),key=lambda i:ranges[i][0]):
+            offset,numBytes=ranges[i]
+            end=offset+max(numBytes,0)
+            if merged and offset<=merged[-1][1]+self.RANGE_MERGE_GAP:
+                merged[-1][1]=max(merged[-1][1],end)
+                merged[-1][2].append(i)
+            else:
+                merged.append([offset,end,[i]])
+        spans=[(start,end-start) for start,end,_ in merged]
+        datas:typing.Optional[typing.List[bytes]]=None
+        if len(spans)>1:
+            if self._pending:
+                self._flushPending()
+            datas=self._readRanges(spans)
+            if datas is None and self.supportsRangedRead and workers>1:
+                with concurrent.futures.ThreadPoolExecutor(
+                    min(workers,len(spans))) as pool:
+                    datas=list(pool.map(lambda span:self.readRange(*span),spans)) # noqa: E501 # pylint: disable=line-too-long
+        if datas is None:
+            datas=[self.readRange(*span) for span in spans]
+        ret:typing.List[memoryview]=[memoryview(b'')]*len(ranges)
+        for (start,_,indices),data in zip(merged,datas):
+            view=memoryview(data)
+            for i in indices:
+                offset,numBytes=ranges[i]
+                ret[i]=view[offset-start:offset-start+max(numBytes,0)]
+        return ret
+
+    def _readRanges(self, # pylint: disable=unused-argument
+        ranges:typing.List[typing.Tuple[int,int]]
+        )->typing.Optional[typing.List[bytes]]:
+        """
+        read many parts of the file in a single backend call
+        (eg an http multipart byte range request)
+
+        derived classes that can do this should implement it
+
+        :param ranges: [(offset,numBytes)] in order, not overlapping
+        :return: the data for each range, or None if the backend
+            cannot do it
+        """
+        return None
+
+    def _validator(self)->"ezFs.Validator":
+        """
+        what the BlockCache looks at to tell whether the file changed
+        """
+        return (self.size,self.mtime,self.etag)
+
     def writelines(self,
         __lines:typing.Union[
             typing.Iterable[str],
@@ -182,8 +469,48 @@ class EzFsFile(ezFs.EzFsItem,typing.IO):
         )->None:
         """
         For compatability with IO
+
+        Lines are written one at a time (through the write buffer),
+        so the whole thing never has to be in memory at once.
+        If the file is not open, it is replaced.
+        """
+        if self._isOpen:
+            self._writeLines(__lines)
+            return
+        mode=self.fileAccessMode
+        self.open('wb')
+        try:
+            self._writeLines(__lines)
+        finally:
+            self.close()
+            self.fileAccessMode=mode
+
+    def _writeLines(self,
+        lines:typing.Iterable[typing.Any]
+        )->None:
+        """
+        write lines to the open file, with a newline between each
+        """
+        separator=b''
+        for line in lines:
+            if isinstance(line,(bytes,bytearray,memoryview)):
+                line=bytes(line)
+            else:
+                line=str(line).encode('utf-8')
+            self.write(separator+line)
+            separator=b'\n'
+
+    def _flushPending(self)->None:
+        """
+        send any buffered writes to the backend
         """
-        self.write('\n'.join(str(line) for line in __lines))
+        pending=self._pending
+        if not pending:
+            return
+        self._pending=None
+        self._pendingBytes=0
+        data=pending[0] if len(pending)==1 else b''.join(pending)
+        type(self)._unbufferedWrite(self,data) # type: ignore # pylint: disable=no-member
 
     def seekable(self)->bool:
         """
@@ -265,3 +592,94 @@ class EzFsFile(ezFs.EzFsItem,typing.IO):
         """
         Complete all i/o operations now.
         """
+
+
+def _invalidating(fn:typing.Callable)->typing.Callable:
+    """
+    wrap something that changes a file so that it also throws away
+    whatever the BlockCache has for it
+    """
+    @functools.wraps(fn)
+    def invalidating(self,*args,**kwargs):
+        try:
+            return fn(self,*args,**kwargs)
+        finally:
+            if self.BLOCK_CACHE:
+                ezFs.BlockCache.shared().invalidate(self)
+    return invalidating
+
+
+def _cachedRead(fn:typing.Callable)->typing.Callable:
+    """
+    wrap read() so that sized reads of an open file go through
+    the BlockCache (reading ahead if they are sequential)
+    """
+    @functools.wraps(fn)
+    def read(self,numBytes=None,encoding=None,errors='ignore',mimeType=None):
+        # only the outermost read() uses the cache, since derived
+        # classes usually call their base class's read()
+        if numBytes is None or numBytes<0 or not self._isOpen \
+            or not self.BLOCK_CACHE or type(self).read is not read \
+            or not self.supportsRangedRead:
+            return fn(self,numBytes,encoding,errors,mimeType)
+        position=self.tell()
+        readAhead=self._readAhead
+        if readAhead is None and self.READ_AHEAD_MAX>0:
+            readAhead=ezFs.ReadAhead()
+            self._readAhead=readAhead
+        if readAhead is not None:
+            readAhead.wait(position,numBytes)
+        data=ezFs.BlockCache.shared().read(self,position,numBytes)
+        if readAhead is not None:
+            readAhead.advance(self,position,numBytes,len(data))
+        self.seek(position+len(data))
+        if encoding is not None:
+            return data.decode(encoding,errors)
+        return data
+    return read
+
+
+def _flushingFirst(fn:typing.Callable)->typing.Callable:
+    """
+    wrap something that could see (or be confused by) buffered writes
+    so that they are sent to the backend first
+    """
+    @functools.wraps(fn)
+    def flushingFirst(self,*args,**kwargs):
+        if getattr(self,'_pending',None):
+            self._flushPending()
+        return fn(self,*args,**kwargs)
+    return flushingFirst
+
+
+def _bufferedWrite(fn:typing.Callable)->typing.Callable:
+    """
+    wrap write() so that small writes to an open file are held
+    back and sent to the backend together
+    """
+    @functools.wraps(fn)
+    def write(self,data,encoding='utf-8',errors='ignore',mimeType=None,append=False): # noqa: E501 # pylint: disable=line-too-long
+        bufferSize=self.WRITE_BUFFER_SIZE
+        # (only the outermost write() buffers, and only writes that
+        # go where the file position says)
+        if bufferSize<=0 or not self._isOpen or type(self).write is not write \
+            or (append and 'a' not in self._fileAccessMode):
+            if self._pending:
+                self._flushPending()
+            return fn(self,data,encoding,errors,mimeType,append)
+        if isinstance(data,str):
+            data=data.encode(encoding,errors)
+        else:
+            data=bytes(data) # (the caller may reuse their buffer)
+        if len(data)>=bufferSize:
+            if self._pending:
+                self._flushPending()
+            return fn(self,data,encoding,errors,mimeType,append)
+        if self._pending is None:
+            self._pending=[]
+        self._pending.append(data)
+        self._pendingBytes+=len(data)
+        if self._pendingBytes>=bufferSize:
+            self._flushPending()
+        return len(data)
+    return write
@@ -4,11 +4,20 @@
 A filesystem
 """
 import typing
+import contextvars
+import weakref
 from abc import abstractmethod
 from paths import asUrl,UrlCompatible,URL,MimeTypeCompatible
 import ezFs
 
 
+# working directories changed to in THREAD_SAFE mode, for every
+# filesystem, in this context (copied whenever it changes)
+#   id(filesystem):(weakref to the filesystem,its url generation,url)
+_workingDirectories:contextvars.ContextVar[typing.Dict[int,typing.Tuple[weakref.ref,int,str]]]=contextvars.ContextVar( # noqa: E501 # pylint: disable=line-too-long
+    'ezFsWorkingDirectories',default={})
+
+
 class EzFsFilesystem(ezFs.EzFsDirectory):
     """
     A filesystem
@@ -20,6 +29,20 @@ class EzFsFilesystem(ezFs.EzFsDirectory):
 
     URL_PROTOCOLS:typing.List[str]=[] # list of url protocols we support ('http://', 'ftp://', etc) # noqa: E501 # pylint: disable=line-too-long
 
+    # our children come from the working directory, which already
+    # includes mount points
+    MERGE_MOUNTS:bool=False
+
+    # most bytes that may be read ahead from this filesystem at once
+    # (see readAhead.py)
+    PREFETCH_MAX_BYTES:int=32<<20
+
+    # share this filesystem between threads (see handles.py):
+    # changeDirectory() only changes the working directory for the
+    # current thread/context, and open() returns an independent
+    # handle with its own position rather than the file item itself
+    THREAD_SAFE:bool=False
+
     def __init__(self,
         url:typing.Optional[UrlCompatible]=None,
         caseSensitive:bool=True):
@@ -30,7 +53,43 @@ class EzFsFilesystem(ezFs.EzFsDirectory):
         ezFs.EzFsDirectory.__init__(self,url,self)
         self.caseSensitive:bool=caseSensitive # are filenames case-sensitive?
         self._workingDirectory:typing.Optional[ezFs.EzFsDirectory]=None
+        # url:directory for the working directories of THREAD_SAFE
+        # contexts (so the contexts only need to hold on to the url)
+        self._contextDirectories:typing.Dict[str,ezFs.EzFsDirectory]={}
+        self._urlGeneration:int=0
         self._ezFs:typing.Optional[ezFs.EzFs]=None
+        self._mounts:ezFs.MountTable=ezFs.MountTable()
+
+    def _config(self)->typing.Tuple[typing.Tuple,typing.Dict[str,typing.Any]]: # noqa: E501 # pylint: disable=line-too-long
+        """
+        what this filesystem was created with, so that another
+        process can create the same one
+
+        derived classes with different constructor arguments should
+        implement this
+
+        :return: (args,kwargs) for the constructor
+        """
+        return ((str(self.url),),{})
+
+    def _poolable(self)->bool:
+        """
+        can every filesystem with the same _config() share the one
+        unpickled filesystem (see processes.py)
+
+        derived classes should return False if two of them with the
+        same _config() are not the same filesystem
+        """
+        return True
+
+    def __reduce__(self)->typing.Tuple:
+        """
+        pickle as just the class and its _config() (see processes.py)
+        """
+        from .processes import _rehydrateFilesystem
+        args,kwargs=self._config()
+        return (_rehydrateFilesystem,
+            (type(self),args,kwargs,self._poolable()))
 
     @property
     def isRoot(self)->bool:
@@ -46,13 +105,17 @@ class EzFsFilesystem(ezFs.EzFsDirectory):
 
         Setting it will cause the working directory to be reset
         """
-        if self._url is None:
+        url=ezFs.EzFsItem.url.fget(self) # type: ignore
+        if url is None:
             raise FileNotFoundError('File not found: URL=None')
-        return self._url
+        return url
     @url.setter
     def url(self,url:UrlCompatible):
-        self._url=URL(url)
+        self._setUrl(URL(url))
         self._workingDirectory=None # need to re-fetch before use
+        # (and forget what every context changed to)
+        self._urlGeneration+=1
+        self._contextDirectories={}
 
     @classmethod
     def supportsUrl(cls,url:UrlCompatible)->bool:
@@ -69,12 +132,21 @@ class EzFsFilesystem(ezFs.EzFsDirectory):
 
     def open(self,
         path:UrlCompatible,
-        accessMode:typing.Optional[str]=None
-        )->ezFs.EzFsFile:
+        accessMode:typing.Optional[str]=None,
+        compression:typing.Optional[str]=None
+        )->typing.Union[ezFs.EzFsFile,typing.IO]:
         """
         pass-through to working directory
         """
-        return self.workingDirectory.open(path,accessMode)
+        mounted=self.getMounted(path)
+        if mounted is not None:
+            if not isinstance(mounted,ezFs.EzFsFile):
+                raise ezFs.FileAccessException(path)
+            if compression is not None or mounted.filesystem.THREAD_SAFE:
+                return ezFs.openCompressed(mounted,accessMode or 'r',
+                    compression)
+            return mounted.open(accessMode)
+        return self.workingDirectory.open(path,accessMode,compression)
 
     def rename(self, # type: ignore # pylint: disable=signature-differs
         newName:UrlCompatible,
@@ -90,6 +162,36 @@ class EzFsFilesystem(ezFs.EzFsDirectory):
         """
         return self.workingDirectory.regexFind(expression,ignoreCase,idx)
 
+    def find(self,
+        expression:typing.Union[str,typing.List[str],None]=None,
+        ignoreCase:bool=False,
+        where:typing.Union["ezFs.Predicate",typing.Callable[[ezFs.EzFsItem],bool],None]=None, # noqa: E501 # pylint: disable=line-too-long
+        prune:typing.Optional["ezFs.Predicate"]=None
+        )->typing.Generator[ezFs.EzFsItem,None,None]:
+        """
+        pass-through to working directory
+        """
+        return self.workingDirectory.find(expression,ignoreCase,where,prune)
+
+    def hashMany(self,
+        items:typing.Optional[typing.Iterable[ezFs.EzFsItem]]=None,
+        algorithm:str='sha256',
+        cache:typing.Optional["ezFs.HashCache"]=None,
+        workers:int=8,
+        progress:typing.Optional["ezFs.Progress"]=None
+        )->typing.Generator[typing.Tuple[ezFs.EzFsItem,typing.Optional[str]],None,None]: # noqa: E501 # pylint: disable=line-too-long
+        """
+        hash a lot of files in parallel
+
+        :param items: what to hash (default=everything under the
+            working directory)
+        :return: (item,digest) as each file finishes
+            (digest is None if the file could not be read)
+        """
+        if items is None:
+            items=self.getAll()
+        return ezFs.hashMany(items,algorithm,cache,workers,progress)
+
     @property
     def flat(self)->typing.Iterable[ezFs.EzFsItem]:
         """
@@ -99,7 +201,7 @@ class EzFsFilesystem(ezFs.EzFsDirectory):
         return self.getAll()
     def getAll(self,
         subdir:typing.Optional[str]=None,
-        _tape:typing.Optional[typing.Dict[ezFs.EzFsItem,None]]=None
+        _tape:typing.Optional[typing.Set[ezFs.EzFsItem]]=None
         )->typing.Generator[ezFs.EzFsItem,None,None]:
         """
         retrieves all children, grandchildren, etc
@@ -124,8 +226,104 @@ class EzFsFilesystem(ezFs.EzFsDirectory):
         """
         pass-through to working directory
         """
+        if not isinstance(path,list):
+            mounted=self.getMounted(path)
+            if mounted is not None:
+                return mounted
         return self.workingDirectory.get(path,idx)
 
+    def _mountKey(self,
+        url:UrlCompatible,
+        fold:bool=True
+        )->typing.List[str]:
+        """
+        turn a url into the list of segments used by the mount table
+
+        :param fold: lower-case the names if we are not case-sensitive
+            (otherwise they are left as they are, but still line up
+            with the folded ones)
+        """
+        urlObj=asUrl(url)
+        segments:typing.List[str]=[urlObj.protocol or '']
+        for name in str(urlObj.path or '').replace('\\','/').split('/'):
+            if not name or name=='.':
+                continue
+            if name=='..':
+                if len(segments)>1:
+                    segments.pop()
+                continue
+            segments.append(name if self.caseSensitive or not fold else name.lower()) # noqa: E501 # pylint: disable=line-too-long
+        return segments
+
+    def _absoluteUrl(self,location:UrlCompatible)->URL:
+        """
+        get the full url of a location relative to the working directory
+        """
+        if isinstance(location,URL) or '://' in str(location):
+            return asUrl(location)
+        return self.workingDirectory.url.relative(location) # type: ignore
+
+    def addMount(self,
+        location:UrlCompatible,
+        directory:ezFs.EzFsDirectory
+        )->URL:
+        """
+        mount a directory (usually from some other filesystem)
+        at a location on this filesystem
+
+        Afterwards it shows up in listings, walk(), glob(), etc and
+        anything get() or open() beneath the location is routed to it.
+
+        :param location: where to mount it
+        :param directory: what to mount (may also be an entire filesystem)
+        :return: url of the mount point
+        """
+        url=self._absoluteUrl(location)
+        self._mounts.add(self._mountKey(url),directory)
+        return url
+
+    def unmount(self,location:UrlCompatible)->ezFs.EzFsDirectory:
+        """
+        remove a mount point
+
+        :return: the directory that had been mounted there
+        """
+        return self._mounts.remove(self._mountKey(self._absoluteUrl(location))) # noqa: E501 # pylint: disable=line-too-long
+
+    @property
+    def mounts(self)->typing.Dict[str,ezFs.EzFsDirectory]:
+        """
+        everything mounted on this filesystem as {path:directory}
+        """
+        return {'/'+'/'.join(segments[1:]):target
+            for segments,target in self._mounts}
+
+    def getMounted(self,
+        path:UrlCompatible
+        )->typing.Optional[ezFs.EzFsItem]:
+        """
+        get an item from whatever is mounted at the path, if anything
+
+        This is a longest-prefix match on the mount table,
+        so it costs O(path depth).
+
+        :return: the item or None if the path is not under any mount point
+        """
+        if not self._mounts:
+            return None
+        url=self._absoluteUrl(path)
+        segments=self._mountKey(url)
+        target,depth=self._mounts.longestPrefix(segments)
+        if target is None:
+            return None
+        if depth==len(segments):
+            return ezFs.EzFsMountPoint(url,self,target)
+        # (matched on folded names, but the mounted filesystem gets
+        # the names as they were given)
+        if not self.caseSensitive:
+            segments=self._mountKey(url,False)
+        return target.get(segments[depth:])
+
     @abstractmethod
     def _getFsItem(self,url:UrlCompatible)->ezFs.EzFsItem:
         """
@@ -176,6 +374,38 @@ class EzFsFilesystem(ezFs.EzFsDirectory):
         """
         return self.workingDirectory.children
 
+    def listPage(self,
+        cursor:typing.Optional[str]=None,
+        limit:typing.Optional[int]=None
+        )->typing.Tuple[typing.List[ezFs.EzFsItem],typing.Optional[str]]:
+        """
+        pass-through to working directory
+        """
+        return self.workingDirectory.listPage(cursor,limit)
+
+    def count(self)->int:
+        """
+        pass-through to working directory
+        """
+        return self.workingDirectory.count()
+
+    def listPrefix(self,
+        prefix:str
+        )->typing.Generator[ezFs.EzFsItem,None,None]:
+        """
+        pass-through to working directory
+        """
+        yield from self.workingDirectory.listPrefix(prefix)
+
+    def listRange(self,
+        start:typing.Optional[str]=None,
+        stop:typing.Optional[str]=None
+        )->typing.Generator[ezFs.EzFsItem,None,None]:
+        """
+        pass-through to working directory
+        """
+        yield from self.workingDirectory.listRange(start,stop)
+
     def delete(self,relativePath:typing.Optional[str]=None)->None:
         if self.workingDirectory is not None:
             self.workingDirectory.delete(relativePath)
@@ -231,13 +461,17 @@ class EzFsFilesystem(ezFs.EzFsDirectory):
 
         setter works the same as changeDirectory()
         """
-        if not hasattr(self,'_workingDirectory'):
+        if not hasattr(self,'_contextDirectories'):
             # this has a habit of getting called before constructor is done
             raise AttributeError("Not ready")
+        if self.THREAD_SAFE:
+            workingDirectory=self._contextWorkingDirectory()
+            if workingDirectory is not None:
+                return workingDirectory
         if self._workingDirectory is None:
-            if self._url is None:
+            if self._name is None:
                 raise FileNotFoundError('Cannot get working directory for Url=None')
-            lookup=self._getFsItem(self._url)
+            lookup=self._getFsItem(self.url)
             if not isinstance(lookup,ezFs.EzFsDirectory):
                 raise FileNotFoundError(
                     '"Working directory" is not a directory!')
@@ -245,7 +479,7 @@ class EzFsFilesystem(ezFs.EzFsDirectory):
             if self._workingDirectory is not None \
                 and self._workingDirectory.url is not None:
                 # in case the url was changed/redirected/whatever
-                self._url=self._workingDirectory.url
+                self._setUrl(self._workingDirectory.url)
         return self._workingDirectory
     @workingDirectory.setter
     def workingDirectory(self,path):
@@ -269,14 +503,70 @@ class EzFsFilesystem(ezFs.EzFsDirectory):
         If you want to override changeDirectiory() functionality,
         override this function!  (cd,chadir,cwd,workingDirectory all
         go through this)
+
+        In THREAD_SAFE mode, this only changes the working directory
+        for the current context (ie thread or asyncio task).  New
+        threads start out in the filesystem's own working directory.
+        NOTE: a thread in a pool keeps its working directory from one
+        task to the next, so tasks that change directory should call
+        resetWorkingDirectory() when they start (or be run with
+        contextvars.copy_context().run).
         """
         location=self.relative(path)
         if not isinstance(location,ezFs.EzFsDirectory):
             raise FileNotFoundError(f'"{path}" is not a directory')
-        self._workingDirectory=location
+        if self.THREAD_SAFE:
+            url=str(location.url)
+            self._contextDirectories[url]=location
+            self._setContextWorkingDirectory(
+                (weakref.ref(self),self._urlGeneration,url))
+        else:
+            self._workingDirectory=location
     cd=changeDirectory
     chadir=changeDirectory
 
+    def resetWorkingDirectory(self)->None:
+        """
+        In THREAD_SAFE mode, go back to the filesystem's own working
+        directory in the current context (see changeDirectory())
+        """
+        if self.THREAD_SAFE:
+            self._setContextWorkingDirectory(None)
+
+    def _contextWorkingDirectory(self)->typing.Optional[ezFs.EzFsDirectory]:
+        """
+        the working directory changed to in the current context
+        (None if it has not been)
+        """
+        entry=_workingDirectories.get().get(id(self))
+        if entry is None or entry[0]() is not self \
+            or entry[1]!=self._urlGeneration:
+            return None
+        url=entry[2]
+        workingDirectory=self._contextDirectories.get(url)
+        if workingDirectory is None:
+            lookup=self._getFsItem(url)
+            if not isinstance(lookup,ezFs.EzFsDirectory):
+                return None
+            workingDirectory=self._contextDirectories.setdefault(url,lookup)
+        return workingDirectory
+
+    def _setContextWorkingDirectory(self,
+        entry:typing.Optional[typing.Tuple[weakref.ref,int,str]]
+        )->None:
+        """
+        change (or forget, for None) the working directory of the
+        current context
+        """
+        # (copied, since other contexts may share the old one, and
+        # leaving out any filesystems that are gone)
+        workingDirectories={key:value
+            for key,value in _workingDirectories.get().items()
+            if key!=id(self) and value[0]() is not None}
+        if entry is not None:
+            workingDirectories[id(self)]=entry
+        _workingDirectories.set(workingDirectories)
+
     @property
     def ezFs(self)->"ezFs.EzFs":
         """
@@ -4,28 +4,80 @@
 A single item hanging on a filesystem tree
 """
 import typing
+import sys
 from abc import abstractmethod
 from paths import asUrl,UrlCompatible,URL
+from .instrumentation import instrument
 if typing.TYPE_CHECKING:
-    from ezFs import EzFsFilesystem,EzFsDirectory,WatcherFn
+    from ezFs import EzFsFilesystem,EzFsDirectory,WatcherFn,HashCache
 
 
 class EzFsItem:
     """
     A single item hanging on a filesystem tree
 
+    Items are kept small because there may be millions of them.
+    Rather than a parsed URL, each one holds its (interned) directory
+    url and name, so siblings share the same directory string.  The
+    URL object is only created when somebody asks for it.
+
+    NOTE: derived classes should declare __slots__ too, or they
+    will get a per-instance __dict__ anyway.  (The slots that
+    PollingItem needs are already here, so watchable items can mix
+    it in without declaring them.)
+
     TODO: inherit from a tree node
     """
+    __slots__=('fsId','canWatch','_parent','_filesystem',
+        '_dirUrl','_name','_url','_hash','__weakref__',
+        '_watches','_leastPollingInterval','_lastPoll') # (for PollingItem)
 
     def __init__(self,
         url:UrlCompatible,
-        filesystem:typing.Optional["EzFsFilesystem"]=None):
-        """ """
+        filesystem:typing.Optional["EzFsFilesystem"]=None,
+        parent:typing.Optional["EzFsDirectory"]=None):
+        """
+        :param url: location of this item
+        :param filesystem: the filesystem this is a part of
+        :param parent: parent directory, if already known
+        """
         self.fsId:typing.Optional[str]=None
-        self._parent:typing.Optional["EzFsDirectory"]=None
-        self._filesystem:typing.Optional[EzFsFilesystem]=filesystem
-        self._url:typing.Optional[URL]=URL(url)
         self.canWatch:bool=False
+        self._parent:typing.Optional["EzFsDirectory"]=parent
+        self._filesystem:typing.Optional[EzFsFilesystem]=filesystem
+        self._setUrl(url)
+
+    def _setUrl(self,url:typing.Optional[UrlCompatible])->None:
+        """
+        point this item at a new url
+        """
+        self._hash:typing.Optional[int]=None
+        self._url:typing.Optional[URL]=None
+        if url is None:
+            self._dirUrl:typing.Optional[str]=None
+            self._name:typing.Optional[str]=None
+            return
+        if isinstance(url,URL):
+            self._url=url.copy()
+            text=str(url)
+        else:
+            text=str(url)
+            if '://' not in text:
+                # not a full url, so let the url library sort it out
+                self._url=URL(text)
+                text=str(self._url)
+        # split off the name, keeping any trailing '/' with it
+        directory,_,name=text[:-1].rpartition('/') \
+            if text.endswith('/') else text.rpartition('/')
+        self._dirUrl=sys.intern(directory+'/')
+        self._name=sys.intern(name+'/' if text.endswith('/') else name)
+
+    def __init_subclass__(cls,**kwargs):
+        """
+        Wrap backend entry points of derived classes for metrics
+        """
+        super().__init_subclass__(**kwargs)
+        instrument(cls)
 
     @property
     def isRoot(self)->bool:
@@ -49,11 +101,97 @@ class EzFsItem:
         """ is this a file? """
         return self.exists and not self.isDir
 
+    @property
+    def size(self)->typing.Optional[int]:
+        """
+        size in bytes (None if unknown)
+
+        derived classes should implement this if they can
+        """
+        return None
+
+    @property
+    def mtime(self)->typing.Optional[float]:
+        """
+        last modified time in seconds since the epoch (None if unknown)
+
+        derived classes should implement this if they can
+        """
+        return None
+
+    def setMtime(self,mtime:float)->bool: # pylint: disable=unused-argument
+        """
+        set the last modified time (eg so a copy keeps the original's)
+
+        derived classes should implement this if they can
+
+        :return: False if the backend cannot
+        """
+        return False
+
+    @property
+    def etag(self)->typing.Optional[str]:
+        """
+        an opaque string the backend changes whenever the contents
+        change (None if unknown)
+
+        derived classes should implement this if they can
+        """
+        return None
+
+    def _checksum(self, # pylint: disable=unused-argument
+        algorithm:str
+        )->typing.Optional[str]:
+        """
+        a checksum the backend already has, without reading the file
+        (eg a zip file's crc32)
+
+        derived classes should implement this if they can
+
+        :param algorithm: lower case name, eg 'sha256' or 'crc32'
+        :return: hex digest, or None if the backend does not have one
+            for this algorithm
+        """
+        return None
+
+    def hash(self,
+        algorithm:str='sha256',
+        cache:typing.Optional["HashCache"]=None
+        )->str:
+        """
+        hex digest of the contents of this file
+
+        :param algorithm: any hashlib algorithm, or 'crc32'
+        :param cache: a HashCache to remember the result in
+        """
+        from .hashing import hashItem
+        return hashItem(self,algorithm,cache)
+
+    def __reduce__(self)->typing.Tuple:
+        """
+        pickle as just the url and the filesystem (see processes.py)
+        """
+        from .processes import _rehydrateItem
+        return (_rehydrateItem,(self._filesystem,self._urlKey))
+
     def __hash__(self)->int:
         """
         return a hash value for sorting
         """
-        return self.url.__hash__()
+        ret=self._hash
+        if ret is None:
+            ret=hash(self._urlKey)
+            self._hash=ret
+        return ret
+
+    @property
+    def _urlKey(self)->str:
+        """
+        the full url as a string (what we hash and compare on)
+        """
+        if self._name is None:
+            return ''
+        return self._dirUrl+self._name # type: ignore
 
     def __eq__(self,
         other:typing.Union["EzFsItem",UrlCompatible,object]
@@ -64,8 +202,11 @@ class EzFsItem:
         if other is None:
             return False
         if isinstance(other,EzFsItem):
-            other=str(other.url)
-        return str(self.url)==other
+            # names and directories are interned, so this is cheap
+            return self._name==other._name and self._dirUrl==other._dirUrl
+        if not isinstance(other,str):
+            other=str(other)
+        return self._urlKey==other
 
     @property
     def path(self)->typing.Optional[str]:
@@ -83,6 +224,17 @@ class EzFsItem:
         """
         return self.path
 
+    @property
+    def localPath(self)->typing.Optional[str]:
+        """
+        path to this item on a local disk that the os can open directly
+        (None if it is not on one)
+
+        derived classes for local files should implement this, and
+        watches will then use kernel notifications instead of polling
+        """
+        return None
+
     @property
     def filename(self)->str:
         """
@@ -101,13 +253,18 @@ class EzFsItem:
         """
         this is the short name of the file
         """
-        if self.url is None or self.url.resource is None:
+        name=self._name
+        if not name:
             return ''
-        return self.url.resource
+        if name[-1]=='/':
+            return name[:-1]
+        return name
     @name.setter
     def name(self,name:str):
-        if self.url is not None:
-            self.url.resource=name
+        url=self.url
+        if url is not None:
+            url.resource=name
+            self._setUrl(url)
 
     @property
     def filesystem(self)->"EzFsFilesystem":
@@ -116,7 +273,7 @@ class EzFsItem:
         """
         if self._filesystem is None:
             import ezFs._ezFs
-            fsItem=ezFs._ezFs.EzFs(self._url) # pylint: disable=protected-access
+            fsItem=ezFs._ezFs.EzFs(self.url) # pylint: disable=protected-access
             self._filesystem=fsItem.workingDirectory.filesystem
         return self._filesystem
 
@@ -125,15 +282,19 @@ class EzFsItem:
         """
         This is a getter/setter because EzFsFilesystem wants to override
         the functionality to change its working directory upon set.
+
+        (The URL object is created the first time it is asked for)
         """
-        return self._url
+        url=self._url
+        if url is None and self._name is not None:
+            url=URL(self._urlKey)
+            self._url=url
+        return url
     @url.setter
     def url(self,url:UrlCompatible):
-        if isinstance(url,URL):
-            url=url.copy()
-        else:
+        if not isinstance(url,URL):
             url=asUrl(url)
-        self._url=url
+        self._setUrl(url)
 
     def read(self)->str:
         """
@@ -146,10 +307,17 @@ class EzFsItem:
     @abstractmethod
     def addWatch(self,
         watchFn:"WatcherFn",
-        pollingInterval:float=30
+        pollingInterval:float=30,
+        withEvents:bool=False,
+        debounce:typing.Optional[float]=None
         )->None:
         """
         add a change watcher to this item
+
+        :param withEvents: call watchFn(item,events) with a list of
+            ChangeEvents instead of watchFn(item)
+        :param debounce: collect changes for this many seconds and
+            deliver them together on a worker thread
         """
 
     @abstractmethod
@@ -0,0 +1,275 @@
+#!/usr/bin/env
+# -*- coding: utf-8 -*-
+"""
+Mount tables for composing several filesystems into one namespace
+"""
+import typing
+from paths import UrlCompatible,URL
+import ezFs
+
+
+class _MountNode:
+    """
+    A single path segment in the mount table trie
+    """
+    __slots__=('children','target')
+
+    def __init__(self)->None:
+        """ """
+        self.children:typing.Dict[str,_MountNode]={}
+        self.target:typing.Optional[ezFs.EzFsDirectory]=None
+
+
+class MountTable:
+    """
+    A trie of path segments to mounted directories
+
+    Lookups are a longest-prefix match, so they cost O(path depth)
+    no matter how many things are mounted.
+    """
+
+    def __init__(self)->None:
+        """ """
+        self._root=_MountNode()
+        self._count=0
+
+    def __len__(self)->int:
+        """
+        number of mount points
+        """
+        return self._count
+
+    def add(self,
+        segments:typing.Iterable[str],
+        target:"ezFs.EzFsDirectory"
+        )->None:
+        """
+        mount a directory at the given path
+
+        :raises FileExistsError: if something is already mounted there
+        """
+        node=self._root
+        for name in segments:
+            child=node.children.get(name)
+            if child is None:
+                child=_MountNode()
+                node.children[name]=child
+            node=child
+        if node.target is not None:
+            raise FileExistsError('Something is already mounted at /'+'/'.join(segments)) # noqa: E501 # pylint: disable=line-too-long
+        node.target=target
+        self._count+=1
+
+    def remove(self,segments:typing.List[str])->"ezFs.EzFsDirectory":
+        """
+        unmount whatever is at the given path
+
+        :return: the directory that was mounted there
+        :raises FileNotFoundError: if nothing is mounted there
+        """
+        trail:typing.List[typing.Tuple[_MountNode,str]]=[]
+        node=self._root
+        for name in segments:
+            child=node.children.get(name)
+            if child is None:
+                break
+            trail.append((node,name))
+            node=child
+        else:
+            if node.target is not None:
+                target=node.target
+                node.target=None
+                self._count-=1
+                # prune branches that no longer lead anywhere
+                for parent,name in reversed(trail):
+                    if node.children or node.target is not None:
+                        break
+                    del parent.children[name]
+                    node=parent
+                return target
+        raise FileNotFoundError('Nothing mounted at /'+'/'.join(segments))
+
+    def longestPrefix(self,
+        segments:typing.List[str]
+        )->typing.Tuple[typing.Optional["ezFs.EzFsDirectory"],int]:
+        """
+        find the deepest mount point that contains the given path
+
+        :return: (mounted directory,number of segments it consumed)
+            or (None,0) if the path is not under any mount point
+        """
+        found:typing.Optional[ezFs.EzFsDirectory]=None
+        depth=0
+        node=self._root
+        for i,name in enumerate(segments):
+            child=node.children.get(name)
+            if child is None:
+                break
+            node=child
+            if node.target is not None:
+                found=node.target
+                depth=i+1
+        return found,depth
+
+    def mountsAt(self,
+        segments:typing.List[str]
+        )->typing.Dict[str,"ezFs.EzFsDirectory"]:
+        """
+        get the things mounted directly inside of a directory
+
+        :return: {name:mountedDirectory}
+        """
+        node=self._root
+        for name in segments:
+            child=node.children.get(name)
+            if child is None:
+                return {}
+            node=child
+        return {name:child.target
+            for name,child in node.children.items()
+            if child.target is not None}
+
+    def __iter__(self)->typing.Iterator[
+        typing.Tuple[typing.List[str],"ezFs.EzFsDirectory"]]:
+        """
+        iterate over all (segments,mountedDirectory)
+        """
+        stack:typing.List[typing.Tuple[typing.List[str],_MountNode]]=[
+            ([],self._root)]
+        while stack:
+            segments,node=stack.pop()
+            if node.target is not None:
+                yield segments,node.target
+            for name,child in node.children.items():
+                stack.append((segments+[name],child))
+
+
+class EzFsMountPoint(ezFs.EzFsDirectory):
+    """
+    Where a directory from one filesystem shows up inside of another
+
+    Everything is passed through to the mounted directory.
+    """
+    __slots__=('target',)
+
+    def __init__(self,
+        url:UrlCompatible,
+        filesystem:"ezFs.EzFsFilesystem",
+        target:"ezFs.EzFsDirectory"):
+        """
+        :param url: location of the mount point on the host filesystem
+        :param filesystem: the host filesystem
+        :param target: the directory that is mounted here
+        """
+        ezFs.EzFsDirectory.__init__(self,url,filesystem)
+        self.target:ezFs.EzFsDirectory=target
+
+    @property
+    def exists(self)->bool:
+        """ does the item exist? """
+        return True
+
+    @property
+    def children(self)->typing.Iterable[ezFs.EzFsItem]:
+        """
+        pass-through to mounted directory
+        """
+        return self.target.children
+
+    def listPage(self,
+        cursor:typing.Optional[str]=None,
+        limit:typing.Optional[int]=None
+        )->typing.Tuple[typing.List[ezFs.EzFsItem],typing.Optional[str]]:
+        """
+        pass-through to mounted directory
+        """
+        return self.target.listPage(cursor,limit)
+
+    def count(self)->int:
+        """
+        pass-through to mounted directory
+        """
+        return self.target.count()
+
+    def listPrefix(self,
+        prefix:str
+        )->typing.Generator[ezFs.EzFsItem,None,None]:
+        """
+        pass-through to mounted directory
+        """
+        yield from self.target.listPrefix(prefix)
+
+    def listRange(self,
+        start:typing.Optional[str]=None,
+        stop:typing.Optional[str]=None
+        )->typing.Generator[ezFs.EzFsItem,None,None]:
+        """
+        pass-through to mounted directory
+        """
+        yield from self.target.listRange(start,stop)
+
+    def get(self,
+        path:typing.Union[UrlCompatible,typing.List[str]],
+        idx:int=0
+        )->ezFs.EzFsItem:
+        """
+        pass-through to mounted directory
+        """
+        if isinstance(path,list) and len(path)<=idx:
+            return self
+        return self.target.get(path,idx)
+
+    def markDirty(self)->None:
+        """
+        pass-through to mounted directory
+        """
+        self.target.markDirty()
+
+    def _mkdir(self,
+        newDirectoryName:UrlCompatible
+        )->None:
+        """
+        pass-through to mounted directory
+        """
+        self.target._mkdir(newDirectoryName) # pylint: disable=protected-access
+
+    def addWatch(self,
+        watchFn:"ezFs.WatcherFn",
+        pollingInterval:float=30,
+        withEvents:bool=False,
+        debounce:typing.Optional[float]=None
+        )->None:
+        """
+        pass-through to mounted directory
+        """
+        self.target.addWatch(watchFn,pollingInterval,withEvents,debounce)
+
+    def removeWatch(self,
+        watchFn:"ezFs.WatcherFn"
+        )->None:
+        """
+        pass-through to mounted directory
+        """
+        self.target.removeWatch(watchFn)
+
+    def delete(self, # pylint: disable=arguments-differ
+        relativePath:typing.Optional[str]=None
+        )->None:
+        """
+        if a relativePath is given, will delete the child
+
+        the mount point itself can only be removed with unmount()
+        """
+        if relativePath is None:
+            raise PermissionError(
+                f'{self.url} is a mount point.  Use unmount() instead.')
+        self.target.delete(relativePath)
+
+    def mount(self,
+        location:UrlCompatible,
+        otherFs:typing.Optional["ezFs.EzFsFilesystem"]=None
+        )->URL:
+        """
+        mount the underlying directory somewhere else as well
+        """
+        return self.target.mount(location,otherFs)
@@ -0,0 +1,147 @@
+#!/usr/bin/env
+# -*- coding: utf-8 -*-
+"""
+Independent handles on files, for sharing a filesystem between threads
+
+An EzFsFile doubles as its own file object, so it only has the one
+position, and two threads reading the same file would trip over each
+other.  An EzFsHandle is a separate python raw stream with its own
+position instead, so any number of them can be open on the same file
+at once:
+
+    reading goes through readRange() (and so the BlockCache, for
+    backends that support ranged reads)
+
+    writing is spooled (in memory, then on local disk past
+    SPOOL_MAX_BYTES) and sent to the file in one go on close(),
+    replacing it for 'w', or appended to it for 'a'
+
+In THREAD_SAFE mode, EzFsFilesystem.open() returns these, buffered
+like any other python file.
+"""
+import typing
+import io
+import tempfile
+import threading
+import ezFs
+
+
+# how much a write handle keeps in memory before spooling to disk
+SPOOL_MAX_BYTES=8<<20
+
+# how much to send to the file at a time when a write handle closes
+COMMIT_CHUNK_SIZE=1<<20
+
+# a file's own position has to be guarded for backends that cannot do
+# ranged reads, so files are spread over this many locks
+_itemLocks=[threading.Lock() for _ in range(64)]
+
+
+def _itemLock(item:"ezFs.EzFsItem")->threading.Lock:
+    """
+    the lock that guards an item's own file position
+    """
+    return _itemLocks[hash(item)%len(_itemLocks)]
+
+
+class EzFsHandle(io.RawIOBase):
+    """
+    An open file with its own position (see the top of this file)
+
+    Use ezFs.openCompressed(item,mode,None) to get one buffered.
+    """
+
+    def __init__(self,item:"ezFs.EzFsFile",mode:str='r'):
+        """
+        :param mode: 'r', 'w' or 'a' (anything else is ignored)
+        """
+        io.RawIOBase.__init__(self)
+        if '+' in mode:
+            raise ValueError(f'EzFsHandle does not support mode "{mode}"')
+        self.item=item
+        self.mode=mode
+        self._position=0
+        self._spool:typing.Optional[typing.BinaryIO]=None
+        if 'w' in mode or 'a' in mode:
+            self._spool=typing.cast(typing.BinaryIO,
+                tempfile.SpooledTemporaryFile(SPOOL_MAX_BYTES))
+
+    def readable(self)->bool:
+        return self._spool is None
+
+    def writable(self)->bool:
+        return self._spool is not None
+
+    def seekable(self)->bool:
+        return True
+
+    def readinto(self,buffer)->int:
+        if self._spool is not None:
+            raise io.UnsupportedOperation('not readable')
+        item=self.item
+        if item.supportsRangedRead:
+            data=item.readRange(self._position,len(buffer))
+        else:
+            # (this moves the item's own position for a moment)
+            with _itemLock(item):
+                data=item.readRange(self._position,len(buffer))
+        numBytes=len(data)
+        buffer[:numBytes]=data
+        self._position+=numBytes
+        return numBytes
+
+    def write(self,data)->int:
+        if self._spool is None:
+            raise io.UnsupportedOperation('not writable')
+        return self._spool.write(data)
+
+    def seek(self,offset:int,whence:int=0)->int:
+        if self._spool is not None:
+            return self._spool.seek(offset,whence)
+        if whence==1:
+            offset+=self._position
+        elif whence==2:
+            offset+=self.item.size or 0
+        self._position=max(offset,0)
+        return self._position
+
+    def tell(self)->int:
+        if self._spool is not None:
+            return self._spool.tell()
+        return self._position
+
+    def truncate(self,size:typing.Optional[int]=None)->int:
+        if self._spool is None:
+            raise io.UnsupportedOperation('not writable')
+        return self._spool.truncate(size)
+
+    def close(self)->None:
+        if self.closed:
+            return
+        try:
+            if self._spool is not None:
+                self._commit()
+        finally:
+            io.RawIOBase.close(self)
+            if self._spool is not None:
+                self._spool.close()
+
+    def _commit(self)->None:
+        """
+        send what was written to the file
+        """
+        item=self.item
+        spool=typing.cast(typing.BinaryIO,self._spool)
+        spool.seek(0)
+        with _itemLock(item):
+            mode=item.fileAccessMode
+            item.open('ab' if 'a' in self.mode else 'wb')
+            try:
+                while True:
+                    data=spool.read(COMMIT_CHUNK_SIZE)
+                    if not data:
+                        break
+                    item.write(data)
+            finally:
+                item.close()
+                item.fileAccessMode=mode
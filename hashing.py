@@ -0,0 +1,266 @@
+#!/usr/bin/env
+# -*- coding: utf-8 -*-
+"""
+Content hashing of files, in parallel, with a persistent cache
+
+Files are read a large buffer at a time so that they never need to
+fit in memory.  hashlib (and zlib, for crc32) let go of the GIL while
+hashing large buffers, so hashing many files on a thread pool keeps
+every core busy without the items having to be sent to other
+processes.
+
+Backends that already know a file's checksum (eg the crc32 stored in
+a zip file) should implement EzFsItem._checksum(), and it will be used
+instead of reading the file whenever the algorithm matches.
+
+Results can be memoized in a HashCache, which is keyed by
+(url,size,mtime) so that a file that changes gets hashed again.
+"""
+import typing
+import time
+import zlib
+import hashlib
+import sqlite3
+import threading
+import concurrent.futures
+import ezFs
+
+
+# how much to read at a time
+HASH_BUFFER_SIZE=1<<20
+
+
+class _Crc32:
+    """
+    zlib.crc32 with the same interface as hashlib
+    """
+    __slots__=('value',)
+
+    name='crc32'
+
+    def __init__(self)->None:
+        """ """
+        self.value=0
+
+    def update(self,data:bytes)->None:
+        """ add some data """
+        self.value=zlib.crc32(data,self.value)
+
+    def hexdigest(self)->str:
+        """ the checksum, as hex """
+        return '%08x'%self.value
+
+
+def hashAlgorithms()->typing.Set[str]:
+    """
+    names of all of the algorithms that can be used
+    """
+    return set(hashlib.algorithms_available)|{'crc32'}
+
+
+def newHasher(algorithm:str)->typing.Any:
+    """
+    create a hashlib-style hasher for an algorithm
+
+    :raises ValueError: if the algorithm is not known
+    """
+    algorithm=algorithm.lower()
+    if algorithm=='crc32':
+        return _Crc32()
+    return hashlib.new(algorithm)
+
+
+def hashItem(item:"ezFs.EzFsItem",
+    algorithm:str='sha256',
+    cache:typing.Optional["HashCache"]=None
+    )->str:
+    """
+    get the hex digest of the contents of a file
+
+    :param algorithm: any hashlib algorithm, or 'crc32'
+    :param cache: remember results here (and use them if the file
+        has not changed since)
+    :raises IsADirectoryError: if the item is a directory
+    """
+    if isinstance(item,ezFs.EzFsDirectory):
+        raise IsADirectoryError(str(item.url))
+    algorithm=algorithm.lower()
+    if cache is not None:
+        digest=cache.get(item,algorithm)
+        if digest is not None:
+            return digest
+        # (what it was before we read it, in case it changes meanwhile)
+        size,mtime=item.size,item.mtime
+    digest=item._checksum(algorithm) # pylint: disable=protected-access
+    if digest is None:
+        digest=_hashContents(item,algorithm)
+    if cache is not None:
+        cache.put(item,algorithm,digest,size,mtime)
+    return digest
+
+
+def _hashContents(item:"ezFs.EzFsItem",algorithm:str)->str:
+    """
+    read a file and hash it
+
+    (with ranged reads, so that a file the caller has open stays open
+    at the same position)
+    """
+    hasher=newHasher(algorithm)
+    f=typing.cast(ezFs.EzFsFile,item)
+    offset=0
+    while True:
+        data=f.readRange(offset,HASH_BUFFER_SIZE)
+        if not data:
+            break
+        hasher.update(data)
+        offset+=len(data)
+    return hasher.hexdigest()
+
+
+def hashMany(items:typing.Iterable["ezFs.EzFsItem"],
+    algorithm:str='sha256',
+    cache:typing.Optional["HashCache"]=None,
+    workers:int=8,
+    progress:typing.Optional["ezFs.Progress"]=None
+    )->typing.Generator[typing.Tuple["ezFs.EzFsItem",typing.Optional[str]],None,None]: # noqa: E501 # pylint: disable=line-too-long
+    """
+    hash a lot of files at once
+
+    Directories are skipped.  Results come back as each file
+    finishes (not in the order they went in).
+
+    :param workers: how many files to hash at the same time
+    :param progress: report progress here
+    :return: (item,digest) for each file, where digest is None if
+        the file could not be read
+    """
+    def hashOne(item:"ezFs.EzFsItem")->typing.Optional[str]:
+        try:
+            return hashItem(item,algorithm,cache)
+        except OSError:
+            return None
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers,
+        thread_name_prefix='ezFs hash') as pool:
+        pending:typing.Dict[concurrent.futures.Future,ezFs.EzFsItem]={}
+        def drain(
+            returnWhen:str
+            )->typing.Generator[typing.Tuple[ezFs.EzFsItem,typing.Optional[str]],None,None]: # noqa: E501 # pylint: disable=line-too-long
+            done,_=concurrent.futures.wait(pending,return_when=returnWhen)
+            for future in done:
+                item=pending.pop(future)
+                digest=future.result()
+                if progress is not None:
+                    progress.add(1,item.size or 0,int(digest is None))
+                yield item,digest
+        for item in items:
+            if isinstance(item,ezFs.EzFsDirectory):
+                continue
+            pending[pool.submit(hashOne,item)]=item
+            if len(pending)>=workers*2:
+                # don't get too far ahead of the workers
+                yield from drain(concurrent.futures.FIRST_COMPLETED)
+        while pending:
+            yield from drain(concurrent.futures.FIRST_COMPLETED)
+
+
+class HashCache:
+    """
+    A persistent SQLite cache of file hashes
+
+    Entries are only used while the file's size and mtime are the
+    same as when it was hashed.  Files with no known mtime are never
+    cached.
+    """
+
+    def __init__(self,dbFile:str=':memory:'):
+        """
+        :param dbFile: where to keep the database
+        """
+        self.dbFile=dbFile
+        self.hits=0
+        self.misses=0
+        self._lock=threading.RLock()
+        self._db=sqlite3.connect(dbFile,check_same_thread=False)
+        with self._db:
+            self._db.execute('''CREATE TABLE IF NOT EXISTS hashes (
+                url TEXT NOT NULL,
+                algorithm TEXT NOT NULL,
+                size INTEGER,
+                mtime REAL NOT NULL,
+                digest TEXT NOT NULL,
+                hashed REAL NOT NULL,
+                PRIMARY KEY (url,algorithm))''')
+
+    def close(self)->None:
+        """
+        close the database
+        """
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self)->"HashCache":
+        return self
+
+    def __exit__(self,*args)->None:
+        self.close()
+
+    def __len__(self)->int:
+        """
+        number of hashes in the cache
+        """
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM hashes').fetchone()[0] # noqa: E501 # pylint: disable=line-too-long
+
+    def get(self,
+        item:"ezFs.EzFsItem",
+        algorithm:str
+        )->typing.Optional[str]:
+        """
+        get the cached hash of a file
+
+        :return: the digest, or None if not cached (or the file changed)
+        """
+        mtime=item.mtime
+        if mtime is None:
+            return None
+        with self._lock:
+            row=self._db.execute(
+                'SELECT size,mtime,digest FROM hashes WHERE url=? AND algorithm=?', # noqa: E501 # pylint: disable=line-too-long
+                (str(item.url),algorithm.lower())).fetchone()
+            if row is None or row[0]!=item.size or row[1]!=mtime:
+                self.misses+=1
+                return None
+            self.hits+=1
+        return row[2]
+
+    def put(self,
+        item:"ezFs.EzFsItem",
+        algorithm:str,
+        digest:str,
+        size:typing.Optional[int]=None,
+        mtime:typing.Optional[float]=None
+        )->None:
+        """
+        remember the hash of a file
+
+        :param size: size of the file when it was hashed (default=now)
+        :param mtime: mtime of the file when it was hashed (default=now)
+        """
+        if mtime is None:
+            size,mtime=item.size,item.mtime
+            if mtime is None:
+                return
+        with self._lock,self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO hashes VALUES (?,?,?,?,?,?)',
+                (str(item.url),algorithm.lower(),size,mtime,digest,
+                    time.time()))
+
+    def forget(self,item:"ezFs.EzFsItem")->None:
+        """
+        remove everything cached about a file
+        """
+        with self._lock,self._db:
+            self._db.execute('DELETE FROM hashes WHERE url=?',
+                (str(item.url),))
@@ -0,0 +1,473 @@
+#!/usr/bin/env
+# -*- coding: utf-8 -*-
+"""
+Push notifications for local paths using Linux inotify
+
+This talks to the kernel directly through ctypes, so there are no
+extra dependencies.  One background thread reads a single inotify
+file descriptor for the whole process.
+
+Items that have a localPath (see EzFsItem.localPath) use this
+automatically when a watch is added, and fall back to polling when
+inotify is not available (not Linux, out of watches, or a network
+filesystem that the kernel cannot see changes on).
+"""
+import typing
+import os
+import sys
+import struct
+import errno
+import logging
+import threading
+import selectors
+import ctypes
+import ctypes.util
+import ezFs
+
+
+# inotify event flags (from <sys/inotify.h>)
+IN_MODIFY=0x00000002
+IN_ATTRIB=0x00000004
+IN_CLOSE_WRITE=0x00000008
+IN_MOVED_FROM=0x00000040
+IN_MOVED_TO=0x00000080
+IN_CREATE=0x00000100
+IN_DELETE=0x00000200
+IN_DELETE_SELF=0x00000400
+IN_MOVE_SELF=0x00000800
+IN_Q_OVERFLOW=0x00004000
+IN_IGNORED=0x00008000
+IN_ONLYDIR=0x01000000
+IN_ISDIR=0x40000000
+
+WATCH_MASK=IN_MODIFY|IN_ATTRIB|IN_CLOSE_WRITE|IN_MOVED_FROM|IN_MOVED_TO \
+    |IN_CREATE|IN_DELETE|IN_DELETE_SELF|IN_MOVE_SELF
+
+_EVENT_HEADER=struct.Struct('iIII') # wd,mask,cookie,len
+
+_logger=logging.getLogger('ezFs')
+
+# filesystems where the kernel does not see changes made by other
+# machines (statfs f_type magic numbers)
+NO_NOTIFY_FILESYSTEMS:typing.FrozenSet[int]=frozenset((
+    0x6969,     # nfs
+    0xff534d42, # cifs
+    0xfe534d42, # smb2
+    0x517b,     # smb
+    0x65735546, # fuse
+    0x564c,     # ncp
+    0x01161970, # gfs2
+    0x47504653, # gpfs
+    0x0bd00bd0, # lustre
+    0x6b414653, # afs
+    0x19830326, # fhgfs/beegfs
+    ))
+
+
+_libc:typing.Optional[ctypes.CDLL]=None
+_libcTried=False
+
+
+def _getLibc()->typing.Optional[ctypes.CDLL]:
+    """
+    load libc, if this is linux and it has inotify
+    """
+    global _libc,_libcTried # pylint: disable=global-statement
+    if not _libcTried:
+        _libcTried=True
+        if sys.platform.startswith('linux'):
+            try:
+                libc=ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',use_errno=True) # noqa: E501 # pylint: disable=line-too-long
+                libc.inotify_init1.argtypes=[ctypes.c_int]
+                libc.inotify_add_watch.argtypes=[ctypes.c_int,ctypes.c_char_p,ctypes.c_uint32] # noqa: E501 # pylint: disable=line-too-long
+                libc.inotify_rm_watch.argtypes=[ctypes.c_int,ctypes.c_int]
+                libc.statfs.argtypes=[ctypes.c_char_p,ctypes.c_void_p]
+                _libc=libc
+            except (OSError,AttributeError):
+                _libc=None
+    return _libc
+
+
+def inotifyAvailable()->bool:
+    """
+    can this process use inotify at all?
+    """
+    return _getLibc() is not None
+
+
+def filesystemType(path:str)->typing.Optional[int]:
+    """
+    get the statfs f_type magic number of the filesystem a path is on
+
+    :return: the magic number, or None if it could not be found
+    """
+    libc=_getLibc()
+    if libc is None:
+        return None
+    buf=ctypes.create_string_buffer(256) # bigger than any struct statfs
+    if libc.statfs(os.fsencode(path),buf)!=0:
+        return None
+    # f_type is the first field, and is a long
+    return ctypes.c_ulong.from_buffer(buf).value&0xffffffff
+
+
+def canNotify(path:str)->bool:
+    """
+    will the kernel tell us about changes to this path?
+    """
+    if not inotifyAvailable():
+        return False
+    fsType=filesystemType(path)
+    return fsType is not None and fsType not in NO_NOTIFY_FILESYSTEMS
+
+
+class _Registration:
+    """
+    An item being watched through inotify
+    """
+    __slots__=('item','path','url','isDir','recursive')
+
+    def __init__(self,
+        item:"ezFs.PollingItem",
+        path:str,
+        isDir:bool,
+        recursive:bool):
+        """ """
+        self.item=item
+        self.path=os.path.abspath(path)
+        self.isDir=isDir
+        self.recursive=recursive
+        url=str(getattr(item,'url',''))
+        self.url=ezFs.childUrl(url,'') if isDir else url
+
+    def urlFor(self,path:str,isDir:bool)->str:
+        """
+        get the url of something under the watched path
+        """
+        if path==self.path:
+            return self.url
+        relative=os.path.relpath(path,self.path).replace(os.sep,'/')
+        return self.url+relative+('/' if isDir else '')
+
+
+class InotifyWatcher:
+    """
+    Watches local paths with inotify and tells the items about changes
+
+    Use InotifyWatcher.shared() rather than creating your own.
+    """
+
+    _shared:typing.Optional["InotifyWatcher"]=None
+    _sharedLock=threading.Lock()
+
+    @classmethod
+    def shared(cls)->"InotifyWatcher":
+        """
+        the watcher for this process (started the first time it is used)
+        """
+        with cls._sharedLock:
+            if cls._shared is None:
+                cls._shared=cls()
+            return cls._shared
+
+    def __init__(self)->None:
+        """
+        :raises OSError: if inotify is not available
+        """
+        libc=_getLibc()
+        if libc is None:
+            raise OSError(errno.ENOSYS,'inotify is not available')
+        self._libc=libc
+        fd=libc.inotify_init1(os.O_NONBLOCK|os.O_CLOEXEC)
+        if fd<0:
+            err=ctypes.get_errno()
+            raise OSError(err,os.strerror(err))
+        self._fd=fd
+        self._lock=threading.RLock()
+        self._registrations:typing.Dict[int,_Registration]={} # id(item):
+        self._watches:typing.Dict[int,typing.Tuple[str,typing.Set[int]]]={} # wd:(path,{id(item)}) # noqa: E501 # pylint: disable=line-too-long
+        self._wds:typing.Dict[str,int]={} # path:wd
+        self._selector=selectors.DefaultSelector()
+        self._selector.register(fd,selectors.EVENT_READ)
+        self._wakeRead,self._wakeWrite=os.pipe()
+        self._selector.register(self._wakeRead,selectors.EVENT_READ)
+        self._running=True
+        self.overflows=0
+        self._thread=threading.Thread(target=self._run,
+            name='ezFs inotify',daemon=True)
+        self._thread.start()
+
+    def close(self)->None:
+        """
+        stop watching everything
+        """
+        with self._lock:
+            if not self._running:
+                return
+            self._running=False
+        os.write(self._wakeWrite,b'x')
+        self._thread.join(5)
+        self._selector.close()
+        for fd in (self._fd,self._wakeRead,self._wakeWrite):
+            os.close(fd)
+        with InotifyWatcher._sharedLock:
+            if InotifyWatcher._shared is self:
+                InotifyWatcher._shared=None
+
+    def isWatching(self,item:"ezFs.PollingItem")->bool:
+        """
+        is this item being watched?
+        """
+        return id(item) in self._registrations
+
+    def add(self,
+        item:"ezFs.PollingItem",
+        path:str,
+        recursive:bool=True
+        )->bool:
+        """
+        start watching an item
+
+        :param path: the item's local path
+        :param recursive: for directories, watch everything below as well
+        :return: False if the item could not be watched this way
+            (in which case it should be polled instead)
+        """
+        if not canNotify(path):
+            return False
+        isDir=os.path.isdir(path)
+        registration=_Registration(item,path,isDir,recursive and isDir)
+        with self._lock:
+            if id(item) in self._registrations:
+                return True
+            self._registrations[id(item)]=registration
+            try:
+                if registration.recursive:
+                    self._addTree(registration,registration.path)
+                else:
+                    self._addWatch(registration,registration.path)
+            except OSError:
+                # (most likely out of watches, see
+                # /proc/sys/fs/inotify/max_user_watches)
+                self.remove(item)
+                return False
+        return True
+
+    def remove(self,item:"ezFs.PollingItem")->None:
+        """
+        stop watching an item
+        """
+        with self._lock:
+            registration=self._registrations.pop(id(item),None)
+            if registration is None:
+                return
+            for wd,(path,ids) in list(self._watches.items()):
+                ids.discard(id(item))
+                if not ids:
+                    self._libc.inotify_rm_watch(self._fd,wd)
+                    del self._watches[wd]
+                    self._wds.pop(path,None)
+
+    def _addWatch(self,registration:_Registration,path:str)->None:
+        """
+        add an inotify watch for a single path
+
+        (the caller holds the lock)
+        """
+        wd=self._libc.inotify_add_watch(self._fd,os.fsencode(path),WATCH_MASK) # noqa: E501 # pylint: disable=line-too-long
+        if wd<0:
+            err=ctypes.get_errno()
+            if err in (errno.ENOENT,errno.ENOTDIR):
+                return # it went away in the meantime
+            raise OSError(err,os.strerror(err),path)
+        watch=self._watches.get(wd)
+        if watch is None:
+            ids:typing.Set[int]=set()
+        else:
+            oldPath,ids=watch
+            if oldPath!=path:
+                # (the same directory, that we missed being moved)
+                self._wds.pop(oldPath,None)
+        ids.add(id(registration.item))
+        self._watches[wd]=(path,ids)
+        self._wds[path]=wd
+
+    def _watchesUnder(self,top:str)->typing.List[typing.Tuple[str,int]]:
+        """
+        the (path,wd) of a directory and every directory under it that
+        is being watched
+
+        (the caller holds the lock)
+        """
+        prefix=os.path.join(top,'')
+        return [(path,wd) for path,wd in self._wds.items()
+            if path==top or path.startswith(prefix)]
+
+    def _moveWatches(self,oldTop:str,newTop:str)->None:
+        """
+        a watched directory was moved, so everything under it has a
+        new path
+
+        (the caller holds the lock)
+        """
+        moved=self._watchesUnder(oldTop)
+        for path,_ in moved:
+            del self._wds[path]
+        for path,wd in moved:
+            newPath=newTop+path[len(oldTop):]
+            self._watches[wd]=(newPath,self._watches[wd][1])
+            self._wds[newPath]=wd
+        prefix=os.path.join(oldTop,'')
+        for registration in self._registrations.values():
+            if registration.path==oldTop \
+                or registration.path.startswith(prefix):
+                registration.path=newTop+registration.path[len(oldTop):]
+
+    def _dropWatches(self,top:str)->None:
+        """
+        a watched directory was moved out of sight, so stop watching
+        it and everything under it
+
+        (the caller holds the lock)
+        """
+        for path,wd in self._watchesUnder(top):
+            self._libc.inotify_rm_watch(self._fd,wd)
+            del self._wds[path]
+            del self._watches[wd]
+
+    def _addTree(self,
+        registration:_Registration,
+        top:str
+        )->typing.List[str]:
+        """
+        add watches for a directory and every directory under it
+
+        (the caller holds the lock)
+
+        :return: everything that was found under the top directory
+            (so new directories can report what is already in them)
+        """
+        found:typing.List[str]=[]
+        for directory,subdirs,files in os.walk(top):
+            self._addWatch(registration,directory)
+            found.extend(os.path.join(directory,name) for name in subdirs)
+            found.extend(os.path.join(directory,name) for name in files)
+        return found
+
+    def _run(self)->None:
+        """
+        the background thread
+        """
+        while self._running:
+            for key,_ in self._selector.select():
+                if key.fd==self._wakeRead:
+                    return
+                try:
+                    data=os.read(self._fd,64*1024)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    return
+                try:
+                    self._dispatch(data)
+                except Exception: # pylint: disable=broad-except
+                    _logger.warning('inotify dispatch failed',exc_info=True)
+
+    def _dispatch(self,data:bytes)->None:
+        """
+        turn raw inotify events into ChangeEvents for each item
+        """
+        events:typing.Dict[int,typing.List[ezFs.ChangeEvent]]={}
+        movedFrom:typing.Dict[typing.Tuple[int,int],typing.Tuple[str,bool]]={} # (cookie,id):(url,isDir) # noqa: E501 # pylint: disable=line-too-long
+        movedDirectories:typing.Dict[int,str]={} # cookie:old path
+        overflowed=False
+        offset=0
+        with self._lock:
+            while offset<len(data):
+                wd,mask,cookie,length=_EVENT_HEADER.unpack_from(data,offset)
+                offset+=_EVENT_HEADER.size
+                name=os.fsdecode(data[offset:offset+length].rstrip(b'\0'))
+                offset+=length
+                if mask&IN_Q_OVERFLOW:
+                    overflowed=True
+                    continue
+                watch=self._watches.get(wd)
+                if watch is None:
+                    continue
+                directory,ids=watch
+                if mask&IN_IGNORED:
+                    del self._watches[wd]
+                    self._wds.pop(directory,None)
+                    continue
+                path=os.path.join(directory,name) if name else directory
+                isDir=bool(mask&IN_ISDIR)
+                if isDir and mask&IN_MOVED_FROM:
+                    movedDirectories[cookie]=path
+                elif isDir and mask&IN_MOVED_TO:
+                    oldPath=movedDirectories.pop(cookie,None)
+                    if oldPath is not None:
+                        # (so its watches, and any below, are already
+                        # there, under the new path)
+                        self._moveWatches(oldPath,path)
+                for itemId in list(ids):
+                    registration=self._registrations.get(itemId)
+                    if registration is None:
+                        continue
+                    out=events.setdefault(itemId,[])
+                    url=registration.urlFor(path,isDir)
+                    if mask&(IN_CREATE|IN_MOVED_TO):
+                        source=movedFrom.pop((cookie,itemId),None) \
+                            if mask&IN_MOVED_TO else None
+                        if source is not None:
+                            out.append(ezFs.ChangeEvent('moved',url,isDir,source[0])) # noqa: E501 # pylint: disable=line-too-long
+                        else:
+                            out.append(ezFs.ChangeEvent('created',url,isDir))
+                        if isDir and registration.recursive and source is None: # noqa: E501 # pylint: disable=line-too-long
+                            # watch it, and anything that got in there
+                            # before we were watching
+                            for inside in self._addTree(registration,path):
+                                out.append(ezFs.ChangeEvent('created',
+                                    registration.urlFor(inside,os.path.isdir(inside)), # noqa: E501 # pylint: disable=line-too-long
+                                    os.path.isdir(inside)))
+                    elif mask&IN_MOVED_FROM:
+                        movedFrom[(cookie,itemId)]=(url,isDir)
+                    elif mask&IN_DELETE:
+                        out.append(ezFs.ChangeEvent('deleted',url,isDir))
+                    elif mask&(IN_DELETE_SELF|IN_MOVE_SELF):
+                        if path==registration.path:
+                            out.append(ezFs.ChangeEvent('deleted',
+                                registration.url,registration.isDir))
+                    elif mask&(IN_MODIFY|IN_CLOSE_WRITE|IN_ATTRIB):
+                        event=ezFs.ChangeEvent('modified',url,isDir)
+                        if not out or out[-1]!=event:
+                            out.append(event)
+            # moved out of sight is the same as deleted
+            for (_,itemId),(url,isDir) in movedFrom.items():
+                events.setdefault(itemId,[]).append(
+                    ezFs.ChangeEvent('deleted',url,isDir))
+            for oldPath in movedDirectories.values():
+                self._dropWatches(oldPath)
+            if overflowed:
+                self.overflows+=1
+                events.update(self._rescan())
+            registrations=[(self._registrations.get(itemId),itemEvents)
+                for itemId,itemEvents in events.items() if itemEvents]
+        for registration,itemEvents in registrations:
+            if registration is not None:
+                registration.item._notify(itemEvents,False) # pylint: disable=protected-access
+
+    def _rescan(self)->typing.Dict[int,typing.List["ezFs.ChangeEvent"]]:
+        """
+        the kernel dropped events, so re-add watches for anything we
+        may have missed, and tell everybody that their whole tree may
+        have changed
+
+        (the caller holds the lock)
+        """
+        ret:typing.Dict[int,typing.List[ezFs.ChangeEvent]]={}
+        for itemId,registration in self._registrations.items():
+            if registration.recursive:
+                self._addTree(registration,registration.path)
+            ret[itemId]=[ezFs.ChangeEvent('modified',
+                registration.url,registration.isDir)]
+        return ret
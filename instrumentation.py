@@ -0,0 +1,500 @@
+#!/usr/bin/env
+# -*- coding: utf-8 -*-
+"""
+Per-operation metrics and tracing for filesystems
+
+Every backend entry point (see MEASURED_OPERATIONS) of every filesystem
+plugin is wrapped automatically when its class is created.
+While no sinks are registered the wrapper simply calls straight
+through, so there is next to no overhead.
+
+Usage:
+    sink=ezFs.SnapshotMetricsSink()
+    ezFs.addMetricsSink(sink)
+    ...do things...
+    print(sink.snapshot())
+"""
+import typing
+import time
+import threading
+import functools
+import inspect
+import logging
+import collections.abc
+from bisect import bisect_left
+
+
+# backend entry points that get measured
+MEASURED_OPERATIONS:typing.FrozenSet[str]=frozenset((
+    '_getFsItem','children','_listPage','_listPrefix','_listRange',
+    '_count','read','write','_copy','_move','_delete','_rename',
+    '_mkdir','poll','_writeRange','_readRange','_readRanges'))
+
+_logger=logging.getLogger('ezFs')
+
+# upper bounds (in seconds) of the latency histogram buckets
+LATENCY_BUCKETS:typing.Tuple[float,...]=tuple(
+    1e-6*(2**i) for i in range(0,27)) # 1us .. ~67s
+
+
+class OperationEvent(typing.NamedTuple):
+    """
+    A single completed backend operation
+    """
+    operation:str
+    fsClass:str
+    protocol:str
+    seconds:float
+    numBytes:int=0
+    numItems:int=0
+    error:typing.Optional[BaseException]=None
+    url:typing.Optional[str]=None
+
+
+class MetricsSink:
+    """
+    Something that wants to know about backend operations
+
+    Derived classes must at least implement end()
+    """
+
+    def begin(self,
+        operation:str,
+        fsClass:str,
+        protocol:str
+        )->typing.Any:
+        """
+        called when an operation starts
+
+        :return: anything, which will be handed back to end()
+        """
+        _=operation,fsClass,protocol
+        return None
+
+    def end(self,context:typing.Any,event:OperationEvent)->None:
+        """
+        called when an operation is complete
+
+        :param context: whatever begin() returned
+        """
+        raise NotImplementedError()
+
+
+class SnapshotMetricsSink(MetricsSink):
+    """
+    Keeps counters, byte totals, and latency histograms in memory
+    for each (filesystem class,protocol,operation)
+    """
+
+    def __init__(self)->None:
+        """ """
+        self._lock=threading.Lock()
+        self._stats:typing.Dict[
+            typing.Tuple[str,str,str],typing.Dict[str,typing.Any]]={}
+
+    def end(self,context:typing.Any,event:OperationEvent)->None:
+        """
+        called when an operation is complete
+        """
+        key=(event.fsClass,event.protocol,event.operation)
+        bucket=bisect_left(LATENCY_BUCKETS,event.seconds)
+        with self._lock:
+            stats=self._stats.get(key)
+            if stats is None:
+                stats={'count':0,'errors':0,'bytes':0,'items':0,
+                    'seconds':0.0,'max':0.0,
+                    'histogram':[0]*(len(LATENCY_BUCKETS)+1)}
+                self._stats[key]=stats
+            stats['count']+=1
+            stats['bytes']+=event.numBytes
+            stats['items']+=event.numItems
+            stats['seconds']+=event.seconds
+            if event.seconds>stats['max']:
+                stats['max']=event.seconds
+            if event.error is not None:
+                stats['errors']+=1
+            stats['histogram'][bucket]+=1
+
+    def snapshot(self)->typing.Dict[str,typing.Dict[str,typing.Any]]:
+        """
+        get a copy of all statistics
+
+        :return: {"fsClass protocol operation":{stats}}
+        """
+        with self._lock:
+            ret={}
+            for (fsClass,protocol,operation),stats in self._stats.items():
+                stats=dict(stats)
+                stats['histogram']=list(stats['histogram'])
+                stats['mean']=stats['seconds']/stats['count']
+                ret[f'{fsClass} {protocol} {operation}'.replace('  ',' ')]=stats # noqa: E501 # pylint: disable=line-too-long
+            return ret
+
+    def percentile(self,
+        fsClass:str,
+        protocol:str,
+        operation:str,
+        pct:float
+        )->typing.Optional[float]:
+        """
+        estimate a latency percentile (0..100) from the histogram
+
+        :return: upper bound of the bucket holding that percentile,
+            or None if nothing has been recorded
+        """
+        with self._lock:
+            stats=self._stats.get((fsClass,protocol,operation))
+            if stats is None:
+                return None
+            target=stats['count']*pct/100.0
+            seen=0
+            for i,n in enumerate(stats['histogram']):
+                seen+=n
+                if seen>=target and n:
+                    if i<len(LATENCY_BUCKETS):
+                        return LATENCY_BUCKETS[i]
+                    return stats['max']
+            return stats['max']
+
+    def reset(self)->None:
+        """
+        forget everything
+        """
+        with self._lock:
+            self._stats={}
+
+    def printStats(self)->None:
+        """
+        print a table of the statistics
+        """
+        snapshot=self.snapshot()
+        if not snapshot:
+            print('No operations recorded')
+            return
+        print('%-48s %8s %10s %10s %12s'%(
+            'operation','count','mean ms','max ms','bytes'))
+        for name,stats in sorted(snapshot.items()):
+            print('%-48s %8d %10.3f %10.3f %12d'%(name,stats['count'],
+                stats['mean']*1000,stats['max']*1000,stats['bytes']))
+
+
+class LoggingMetricsSink(MetricsSink):
+    """
+    Logs every operation
+    """
+
+    def __init__(self,
+        logger:typing.Optional[logging.Logger]=None,
+        level:int=logging.DEBUG):
+        """ """
+        if logger is None:
+            logger=logging.getLogger('ezFs')
+        self.logger=logger
+        self.level=level
+
+    def end(self,context:typing.Any,event:OperationEvent)->None:
+        """
+        called when an operation is complete
+        """
+        if not self.logger.isEnabledFor(self.level):
+            return
+        self.logger.log(self.level,'%s %s %s %.3fms bytes=%d items=%d%s%s',
+            event.fsClass,event.protocol,event.operation,
+            event.seconds*1000,event.numBytes,event.numItems,
+            '' if event.url is None else ' url='+event.url,
+            '' if event.error is None else ' error=%r'%event.error)
+
+
+class SpanMetricsSink(MetricsSink):
+    """
+    OpenTelemetry-style spans
+
+    onStart(name,attributes) is called as each operation starts and
+    whatever it returns (eg a span) is passed to onEnd(span,event)
+    """
+
+    def __init__(self,
+        onStart:typing.Callable[[str,typing.Dict[str,str]],typing.Any],
+        onEnd:typing.Callable[[typing.Any,OperationEvent],None]):
+        """ """
+        self.onStart=onStart
+        self.onEnd=onEnd
+
+    def begin(self,
+        operation:str,
+        fsClass:str,
+        protocol:str
+        )->typing.Any:
+        """
+        called when an operation starts
+        """
+        return self.onStart(f'ezFs.{operation}',{
+            'ezfs.filesystem':fsClass,
+            'ezfs.protocol':protocol,
+            'ezfs.operation':operation})
+
+    def end(self,context:typing.Any,event:OperationEvent)->None:
+        """
+        called when an operation is complete
+        """
+        self.onEnd(context,event)
+
+
+_SINKS:typing.List[MetricsSink]=[]
+_active=threading.local() # filesystems with an operation in progress
+
+
+def addMetricsSink(sink:MetricsSink)->MetricsSink:
+    """
+    start sending metrics to a sink
+
+    :return: the sink, for convenience
+    """
+    global _SINKS # pylint: disable=global-statement
+    _SINKS=_SINKS+[sink] # replace, so running operations are unaffected
+    return sink
+
+
+def removeMetricsSink(sink:MetricsSink)->None:
+    """
+    stop sending metrics to a sink
+    """
+    global _SINKS # pylint: disable=global-statement
+    _SINKS=[s for s in _SINKS if s is not sink]
+
+
+def metricsEnabled()->bool:
+    """
+    are any metrics being collected?
+    """
+    return bool(_SINKS)
+
+
+def _describe(obj:typing.Any)->typing.Tuple[typing.Any,str,str]:
+    """
+    figure out (filesystem,fsClass,protocol) of something being measured
+    """
+    fs=obj if hasattr(obj,'URL_PROTOCOLS') else getattr(obj,'_filesystem',None) # noqa: E501 # pylint: disable=line-too-long
+    if fs is None:
+        return obj,type(obj).__name__,''
+    protocols=getattr(fs,'URL_PROTOCOLS',None)
+    return fs,type(fs).__name__,protocols[0] if protocols else ''
+
+
+def _amount(value:typing.Any)->int:
+    """
+    how many bytes are represented by a value
+    """
+    if isinstance(value,(bytes,bytearray,str,memoryview)):
+        return len(value)
+    if isinstance(value,int) and not isinstance(value,bool):
+        return value
+    return 0
+
+
+def _begin(operation:str,obj:typing.Any)->typing.Optional[typing.Tuple]:
+    """
+    start measuring an operation
+
+    :return: state for _end() or None if it should not be measured
+        (eg, it is nested inside another operation on the same filesystem)
+    """
+    fs,fsClass,protocol=_describe(obj)
+    active=getattr(_active,'ids',None)
+    if active is None:
+        active=set()
+        _active.ids=active
+    if id(fs) in active:
+        return None
+    active.add(id(fs))
+    sinks=_SINKS
+    contexts:typing.List[typing.Any]=[]
+    try:
+        for sink in sinks:
+            try:
+                contexts.append(sink.begin(operation,fsClass,protocol))
+            except Exception: # pylint: disable=broad-except
+                _logger.warning('metrics sink %r failed',sink,exc_info=True) # noqa: E501 # pylint: disable=line-too-long
+                contexts.append(None)
+    except BaseException:
+        active.discard(id(fs)) # (or nothing would be measured again)
+        raise
+    return (fs,fsClass,protocol,sinks,contexts,time.perf_counter())
+
+
+def _end(state:typing.Tuple,
+    operation:str,
+    obj:typing.Any,
+    seconds:typing.Optional[float]=None,
+    numBytes:int=0,
+    numItems:int=0,
+    error:typing.Optional[BaseException]=None
+    )->None:
+    """
+    finish measuring an operation
+    """
+    fs,fsClass,protocol,sinks,contexts,start=state
+    if seconds is None:
+        seconds=time.perf_counter()-start
+    active=getattr(_active,'ids',None)
+    if active is not None:
+        active.discard(id(fs))
+    url=getattr(obj,'_urlKey',None) # (avoid building a URL object)
+    event=OperationEvent(operation,fsClass,protocol,seconds,
+        numBytes,numItems,error,url or None)
+    for sink,context in zip(sinks,contexts):
+        try:
+            sink.end(context,event)
+        except Exception: # pylint: disable=broad-except
+            _logger.warning('metrics sink %r failed',sink,exc_info=True)
+
+
+def _wrapMethod(operation:str,fn:typing.Callable)->typing.Callable:
+    """
+    wrap a backend method so it gets measured
+    """
+    @functools.wraps(fn)
+    def measured(self,*args,**kwargs):
+        if not _SINKS:
+            return fn(self,*args,**kwargs)
+        state=_begin(operation,self)
+        if state is None:
+            return fn(self,*args,**kwargs)
+        try:
+            ret=fn(self,*args,**kwargs)
+        except BaseException as e:
+            _end(state,operation,self,error=e)
+            raise
+        numBytes=0
+        numItems=0
+        if operation in ('read','_readRange'):
+            numBytes=_amount(ret)
+        elif operation=='write':
+            numBytes=_amount(ret) or (_amount(args[0]) if args else 0)
+        elif operation=='_writeRange':
+            numBytes=_amount(args[1]) if len(args)>1 else 0
+        elif operation=='_readRanges':
+            numBytes=sum(len(data) for data in ret) if ret else 0
+        elif operation=='_listPage':
+            numItems=len(ret[0])
+        elif isinstance(ret,list):
+            numItems=len(ret)
+        _end(state,operation,self,numBytes=numBytes,numItems=numItems)
+        return ret
+    measured.__ezFsMeasured__=True # type: ignore
+    return measured
+
+
+def _measureIter(operation:str,
+    obj:typing.Any,
+    iterator:typing.Iterator,
+    state:typing.Optional[typing.Tuple]=None
+    )->typing.Generator[typing.Any,None,None]:
+    """
+    measure a listing, counting only time spent inside the backend
+
+    :param state: from _begin(), if it has been measured already
+        (otherwise it is started when the listing is)
+    """
+    if state is None:
+        state=_begin(operation,obj)
+        if state is None:
+            yield from iterator
+            return
+    seconds=time.perf_counter()-state[5]
+    numItems=0
+    error:typing.Optional[BaseException]=None
+    fs=state[0]
+    active=_active.ids
+    active.discard(id(fs))
+    try:
+        while True:
+            active.add(id(fs))
+            start=time.perf_counter()
+            try:
+                item=next(iterator)
+            except StopIteration:
+                break
+            finally:
+                seconds+=time.perf_counter()-start
+                active.discard(id(fs))
+            numItems+=1
+            yield item
+    except GeneratorExit:
+        raise # the caller stopped early, which is not an error
+    except BaseException as e:
+        error=e
+        raise
+    finally:
+        active.add(id(fs)) # so _end() can clear it
+        _end(state,operation,obj,seconds,0,numItems,error)
+
+
+def _wrapProperty(operation:str,prop:property)->property:
+    """
+    wrap a backend property (eg children) so it gets measured
+
+    Lazy listings (generators and other iterators) are measured as
+    they are gone through, and anything else (eg a dict) is returned
+    as it is, once it has been measured.
+    """
+    fget=prop.fget
+    if fget is None:
+        return prop
+    if inspect.isgeneratorfunction(fget):
+        @functools.wraps(fget)
+        def measured(self):
+            if not _SINKS:
+                return fget(self)
+            return _measureIter(operation,self,fget(self))
+    else:
+        @functools.wraps(fget)
+        def measured(self):
+            if not _SINKS:
+                return fget(self)
+            state=_begin(operation,self)
+            if state is None:
+                return fget(self)
+            try:
+                value=fget(self)
+            except BaseException as e:
+                _end(state,operation,self,error=e)
+                raise
+            if isinstance(value,collections.abc.Iterator):
+                # (not nested inside anything while it is not being
+                # gone through)
+                _active.ids.discard(id(state[0]))
+                return _measureIter(operation,self,value,state)
+            numItems=len(value) if isinstance(value,collections.abc.Sized) else 0 # noqa: E501 # pylint: disable=line-too-long
+            _end(state,operation,self,numItems=numItems)
+            return value
+    measured.__ezFsMeasured__=True # type: ignore
+    return property(measured,prop.fset,prop.fdel,prop.__doc__)
+
+
+def instrument(cls:type)->type:
+    """
+    wrap all backend entry points defined by a class
+
+    (this is called automatically for every EzFsItem and PollingItem
+    derived class, so you should not need to call it yourself)
+    """
+    if cls.__dict__.get('_ezFsInstrumented',False):
+        return cls
+    for name in MEASURED_OPERATIONS:
+        value=cls.__dict__.get(name)
+        if value is None:
+            continue
+        if isinstance(value,property):
+            fget=value.fget
+            if fget is None or getattr(fget,'__isabstractmethod__',False) \
+                or getattr(fget,'__ezFsMeasured__',False):
+                continue
+            setattr(cls,name,_wrapProperty(name,value))
+        elif callable(value) and not isinstance(value,(classmethod,staticmethod)): # noqa: E501 # pylint: disable=line-too-long
+            if getattr(value,'__isabstractmethod__',False) \
+                or getattr(value,'__ezFsMeasured__',False):
+                continue
+            setattr(cls,name,_wrapMethod(name,value))
+    cls._ezFsInstrumented=True # type: ignore
+    return cls
@@ -0,0 +1,245 @@
+#!/usr/bin/env
+# -*- coding: utf-8 -*-
+"""
+A fake "remote" filesystem (latency://) for benchmarks and tests
+
+It is an in-memory filesystem that can add a fixed delay to every
+backend call and limit bandwidth, so that slow network filesystems
+can be simulated in-process.  It also counts calls so tests can
+check how many round trips an operation took.
+"""
+import typing
+import time
+from paths import UrlCompatible,MimeTypeCompatible
+import ezFs
+from ezFs.memoryFs import EzFsMemoryFile,EzFsMemoryDirectory,EzFsMemoryFilesystem # noqa: E501 # pylint: disable=line-too-long
+
+
+class EzFsLatencyFile(EzFsMemoryFile):
+    """
+    A file on a latency-injecting filesystem
+    """
+    __slots__=()
+
+    # pretend to be remote, so reads are worth caching and
+    # writes are worth buffering
+    BLOCK_CACHE:bool=True
+    WRITE_BUFFER_SIZE:int=64*1024
+
+    def read(self, # pylint: disable=arguments-differ
+        numBytes:typing.Optional[int]=None,
+        encoding:typing.Optional[str]=None,
+        errors:str='ignore',
+        mimeType:typing.Optional[MimeTypeCompatible]=None,
+        )->typing.Union[str,bytes]:
+        """
+        read n# of bytes, or the whole thing
+        """
+        data=EzFsMemoryFile.read(self,numBytes,None,errors,mimeType)
+        self._latencyFs.delay('read',len(data))
+        if encoding is not None:
+            return typing.cast(bytes,data).decode(encoding,errors)
+        return data
+
+    def _readRange(self,offset:int,numBytes:int)->bytes:
+        """
+        read part of the file in a single backend call
+        """
+        data=EzFsMemoryFile._readRange(self,offset,numBytes)
+        self._latencyFs.delay('readRange',len(data))
+        return data
+
+    def _readRanges(self,
+        ranges:typing.List[typing.Tuple[int,int]]
+        )->typing.Optional[typing.List[bytes]]:
+        """
+        read many parts of the file in a single backend call
+        (like an http multipart byte range request)
+        """
+        ret=[EzFsMemoryFile._readRange(self,offset,numBytes) # pylint: disable=protected-access
+            for offset,numBytes in ranges]
+        self._latencyFs.delay('readRanges',sum(len(data) for data in ret))
+        return ret
+
+    def write(self, # type: ignore # pylint: disable=arguments-renamed
+        data:typing.Union[bytes,str],
+        encoding:str='utf-8',
+        errors:str='ignore',
+        mimeType:typing.Optional[MimeTypeCompatible]=None,
+        append:bool=False
+        )->int:
+        """
+        Write the data to the file
+        """
+        if isinstance(data,str):
+            data=data.encode(encoding,errors)
+        self._latencyFs.delay('write',len(data))
+        return EzFsMemoryFile.write(self,data,encoding,errors,mimeType,append)
+
+    def _writeRange(self,offset:int,data:bytes)->None:
+        """
+        overwrite part of the file in place
+        """
+        self._latencyFs.delay('writeRange',len(data))
+        EzFsMemoryFile._writeRange(self,offset,data)
+
+    @property
+    def _latencyFs(self)->"EzFsLatencyFilesystem":
+        """
+        our filesystem
+        """
+        return typing.cast(EzFsLatencyFilesystem,self.filesystem)
+
+
+class EzFsLatencyDirectory(EzFsMemoryDirectory):
+    """
+    A directory on a latency-injecting filesystem
+    """
+    __slots__=()
+
+    def _listPage(self,
+        cursor:typing.Optional[str],
+        limit:int
+        )->typing.Tuple[typing.List[ezFs.EzFsItem],typing.Optional[str]]:
+        """
+        get one page of the directory listing (one round trip per page)
+        """
+        typing.cast(EzFsLatencyFilesystem,self.filesystem).delay('listPage')
+        return EzFsMemoryDirectory._listPage(self,cursor,limit) # pylint: disable=protected-access
+
+    def _listPrefix(self,
+        prefix:str
+        )->typing.Optional[typing.Iterable[ezFs.EzFsItem]]:
+        """
+        list only the items starting with prefix (one round trip)
+        """
+        typing.cast(EzFsLatencyFilesystem,self.filesystem).delay('listPrefix')
+        return EzFsMemoryDirectory._listPrefix(self,prefix) # pylint: disable=protected-access
+
+    def _listRange(self,
+        start:typing.Optional[str],
+        stop:typing.Optional[str]
+        )->typing.Optional[typing.Iterable[ezFs.EzFsItem]]:
+        """
+        list only the items in a range of names (one round trip)
+        """
+        typing.cast(EzFsLatencyFilesystem,self.filesystem).delay('listRange')
+        return EzFsMemoryDirectory._listRange(self,start,stop) # pylint: disable=protected-access
+
+    def _find(self,
+        where:"ezFs.Predicate",
+        prune:typing.Optional["ezFs.Predicate"]
+        )->typing.Optional[typing.Iterable[ezFs.EzFsItem]]:
+        """
+        server-side search (one round trip)
+        """
+        typing.cast(EzFsLatencyFilesystem,self.filesystem).delay('find')
+        return EzFsMemoryDirectory._find(self,where,prune) # pylint: disable=protected-access
+
+    def _count(self)->typing.Optional[int]:
+        """
+        number of items in the directory (one round trip)
+        """
+        typing.cast(EzFsLatencyFilesystem,self.filesystem).delay('count')
+        return EzFsMemoryDirectory._count(self) # pylint: disable=protected-access
+
+
+class EzFsLatencyFilesystem(EzFsMemoryFilesystem):
+    """
+    A fake "remote" filesystem (latency://)
+
+    Every backend call costs `latency` seconds, plus the time
+    to move the data at `bandwidth` bytes per second.
+    """
+
+    URL_PROTOCOLS:typing.List[str]=['latency://']
+
+    FILE_CLASS=EzFsLatencyFile
+    DIRECTORY_CLASS=EzFsLatencyDirectory
+
+    def __init__(self,
+        url:typing.Optional[UrlCompatible]=None,
+        latency:float=0.0,
+        bandwidth:typing.Optional[float]=None,
+        maxBytes:typing.Optional[int]=None,
+        volume:typing.Optional[str]=None):
+        """
+        :param latency: seconds to add to every backend call
+        :param bandwidth: bytes per second for reads and writes
+            (None=unlimited)
+        :param maxBytes: memory cap (see EzFsMemoryFilesystem)
+        :param volume: name of the shared storage to use
+            (default is a private volume)
+        """
+        self.latency:float=latency
+        self.bandwidth:typing.Optional[float]=bandwidth
+        self.calls:typing.Dict[str,int]={}
+        self.bytesTransferred:int=0
+        EzFsMemoryFilesystem.__init__(self,url,maxBytes,volume)
+
+    def _config(self)->typing.Tuple[typing.Tuple,typing.Dict[str,typing.Any]]: # noqa: E501 # pylint: disable=line-too-long
+        """
+        what this filesystem was created with
+        """
+        args,kwargs=EzFsMemoryFilesystem._config(self)
+        kwargs.update(latency=self.latency,bandwidth=self.bandwidth)
+        return args,kwargs
+
+    def delay(self,operation:str,numBytes:int=0)->None:
+        """
+        count a backend call and wait as long as it would have taken
+        """
+        self.calls[operation]=self.calls.get(operation,0)+1
+        self.bytesTransferred+=numBytes
+        seconds=self.latency
+        if self.bandwidth and numBytes:
+            seconds+=numBytes/self.bandwidth
+        if seconds>0:
+            time.sleep(seconds)
+
+    def resetCounters(self)->None:
+        """
+        zero out the call counts
+        """
+        self.calls={}
+        self.bytesTransferred=0
+
+    def _getFsItem(self,url:UrlCompatible)->ezFs.EzFsItem:
+        """
+        get a single item from the filesystem
+        """
+        self.delay('_getFsItem')
+        return EzFsMemoryFilesystem._getFsItem(self,url)
+
+    def _delete(self,fsItem:"ezFs.EzFsItem")->None:
+        """ delete """
+        self.delay('_delete')
+        EzFsMemoryFilesystem._delete(self,fsItem)
+
+    def _rename(self,
+        fsItem:"ezFs.EzFsItem",
+        newName:UrlCompatible)->None:
+        """ rename """
+        self.delay('_rename')
+        EzFsMemoryFilesystem._rename(self,fsItem,newName)
+
+    def _copy(self,
+        fsItem:"ezFs.EzFsItem",
+        newLocation:UrlCompatible)->None:
+        """ copy """
+        self.delay('_copy')
+        EzFsMemoryFilesystem._copy(self,fsItem,newLocation)
+
+    def _move(self,
+        fsItem:"ezFs.EzFsItem",
+        newLocation:UrlCompatible)->None:
+        """ move """
+        self.delay('_move')
+        EzFsMemoryFilesystem._move(self,fsItem,newLocation)
+
+    def _mkdir(self,
+        newDirectoryName:UrlCompatible
+        )->None:
+        """ make a new directory """
+        self.delay('_mkdir')
+        EzFsMemoryFilesystem._mkdir(self,newDirectoryName)
@@ -0,0 +1,1014 @@
+#!/usr/bin/env
+# -*- coding: utf-8 -*-
+"""
+An in-memory filesystem (mem://)
+
+Handy for unit tests, scratch space, and as a cache tier.
+
+Everything lives in a trie of path segments with bytearray file
+bodies, so lookups are O(path depth) and renames/moves are
+simply relinking a node to a new parent.
+"""
+import typing
+import bisect
+import time
+import itertools
+from collections import OrderedDict,deque
+from paths import UrlCompatible,MimeTypeCompatible
+import ezFs
+
+
+# every change anywhere gets a new number from this
+_TREE_VERSIONS=itertools.count()
+
+
+class _MemNode:
+    """
+    A single node in the path trie
+
+    Directories have children and no data, files have data
+    and no children.
+    """
+    __slots__=('name','parent','children','data','mtime','version','dirty',
+        '_sorted','treeVersion')
+
+    def __init__(self,
+        name:str,
+        parent:typing.Optional["_MemNode"],
+        isDir:bool):
+        """ """
+        self.name:str=name
+        self.parent:typing.Optional[_MemNode]=parent
+        self.children:typing.Optional[typing.Dict[str,_MemNode]]=None
+        self.data:typing.Optional[bytearray]=None
+        if isDir:
+            self.children={}
+        else:
+            self.data=bytearray()
+        self.mtime:float=time.time()
+        self.version:int=0
+        self.dirty:bool=True # dirty files are never evicted
+        self._sorted:typing.Optional[typing.Tuple[int,typing.List[str]]]=None
+        self.treeVersion:int=next(_TREE_VERSIONS) # changes with anything below
+
+    @property
+    def isDir(self)->bool:
+        """ is this a directory node? """
+        return self.children is not None
+
+    def sortedNames(self)->typing.List[str]:
+        """
+        names of the children in sorted order
+
+        (kept until the directory changes, so paging through a
+        listing does not re-sort for every page)
+        """
+        cached=self._sorted
+        if cached is None or cached[0]!=self.version:
+            cached=(self.version,sorted(self.children)) # type: ignore
+            self._sorted=cached
+        return cached[1]
+
+    def touch(self)->None:
+        """
+        mark this node as changed
+        """
+        self.mtime=time.time()
+        self.version+=1
+        # let every directory above us know too
+        version=next(_TREE_VERSIONS)
+        node:typing.Optional[_MemNode]=self
+        while node is not None:
+            node.treeVersion=version
+            node=node.parent
+
+    @property
+    def path(self)->str:
+        """
+        the absolute path of this node, eg "/a/b/c"
+        """
+        names:typing.List[str]=[]
+        node:typing.Optional[_MemNode]=self
+        while node is not None and node.parent is not None:
+            names.append(node.name)
+            node=node.parent
+        return '/'+'/'.join(reversed(names))
+
+    @property
+    def size(self)->int:
+        """
+        number of bytes used by this node and everything under it
+        """
+        if self.data is not None:
+            return len(self.data)
+        return sum(child.size for child in self.children.values()) # type: ignore # noqa: E501 # pylint: disable=line-too-long
+
+
+class _NodeView:
+    """
+    Lets predicates look at a trie node as if it were an item
+
+    (directories report a size of None, just like the items do)
+    """
+    __slots__=('node',)
+
+    def __init__(self,node:typing.Optional[_MemNode]=None):
+        """ """
+        self.node=node
+
+    @property
+    def name(self)->str:
+        """ name of the node """
+        return self.node.name # type: ignore
+
+    @property
+    def isDir(self)->bool:
+        """ is this a directory? """
+        return self.node.isDir # type: ignore
+
+    @property
+    def size(self)->typing.Optional[int]:
+        """ size of a file """
+        data=self.node.data # type: ignore
+        return None if data is None else len(data)
+
+    @property
+    def mtime(self)->float:
+        """ last modified time """
+        return self.node.mtime # type: ignore
+
+
+class _MemStore:
+    """
+    The actual storage behind one or more EzFsMemoryFilesystem objects
+    """
+
+    def __init__(self,maxBytes:typing.Optional[int]=None):
+        """
+        :param maxBytes: memory cap for all file bodies (None=unlimited)
+        """
+        self.root:_MemNode=_MemNode('',None,True)
+        self.maxBytes:typing.Optional[int]=maxBytes
+        self.usedBytes:int=0
+        # clean files in least-recently-used order (eviction candidates)
+        self.lru:typing.Dict[_MemNode,None]=OrderedDict()
+
+    def resolve(self,segments:typing.List[str])->typing.Optional[_MemNode]:
+        """
+        find the node at a path, or None if it does not exist
+        """
+        node=self.root
+        for name in segments:
+            if node.children is None:
+                return None
+            child=node.children.get(name)
+            if child is None:
+                return None
+            node=child
+        return node
+
+    def reserve(self,
+        numBytes:int,
+        forNode:typing.Optional[_MemNode]=None
+        )->None:
+        """
+        make room for numBytes more, evicting clean files if necessary
+
+        :raises NoSpaceException: if there is no way to fit it
+        """
+        if numBytes<=0 or self.maxBytes is None:
+            self.usedBytes+=numBytes
+            return
+        while self.usedBytes+numBytes>self.maxBytes and self.lru:
+            victim=next(iter(self.lru))
+            if victim is forNode:
+                # never evict the thing we are making room for
+                self.lru.pop(victim)
+                continue
+            self.unlink(victim)
+        if self.usedBytes+numBytes>self.maxBytes:
+            path='mem://'+(forNode.path if forNode is not None else '/')
+            raise ezFs.NoSpaceException(path,numBytes,
+                self.maxBytes-self.usedBytes)
+        self.usedBytes+=numBytes
+
+    def release(self,node:_MemNode)->None:
+        """
+        forget all accounting for a node and everything under it
+        """
+        if node.data is not None:
+            self.usedBytes-=len(node.data)
+            self.lru.pop(node,None)
+        else:
+            for child in node.children.values(): # type: ignore
+                self.release(child)
+
+    def unlink(self,node:_MemNode)->None:
+        """
+        remove a node from the tree
+        """
+        parent=node.parent
+        if parent is None:
+            raise PermissionError('Cannot delete the root of a mem:// filesystem') # noqa: E501 # pylint: disable=line-too-long
+        del parent.children[node.name] # type: ignore
+        node.parent=None
+        parent.touch()
+        self.release(node)
+
+    def link(self,node:_MemNode,parent:_MemNode,name:str)->None:
+        """
+        attach a node to a new parent
+        """
+        if parent.children is None:
+            raise NotADirectoryError('mem://'+parent.path)
+        if name in parent.children:
+            raise FileExistsError('mem://'+parent.path.rstrip('/')+'/'+name)
+        node.name=name
+        node.parent=parent
+        parent.children[name]=node
+        parent.touch()
+
+    def clone(self,node:_MemNode)->_MemNode:
+        """
+        deep-copy a node (detached from any parent)
+        """
+        # make room for the whole copy up front, without evicting
+        # anything that is being copied
+        pinned=[file for file in _fileNodes(node) if file in self.lru]
+        for file in pinned:
+            del self.lru[file]
+        try:
+            self.reserve(node.size,node)
+        finally:
+            for file in pinned:
+                self.lru[file]=None
+        return self._copyNodes(node)
+
+    def _copyNodes(self,node:_MemNode)->_MemNode:
+        """
+        deep-copy a node that there is already room for
+        """
+        ret=_MemNode(node.name,None,node.isDir)
+        if node.data is not None:
+            ret.data=bytearray(node.data)
+        else:
+            for name,child in node.children.items(): # type: ignore
+                childCopy=self._copyNodes(child)
+                childCopy.parent=ret
+                ret.children[name]=childCopy # type: ignore
+        return ret
+
+
+def _fileNodes(node:_MemNode)->typing.Generator[_MemNode,None,None]:
+    """
+    every file node at or under a node
+    """
+    if node.data is not None:
+        yield node
+    else:
+        for child in node.children.values(): # type: ignore
+            yield from _fileNodes(child)
+
+
+def _splitPath(url:UrlCompatible)->typing.List[str]:
+    """
+    split a mem:// url into a list of path segments
+    """
+    path=str(url).replace('\\','/')
+    if '://' in path:
+        path=path.split('://',1)[1]
+    segments:typing.List[str]=[]
+    for name in path.split('/'):
+        if not name or name=='.':
+            continue
+        if name=='..':
+            if segments:
+                segments.pop()
+            continue
+        segments.append(name)
+    return segments
+
+
+class EzFsMemoryItem(ezFs.EzFsItem,ezFs.PollingItem):
+    """
+    Common base for items on an in-memory filesystem
+    """
+    __slots__=() # (see the derived classes)
+
+    def __init__(self,
+        url:UrlCompatible,
+        filesystem:"EzFsMemoryFilesystem"):
+        """ """
+        ezFs.EzFsItem.__init__(self,url,filesystem)
+        ezFs.PollingItem.__init__(self)
+        self._lastVersion:typing.Optional[int]=None
+
+    @property
+    def _node(self)->typing.Optional[_MemNode]:
+        """
+        the trie node for this item (or None if it does not exist)
+        """
+        return self._memFs.store.resolve(_splitPath(self.url))
+
+    @property
+    def _memFs(self)->"EzFsMemoryFilesystem":
+        """
+        our filesystem
+        """
+        return typing.cast(EzFsMemoryFilesystem,self.filesystem)
+
+    @property
+    def exists(self)->bool:
+        """ does the item exist? """
+        node=self._node
+        return node is not None and node.isDir==self.isDir
+
+    @property
+    def mtime(self)->typing.Optional[float]:
+        """
+        last modified time
+        """
+        node=self._node
+        if node is None:
+            return None
+        return node.mtime
+
+    def setMtime(self,mtime:float)->bool:
+        """
+        set the last modified time
+        """
+        node=self._node
+        if node is None:
+            return False
+        node.mtime=mtime
+        return True
+
+    def poll(self)->bool:
+        """
+        check if the item has changed since the last time we looked
+        """
+        node=self._node
+        version=None if node is None else (id(node),node.version)
+        changed=self._lastVersion is not None and version!=self._lastVersion
+        self._lastVersion=version # type: ignore
+        return changed
+
+    def addWatch(self,
+        watchFn:"ezFs.WatcherFn",
+        pollingInterval:float=30,
+        withEvents:bool=False,
+        debounce:typing.Optional[float]=None
+        )->None:
+        """
+        add a change watcher to this item
+        """
+        ezFs.PollingItem.addWatch(self,watchFn,pollingInterval,withEvents,
+            debounce)
+
+    def removeWatch(self,
+        watchFn:"ezFs.WatcherFn"
+        )->None:
+        """
+        remove a change watcher to this item
+        """
+        ezFs.PollingItem.removeWatch(self,watchFn)
+
+
+class EzFsMemoryFile(ezFs.EzFsFile,EzFsMemoryItem):
+    """
+    A file on an in-memory filesystem
+    """
+    __slots__=('_lastVersion','_position')
+
+    # already in memory, so there is nothing to gain from caching
+    # or buffering
+    BLOCK_CACHE:bool=False
+    WRITE_BUFFER_SIZE:int=0
+
+    def __init__(self,
+        url:UrlCompatible,
+        filesystem:"EzFsMemoryFilesystem"):
+        """ """
+        ezFs.EzFsFile.__init__(self,url,filesystem)
+        EzFsMemoryItem.__init__(self,url,filesystem)
+        self._position:int=0
+
+    @property
+    def size(self)->typing.Optional[int]:
+        """
+        size of the file in bytes
+        """
+        node=self._node
+        if node is None or node.data is None:
+            return None
+        return len(node.data)
+
+    def _fileNode(self,create:bool=False)->_MemNode:
+        """
+        get our node, optionally creating it
+
+        :raises FileNotFoundError: if it does not exist and create is False
+        """
+        store=self._memFs.store
+        segments=_splitPath(self.url)
+        node=store.resolve(segments)
+        if node is None:
+            if not create or not segments:
+                raise FileNotFoundError(str(self.url))
+            parent=store.resolve(segments[:-1])
+            if parent is None:
+                raise FileNotFoundError(str(self.url))
+            node=_MemNode(segments[-1],None,False)
+            store.link(node,parent,segments[-1])
+        elif node.data is None:
+            raise IsADirectoryError(str(self.url))
+        return node
+
+    def markClean(self)->None:
+        """
+        mark this file as clean, meaning it is backed up elsewhere
+        and is therefore allowed to be evicted when memory is tight
+        """
+        node=self._fileNode()
+        node.dirty=False
+        self._memFs.store.lru[node]=None
+
+    def read(self, # pylint: disable=arguments-differ
+        numBytes:typing.Optional[int]=None,
+        encoding:typing.Optional[str]=None,
+        errors:str='ignore',
+        mimeType:typing.Optional[MimeTypeCompatible]=None,
+        )->typing.Union[str,bytes]:
+        """
+        read n# of bytes, or the whole thing
+        """
+        node=self._fileNode()
+        store=self._memFs.store
+        if node in store.lru:
+            store.lru.move_to_end(node) # type: ignore
+        data=typing.cast(bytearray,node.data)
+        start=self._position if self._isOpen else 0
+        end=len(data)
+        if numBytes is not None and numBytes>=0:
+            end=min(end,start+numBytes)
+        # slice a view so we only copy once
+        with memoryview(data) as view:
+            ret=bytes(view[start:end])
+        if self._isOpen:
+            self._position=max(start,end)
+        if encoding is not None:
+            return ret.decode(encoding,errors)
+        return ret
+
+    def _readRange(self,offset:int,numBytes:int)->bytes:
+        """
+        read part of the file in a single backend call
+        """
+        data=typing.cast(bytearray,self._fileNode().data)
+        with memoryview(data) as view:
+            return bytes(view[offset:offset+numBytes])
+
+    def write(self, # type: ignore # pylint: disable=arguments-renamed
+        data:typing.Union[bytes,str],
+        encoding:str='utf-8',
+        errors:str='ignore',
+        mimeType:typing.Optional[MimeTypeCompatible]=None,
+        append:bool=False
+        )->int:
+        """
+        Write the data to the file
+
+        If the file is not open, this replaces (or appends to) the
+        whole file.  If it is open, it writes at the current position.
+        """
+        if isinstance(data,str):
+            data=data.encode(encoding,errors)
+        node=self._fileNode(create=True)
+        store=self._memFs.store
+        body=typing.cast(bytearray,node.data)
+        if append or 'a' in self._fileAccessMode:
+            start=len(body)
+            newSize=start+len(data)
+        elif self._isOpen:
+            start=self._position
+            newSize=max(len(body),start+len(data))
+        else:
+            # not open, so replace the whole thing
+            start=0
+            newSize=len(data)
+        store.reserve(newSize-len(body),node)
+        end=start+len(data)
+        if newSize<len(body):
+            del body[newSize:]
+        elif start>len(body):
+            body.extend(bytes(start-len(body)))
+        body[start:end]=data
+        if self._isOpen:
+            self._position=end
+        self._changed(node)
+        return len(data)
+
+    def _writeRange(self,offset:int,data:bytes)->None:
+        """
+        overwrite part of the file in place
+        """
+        node=self._fileNode()
+        store=self._memFs.store
+        body=typing.cast(bytearray,node.data)
+        end=offset+len(data)
+        if end>len(body):
+            store.reserve(end-len(body),node)
+            if offset>len(body):
+                body.extend(bytes(offset-len(body)))
+        body[offset:end]=data
+        self._changed(node)
+
+    def truncate(self,__size:typing.Union[int,None]=None)->int:
+        """
+        cut the file off at a given size (default=current position),
+        or extend it with zeros
+        """
+        node=self._fileNode()
+        store=self._memFs.store
+        body=typing.cast(bytearray,node.data)
+        if __size is None:
+            __size=self._position
+        if __size==len(body):
+            return __size
+        store.reserve(__size-len(body),node)
+        if __size<len(body):
+            del body[__size:]
+        else:
+            body.extend(bytes(__size-len(body)))
+        self._changed(node)
+        return __size
+
+    def _changed(self,node:_MemNode)->None:
+        """
+        the file's contents were changed, so it is dirty (and so
+        cannot be evicted) until it is marked clean again
+        """
+        node.dirty=True
+        self._memFs.store.lru.pop(node,None)
+        node.touch()
+
+    def open(self,fileAccessMode:typing.Optional[str]=None)->"EzFsMemoryFile":
+        """
+        Open this file and return a file-like object
+
+        If not specified, file access mode will be self.accessMode
+        """
+        if fileAccessMode is not None:
+            self.fileAccessMode=fileAccessMode
+        mode=self._fileAccessMode
+        if 'w' in mode or 'a' in mode:
+            node=self._fileNode(create=True)
+            if 'w' in mode and 'r' not in mode and '+' not in mode:
+                self.truncate(0)
+        else:
+            node=self._fileNode()
+        self._position=len(node.data) if 'a' in mode else 0 # type: ignore
+        self._isOpen=True
+        return self
+
+    def seek(self,offset:int,whence:int=0)->int:
+        """
+        jump to file location
+        """
+        if whence==1:
+            offset+=self._position
+        elif whence==2:
+            offset+=len(self._fileNode().data) # type: ignore
+        if offset<0:
+            raise ValueError('negative seek position %d'%offset)
+        self._position=offset
+        return offset
+
+    def tell(self)->int:
+        """
+        return current file location
+        """
+        return self._position
+
+    def close(self)->None:
+        """
+        close open file handles
+        """
+        self._isOpen=False
+
+    def flush(self)->None:
+        """
+        Complete all i/o operations now.
+
+        (memory is always up to date, so nothing to do)
+        """
+
+
+class EzFsMemoryDirectory(ezFs.EzFsDirectory,EzFsMemoryItem):
+    """
+    A directory on an in-memory filesystem
+    """
+    __slots__=('_lastVersion','_treeWatcher')
+
+    def __init__(self,
+        url:UrlCompatible,
+        filesystem:"EzFsMemoryFilesystem"):
+        """ """
+        ezFs.EzFsDirectory.__init__(self,url,filesystem)
+        EzFsMemoryItem.__init__(self,url,filesystem)
+        self._treeWatcher:typing.Optional[ezFs.TreeWatcher]=None
+
+    def poll(self)->typing.Union[bool,typing.List["ezFs.ChangeEvent"]]:
+        """
+        check if anything in this directory tree has changed
+
+        If any watcher wants events, this keeps a snapshot of the
+        tree and reports exactly what changed.
+        """
+        if not self.wantsEvents:
+            self._treeWatcher=None
+            return EzFsMemoryItem.poll(self)
+        if self._treeWatcher is None:
+            self._treeWatcher=ezFs.TreeWatcher(self)
+            return []
+        return self._treeWatcher.poll()
+
+    def _treeDigest(self)->typing.Optional[str]:
+        """
+        changes whenever anything under this directory changes
+        """
+        node=self._node
+        if node is None:
+            return None
+        return str(node.treeVersion)
+
+    def _listPage(self,
+        cursor:typing.Optional[str],
+        limit:int
+        )->typing.Tuple[typing.List[ezFs.EzFsItem],typing.Optional[str]]:
+        """
+        get one page of the directory listing, in name order
+
+        The cursor is the last name returned, so a page is a binary
+        search away no matter how big the directory is.
+        """
+        node=self._node
+        if node is None or node.children is None:
+            return [],None
+        names=node.sortedNames()
+        start=0 if cursor is None else bisect.bisect_right(names,cursor)
+        end=start+limit
+        page=self._itemsFor(node,names[start:end])
+        if end>=len(names):
+            return page,None
+        return page,names[end-1]
+
+    def _listPrefix(self,
+        prefix:str
+        )->typing.Optional[typing.Iterable[ezFs.EzFsItem]]:
+        """
+        list only the items whose names start with prefix
+        """
+        node=self._node
+        if node is None or node.children is None:
+            return []
+        names=node.sortedNames()
+        start=bisect.bisect_left(names,prefix)
+        end=start
+        while end<len(names) and names[end].startswith(prefix):
+            end+=1
+        return self._itemsFor(node,names[start:end])
+
+    def _listRange(self,
+        start:typing.Optional[str],
+        stop:typing.Optional[str]
+        )->typing.Optional[typing.Iterable[ezFs.EzFsItem]]:
+        """
+        list only the items whose names are start<=name<stop
+        """
+        node=self._node
+        if node is None or node.children is None:
+            return []
+        names=node.sortedNames()
+        first=0 if start is None else bisect.bisect_left(names,start)
+        last=len(names) if stop is None else bisect.bisect_left(names,stop)
+        return self._itemsFor(node,names[first:last])
+
+    def _find(self,
+        where:"ezFs.Predicate",
+        prune:typing.Optional["ezFs.Predicate"]
+        )->typing.Optional[typing.Iterable[ezFs.EzFsItem]]:
+        """
+        find by walking the trie, checking predicates against the
+        nodes themselves so items are only created for matches
+        """
+        node=self._node
+        if node is None or node.children is None:
+            return []
+        return self._findNodes(node,where,prune)
+
+    def _findNodes(self,
+        top:_MemNode,
+        where:"ezFs.Predicate",
+        prune:typing.Optional["ezFs.Predicate"]
+        )->typing.Generator[ezFs.EzFsItem,None,None]:
+        """
+        breadth-first search of the trie under a node
+        """
+        view=_NodeView()
+        # (predicates that look at more than the node fields, such as
+        # plain functions, are given real items instead)
+        whereView=where.fieldsOnly
+        pruneView=prune is None or prune.fieldsOnly
+        todo=deque([(top,ezFs.childUrl(str(self.url),''),1)])
+        while todo:
+            node,base,depth=todo.popleft()
+            descend=where.canDescend(depth)
+            for name in node.sortedNames():
+                child=node.children.get(name) # type: ignore
+                if child is None:
+                    continue
+                view.node=child
+                item:typing.Optional[ezFs.EzFsItem]=None
+                if whereView:
+                    matched=where.matches(view,depth)
+                else:
+                    item=self._itemFor(base,name,child)
+                    matched=where.matches(item,depth)
+                if matched:
+                    if item is None:
+                        item=self._itemFor(base,name,child)
+                    yield item
+                if not descend or not child.isDir:
+                    continue
+                if prune is not None:
+                    if pruneView:
+                        pruned=prune.matches(view,depth)
+                    else:
+                        if item is None:
+                            item=self._itemFor(base,name,child)
+                        pruned=prune.matches(item,depth)
+                    if pruned:
+                        continue
+                todo.append((child,base+name+'/',depth+1))
+
+    def _itemFor(self,
+        base:str,
+        name:str,
+        child:_MemNode
+        )->ezFs.EzFsItem:
+        """
+        create the item for a child node
+        """
+        fs=self._memFs
+        if child.isDir:
+            return fs.DIRECTORY_CLASS(base+name+'/',fs)
+        return fs.FILE_CLASS(base+name,fs)
+
+    def _itemsFor(self,
+        node:_MemNode,
+        names:typing.Iterable[str]
+        )->typing.List[ezFs.EzFsItem]:
+        """
+        create items for the named children of a node
+        """
+        base=ezFs.childUrl(str(self.url),'')
+        ret:typing.List[ezFs.EzFsItem]=[]
+        for name in names:
+            child=node.children.get(name) # type: ignore
+            if child is None:
+                continue
+            ret.append(self._itemFor(base,name,child))
+        return ret
+
+    def _count(self)->typing.Optional[int]:
+        """
+        number of items in the directory
+        """
+        node=self._node
+        if node is None or node.children is None:
+            return 0
+        return len(node.children)
+
+    def get(self,
+        path:typing.Union[UrlCompatible,typing.List[str]],
+        idx:int=0
+        )->ezFs.EzFsItem:
+        """
+        retrieves the file or directory at the given path
+
+        Goes straight down the trie rather than listing each directory.
+        """
+        if isinstance(path,list):
+            path='/'.join(path[idx:])
+        elif idx:
+            path='/'.join(str(path).split('/')[idx:])
+        path=str(path)
+        if '://' not in path:
+            path=str(self.url.relative(path)) # type: ignore
+        return self._memFs._getFsItem(path)
+
+    def markDirty(self)->None:
+        """
+        marks the directory "dirty" and in need of refreshing
+
+        Memory is always current, so this merely signals watchers.
+        """
+        node=self._node
+        if node is not None:
+            node.touch()
+
+    def _mkdir(self,
+        newDirectoryName:UrlCompatible
+        )->None:
+        """
+        make a new directory
+        """
+        node=self._node
+        if node is None:
+            raise FileNotFoundError(str(self.url))
+        for name in _splitPath(newDirectoryName):
+            child=node.children.get(name) # type: ignore
+            if child is None:
+                child=_MemNode(name,None,True)
+                self._memFs.store.link(child,node,name)
+            elif not child.isDir:
+                raise FileExistsError(name)
+            node=child
+
+
+class EzFsMemoryFilesystem(ezFs.EzFsFilesystem):
+    """
+    An in-memory filesystem (mem://)
+
+    All filesystems sharing the same volume name share the same
+    storage, so EzFs().get('mem:///foo') sees what you put there.
+    """
+
+    URL_PROTOCOLS:typing.List[str]=['mem://']
+
+    # what kinds of items to create (derived classes may change these)
+    FILE_CLASS:typing.Type[EzFsMemoryFile]=EzFsMemoryFile
+    DIRECTORY_CLASS:typing.Type[EzFsMemoryDirectory]=EzFsMemoryDirectory
+
+    # shared storage for named volumes
+    VOLUMES:typing.Dict[str,_MemStore]={}
+
+    def __init__(self,
+        url:typing.Optional[UrlCompatible]=None,
+        maxBytes:typing.Optional[int]=None,
+        volume:typing.Optional[str]='default'):
+        """
+        :param url: where to start the working directory
+        :param maxBytes: memory cap, beyond which clean files are
+            evicted in least-recently-used order (None=unlimited)
+        :param volume: name of the shared storage to use
+            (None=a private volume just for this object)
+        """
+        if volume is None:
+            store=_MemStore(maxBytes)
+        else:
+            store=self.VOLUMES.get(volume)
+            if store is None:
+                store=_MemStore(maxBytes)
+                self.VOLUMES[volume]=store
+            elif maxBytes is not None:
+                store.maxBytes=maxBytes
+        self.store:_MemStore=store
+        self.volume:typing.Optional[str]=volume
+        if url is None:
+            url=self.URL_PROTOCOLS[0]+'/'
+        ezFs.EzFsFilesystem.__init__(self,url)
+
+    def _config(self)->typing.Tuple[typing.Tuple,typing.Dict[str,typing.Any]]: # noqa: E501 # pylint: disable=line-too-long
+        """
+        what this filesystem was created with
+
+        (the contents are not part of it, so another process gets an
+        empty volume of the same name)
+        """
+        return ((str(self.url),),
+            {'maxBytes':self.store.maxBytes,'volume':self.volume})
+
+    def _poolable(self)->bool:
+        """
+        private volumes all have the same _config(), but are not the
+        same filesystem
+        """
+        return self.volume is not None
+
+    @property
+    def usedBytes(self)->int:
+        """
+        how many bytes are taken up by file bodies
+        """
+        return self.store.usedBytes
+
+    def _getFsItem(self,url:UrlCompatible)->ezFs.EzFsItem:
+        """
+        get a single item from the filesystem
+
+        If the item does not exist, but its directory does, returns
+        a not-yet-existing file so it can be written to.
+        """
+        url=str(url)
+        if '://' not in url:
+            url=self.URL_PROTOCOLS[0]+url
+        segments=_splitPath(url)
+        node=self.store.resolve(segments)
+        if node is None:
+            parent=self.store.resolve(segments[:-1])
+            if parent is None or not parent.isDir:
+                raise FileNotFoundError(url)
+        elif node.isDir:
+            if not url.endswith('/'):
+                url+='/'
+            return self.DIRECTORY_CLASS(url,self)
+        return self.FILE_CLASS(url,self)
+
+    def _nodeFor(self,fsItem:typing.Union[ezFs.EzFsItem,UrlCompatible])->_MemNode: # noqa: E501 # pylint: disable=line-too-long
+        """
+        get the node for an item, which must exist
+        """
+        if isinstance(fsItem,ezFs.EzFsItem):
+            fsItem=typing.cast(UrlCompatible,fsItem.url)
+        node=self.store.resolve(_splitPath(fsItem))
+        if node is None:
+            raise FileNotFoundError(str(fsItem))
+        return node
+
+    def _destination(self,
+        newLocation:UrlCompatible
+        )->typing.Tuple[_MemNode,str]:
+        """
+        find the parent node and name for a new location
+        """
+        newLocation=str(newLocation)
+        if '://' not in newLocation:
+            newLocation=str(self.workingDirectory.url.relative(newLocation)) # type: ignore # noqa: E501 # pylint: disable=line-too-long
+        segments=_splitPath(newLocation)
+        if not segments:
+            raise FileExistsError(newLocation)
+        parent=self.store.resolve(segments[:-1])
+        if parent is None or not parent.isDir:
+            raise FileNotFoundError(newLocation)
+        return parent,segments[-1]
+
+    def _delete(self,fsItem:"ezFs.EzFsItem")->None:
+        """ delete """
+        self.store.unlink(self._nodeFor(fsItem))
+
+    def _rename(self,
+        fsItem:"ezFs.EzFsItem",
+        newName:UrlCompatible)->None:
+        """ rename """
+        node=self._nodeFor(fsItem)
+        newName=str(newName)
+        if '/' in newName:
+            self._move(fsItem,newName)
+            return
+        parent=typing.cast(_MemNode,node.parent)
+        if newName in parent.children: # type: ignore
+            raise FileExistsError(newName)
+        del parent.children[node.name] # type: ignore
+        self.store.link(node,parent,newName) # (like posix, keeps its mtime)
+
+    def _copy(self,
+        fsItem:"ezFs.EzFsItem",
+        newLocation:UrlCompatible)->None:
+        """ copy """
+        node=self._nodeFor(fsItem)
+        parent,name=self._destination(newLocation)
+        if name in parent.children: # type: ignore
+            raise FileExistsError(str(newLocation))
+        self.store.link(self.store.clone(node),parent,name)
+
+    def _move(self,
+        fsItem:"ezFs.EzFsItem",
+        newLocation:UrlCompatible)->None:
+        """ move (simply relinks the node) """
+        node=self._nodeFor(fsItem)
+        parent,name=self._destination(newLocation)
+        ancestor:typing.Optional[_MemNode]=parent
+        while ancestor is not None:
+            if ancestor is node:
+                raise PermissionError(
+                    f'Cannot move {fsItem.url} inside of itself')
+            ancestor=ancestor.parent
+        if name in parent.children: # type: ignore
+            raise FileExistsError(str(newLocation))
+        oldParent=typing.cast(_MemNode,node.parent)
+        del oldParent.children[node.name] # type: ignore
+        oldParent.touch()
+        self.store.link(node,parent,name) # (like posix, keeps its mtime)
+
+    def _mkdir(self,
+        newDirectoryName:UrlCompatible
+        )->None:
+        """
+        pass-through to working directory
+        """
+        self.workingDirectory._mkdir(newDirectoryName) # type: ignore # pylint: disable=protected-access
+
+
+MemoryFs=EzFsMemoryFilesystem
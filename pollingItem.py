@@ -8,9 +8,17 @@ callbacks
 import typing
 from abc import abstractmethod
 import time
+from .instrumentation import instrument
+if typing.TYPE_CHECKING:
+    from .snapshot import ChangeEvent
 
 
-WatcherFn=typing.Callable[[typing.Any],None]
+# called as watchFn(item), or watchFn(item,events) if it was added
+# with withEvents=True (events is a list of ezFs.ChangeEvent)
+WatcherFn=typing.Callable[...,None]
+
+# (watchFn,interval,withEvents,debounce)
+Watch=typing.Tuple[WatcherFn,float,bool,typing.Optional[float]]
 
 
 class PollingItem:
@@ -18,22 +26,49 @@ class PollingItem:
     A utility that causes a derived poll() function
     to be called as often as needed for the registered
     callbacks
+
+    NOTE: this has no __slots__ of its own so that it can be mixed
+    into slotted items (python only allows one base class with
+    slots).  EzFsItem declares _watches, _leastPollingInterval and
+    _lastPoll for it instead, so items never need to.
     """
+    __slots__=()
 
     def __init__(self)->None:
         """ """
-        self._watches:typing.List[
-            typing.Tuple[WatcherFn,float]]=[] # (watchFn,interval)
+        self._watches:typing.List[Watch]=[]
         self._leastPollingInterval:typing.Optional[float]=None
         self._lastPoll:typing.Optional[float]=None
 
+    def __init_subclass__(cls,**kwargs):
+        """
+        Wrap poll() of derived classes for metrics
+        """
+        super().__init_subclass__(**kwargs)
+        instrument(cls)
+
     @abstractmethod
-    def poll(self)->bool:
+    def poll(self)->typing.Union[bool,typing.List["ChangeEvent"]]:
         """
         derived classes implement this
 
-        returns True if watchers should be notified
+        returns True if watchers should be notified, or better yet,
+        a list of ChangeEvents saying what changed
+        (an empty list means nothing changed)
+        """
+
+    @property
+    def wantsEvents(self)->bool:
+        """
+        was any watcher added with withEvents=True?
+
+        (derived classes can use this to decide whether it is worth
+        working out exactly what changed)
         """
+        for _,_,withEvents,_ in self._watches:
+            if withEvents:
+                return True
+        return False
 
     def _test_poll(self)->None:
         """
@@ -47,22 +82,106 @@ class PollingItem:
         elif now-self._lastPoll>self._leastPollingInterval:
             doPoll=True
         if doPoll:
+            if self._pushed():
+                return # the kernel tells us, so there is no need to poll
             self._lastPoll=now
-            if self.poll():
-                for fn,_ in self._watches:
+            self._notify(self.poll())
+
+    def _notify(self,
+        changes:typing.Union[bool,typing.List["ChangeEvent"]],
+        inline:bool=True
+        )->None:
+        """
+        call the watchers about some changes
+
+        (called after polling, or by whatever pushes changes to us)
+
+        :param inline: call watchers that have no debounce right here
+            (otherwise everything goes through the EventDispatcher so
+            that a slow watcher cannot hold up the caller)
+        """
+        if not changes:
+            return
+        events:typing.Optional[typing.List[ChangeEvent]]=None
+        for fn,_,withEvents,debounce in list(self._watches):
+            if inline and debounce is None:
+                if not withEvents:
                     fn(self)
+                    continue
+                if events is None:
+                    events=self._asEvents(changes)
+                fn(self,events)
+                continue
+            if events is None:
+                events=self._asEvents(changes)
+            from .dispatcher import EventDispatcher
+            EventDispatcher.shared().submit(self,fn,withEvents,events,
+                debounce or 0.0)
+
+    def _pushed(self)->bool:
+        """
+        are changes being pushed to us by the kernel (instead of polling)?
+        """
+        if getattr(self,'localPath',None) is None:
+            return False
+        from .inotify import InotifyWatcher
+        shared=InotifyWatcher._shared # pylint: disable=protected-access
+        return shared is not None and shared.isWatching(self)
+
+    def _startPush(self)->bool:
+        """
+        try to have the kernel push changes to us
+
+        :return: False if this item has to be polled instead
+        """
+        localPath=getattr(self,'localPath',None)
+        if localPath is None:
+            return False
+        from .inotify import InotifyWatcher,canNotify
+        if not canNotify(localPath):
+            return False
+        try:
+            return InotifyWatcher.shared().add(self,localPath)
+        except OSError:
+            return False
+
+    def _asEvents(self,
+        changes:typing.Union[bool,typing.List["ChangeEvent"]]
+        )->typing.List["ChangeEvent"]:
+        """
+        turn whatever poll() returned into a list of events
+        """
+        if isinstance(changes,list):
+            return changes
+        from .snapshot import ChangeEvent
+        url=str(getattr(self,'url',''))
+        return [ChangeEvent('modified',url,url.endswith('/'))]
 
-    def addWatch(self,watchFn:WatcherFn,pollingInterval:float=1)->None:
+    def addWatch(self,
+        watchFn:WatcherFn,
+        pollingInterval:float=1,
+        withEvents:bool=False,
+        debounce:typing.Optional[float]=None
+        )->None:
         """
         add a change watcher to this item
 
         :param watchFn: will call watchFn(pollingItem) upon change
+        :param pollingInterval: how often to poll (ignored if the item
+            has a localPath that the kernel can notify us about)
+        :param withEvents: call watchFn(pollingItem,events) instead,
+            where events is a list of ChangeEvents
+        :param debounce: collect changes for this many seconds, merge
+            them, and deliver them in one call on a worker thread
+            (None=call straight away, on the polling thread)
         """
         self._leastPollingInterval=pollingInterval
-        for _,interval in self._watches:
+        for _,interval,_,_ in self._watches:
             if interval<self._leastPollingInterval:
                 self._leastPollingInterval=interval
-        self._watches.append((watchFn,pollingInterval))
+        self._watches.append((watchFn,pollingInterval,withEvents,debounce))
+        if self._pushed() or self._startPush():
+            return
         self._test_poll()
 
     def removeWatch(self,watchFn:WatcherFn)->None:
@@ -72,3 +191,10 @@ class PollingItem:
         for i,item in enumerate(self._watches):
             if item[0]==watchFn:
                 del self._watches[i]
+                break
+        from .dispatcher import EventDispatcher
+        if EventDispatcher._shared is not None: # pylint: disable=protected-access
+            EventDispatcher.shared().cancel(self,watchFn)
+        if not self._watches and self._pushed():
+            from .inotify import InotifyWatcher
+            InotifyWatcher.shared().remove(self)
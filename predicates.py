@@ -0,0 +1,358 @@
+#!/usr/bin/env
+# -*- coding: utf-8 -*-
+"""
+Composable predicates for EzFsDirectory.find(where=...)
+
+Predicates combine with &, | and ~, eg
+    where=ezFs.NameMatches('*.log') & ezFs.ModifiedBetween.olderThan(86400*30)
+
+They only look at name, isDir, size and mtime (and how deep the
+item is), so backends that can filter on the server side are able
+to translate them (see EzFsDirectory._find()).  The exception is a
+plain function passed as where=, which gets real items, so anything
+with fieldsOnly False has to be checked against an EzFsItem.
+"""
+import typing
+import time
+import re
+import fnmatch
+
+
+class Predicate:
+    """
+    Base class for all find() predicates
+
+    Derived classes implement matches() and, if it helps,
+    canDescend() so that whole subtrees can be skipped.
+    """
+
+    # how expensive this is to check (AllOf/AnyOf check cheap things first)
+    #   0=name/type/depth, 1=needs metadata (may be a round trip)
+    COST:int=0
+
+    # only looks at name, isDir, size, mtime and depth (so a backend
+    # can check it against its own records instead of an EzFsItem)
+    FIELDS_ONLY:bool=True
+
+    def matches(self,item:typing.Any,depth:int)->bool:
+        """
+        does this item match?
+
+        :param item: anything with name, isDir, size and mtime
+            (usually an EzFsItem)
+        :param depth: 1 for the children of the directory being searched,
+            2 for grandchildren, etc
+        """
+        raise NotImplementedError()
+
+    def canDescend(self,depth:int)->bool: # pylint: disable=unused-argument
+        """
+        could anything below this depth possibly match?
+
+        :param depth: depth of the directory we are thinking of going into
+        """
+        return True
+
+    @property
+    def cost(self)->int:
+        """
+        how expensive this is to check
+        """
+        return self.COST
+
+    @property
+    def fieldsOnly(self)->bool:
+        """
+        does this only look at name, isDir, size, mtime and depth?
+        """
+        return self.FIELDS_ONLY
+
+    def __and__(self,other:"Predicate")->"Predicate":
+        return AllOf(self,other)
+
+    def __or__(self,other:"Predicate")->"Predicate":
+        return AnyOf(self,other)
+
+    def __invert__(self)->"Predicate":
+        return Not(self)
+
+
+class NameMatches(Predicate):
+    """
+    Name matches a glob expression (*, ? and [] ranges)
+    """
+
+    def __init__(self,expression:str,ignoreCase:bool=False):
+        """
+        :param expression: glob for the name (not the path)
+        """
+        self.expression=expression
+        self.ignoreCase=ignoreCase
+        self._regex=re.compile(fnmatch.translate(expression),
+            re.IGNORECASE if ignoreCase else 0)
+
+    @property
+    def prefix(self)->str:
+        """
+        the literal part at the start of the expression
+        """
+        ret=re.split(r'[*?[]',self.expression,1)[0]
+        return '' if self.ignoreCase else ret
+
+    def matches(self,item:typing.Any,depth:int)->bool:
+        return self._regex.match(item.name) is not None
+
+    def __repr__(self)->str:
+        return f'NameMatches({self.expression!r})'
+
+
+class TypeIs(Predicate):
+    """
+    Item is a file, or a directory
+    """
+
+    def __init__(self,kind:str):
+        """
+        :param kind: 'file' or 'dir'
+        """
+        if kind not in ('file','dir'):
+            raise ValueError(f'kind must be "file" or "dir", not "{kind}"')
+        self.kind=kind
+
+    def matches(self,item:typing.Any,depth:int)->bool:
+        return item.isDir==(self.kind=='dir')
+
+    def __repr__(self)->str:
+        return f'TypeIs({self.kind!r})'
+
+
+class DepthBetween(Predicate):
+    """
+    Item is between minDepth and maxDepth levels down (inclusive)
+
+    Directories deeper than maxDepth are never listed.
+    """
+
+    def __init__(self,
+        minDepth:typing.Optional[int]=None,
+        maxDepth:typing.Optional[int]=None):
+        """
+        :param minDepth: 1=children of the directory being searched
+        :param maxDepth: None=no limit
+        """
+        self.minDepth=minDepth
+        self.maxDepth=maxDepth
+
+    def matches(self,item:typing.Any,depth:int)->bool:
+        if self.minDepth is not None and depth<self.minDepth:
+            return False
+        return self.maxDepth is None or depth<=self.maxDepth
+
+    def canDescend(self,depth:int)->bool:
+        return self.maxDepth is None or depth<self.maxDepth
+
+    def __repr__(self)->str:
+        return f'DepthBetween({self.minDepth},{self.maxDepth})'
+
+
+class SizeBetween(Predicate):
+    """
+    File size is minSize<=size<=maxSize bytes
+
+    Items of unknown size (including directories) never match.
+    """
+    COST=1
+
+    def __init__(self,
+        minSize:typing.Optional[int]=None,
+        maxSize:typing.Optional[int]=None):
+        """
+        :param minSize: None=no minimum
+        :param maxSize: None=no maximum
+        """
+        self.minSize=minSize
+        self.maxSize=maxSize
+
+    def matches(self,item:typing.Any,depth:int)->bool:
+        size=item.size
+        if size is None:
+            return False
+        if self.minSize is not None and size<self.minSize:
+            return False
+        return self.maxSize is None or size<=self.maxSize
+
+    def __repr__(self)->str:
+        return f'SizeBetween({self.minSize},{self.maxSize})'
+
+
+class ModifiedBetween(Predicate):
+    """
+    Modified time is after<=mtime<before (seconds since the epoch)
+
+    Items with an unknown modified time never match.
+    """
+    COST=1
+
+    def __init__(self,
+        after:typing.Optional[float]=None,
+        before:typing.Optional[float]=None):
+        """
+        :param after: None=since forever
+        :param before: None=until now
+        """
+        self.after=after
+        self.before=before
+
+    @classmethod
+    def olderThan(cls,seconds:float)->"ModifiedBetween":
+        """
+        not modified in the last n seconds
+        """
+        return cls(None,time.time()-seconds)
+
+    @classmethod
+    def newerThan(cls,seconds:float)->"ModifiedBetween":
+        """
+        modified in the last n seconds
+        """
+        return cls(time.time()-seconds,None)
+
+    def matches(self,item:typing.Any,depth:int)->bool:
+        mtime=item.mtime
+        if mtime is None:
+            return False
+        if self.after is not None and mtime<self.after:
+            return False
+        return self.before is None or mtime<self.before
+
+    def __repr__(self)->str:
+        return f'ModifiedBetween({self.after},{self.before})'
+
+
+class AllOf(Predicate):
+    """
+    All of the predicates match (checks the cheap ones first)
+    """
+
+    def __init__(self,*predicates:Predicate):
+        """ """
+        flat:typing.List[Predicate]=[]
+        for predicate in predicates:
+            if isinstance(predicate,AllOf):
+                flat.extend(predicate.predicates)
+            else:
+                flat.append(predicate)
+        self.predicates:typing.List[Predicate]=sorted(flat,
+            key=lambda predicate:predicate.cost)
+
+    @property
+    def cost(self)->int:
+        return max((p.cost for p in self.predicates),default=0)
+
+    @property
+    def fieldsOnly(self)->bool:
+        return all(p.fieldsOnly for p in self.predicates)
+
+    def matches(self,item:typing.Any,depth:int)->bool:
+        for predicate in self.predicates:
+            if not predicate.matches(item,depth):
+                return False
+        return True
+
+    def canDescend(self,depth:int)->bool:
+        for predicate in self.predicates:
+            if not predicate.canDescend(depth):
+                return False
+        return True
+
+    def __repr__(self)->str:
+        return 'AllOf(%s)'%(','.join(repr(p) for p in self.predicates))
+
+
+class AnyOf(Predicate):
+    """
+    Any of the predicates match (checks the cheap ones first)
+    """
+
+    def __init__(self,*predicates:Predicate):
+        """ """
+        flat:typing.List[Predicate]=[]
+        for predicate in predicates:
+            if isinstance(predicate,AnyOf):
+                flat.extend(predicate.predicates)
+            else:
+                flat.append(predicate)
+        self.predicates:typing.List[Predicate]=sorted(flat,
+            key=lambda predicate:predicate.cost)
+
+    @property
+    def cost(self)->int:
+        return max((p.cost for p in self.predicates),default=0)
+
+    @property
+    def fieldsOnly(self)->bool:
+        return all(p.fieldsOnly for p in self.predicates)
+
+    def matches(self,item:typing.Any,depth:int)->bool:
+        for predicate in self.predicates:
+            if predicate.matches(item,depth):
+                return True
+        return False
+
+    def canDescend(self,depth:int)->bool:
+        for predicate in self.predicates:
+            if predicate.canDescend(depth):
+                return True
+        return False
+
+    def __repr__(self)->str:
+        return 'AnyOf(%s)'%(','.join(repr(p) for p in self.predicates))
+
+
+class Not(Predicate):
+    """
+    The predicate does not match
+    """
+
+    def __init__(self,predicate:Predicate):
+        """ """
+        self.predicate=predicate
+
+    @property
+    def cost(self)->int:
+        return self.predicate.cost
+
+    @property
+    def fieldsOnly(self)->bool:
+        return self.predicate.fieldsOnly
+
+    def matches(self,item:typing.Any,depth:int)->bool:
+        return not self.predicate.matches(item,depth)
+
+    def __repr__(self)->str:
+        return f'Not({self.predicate!r})'
+
+
+def asPredicate(where:typing.Union[Predicate,
+    typing.Callable[[typing.Any],bool],None])->typing.Optional[Predicate]:
+    """
+    allow a plain function (item)->bool to be used as a predicate
+    """
+    if where is None or isinstance(where,Predicate):
+        return where
+    return _FunctionPredicate(where)
+
+
+class _FunctionPredicate(Predicate):
+    """
+    wraps a plain function (item)->bool
+    """
+    COST=1
+    FIELDS_ONLY=False
+
+    def __init__(self,fn:typing.Callable[[typing.Any],bool]):
+        """ """
+        self.fn=fn
+
+    def matches(self,item:typing.Any,depth:int)->bool:
+        return bool(self.fn(item))
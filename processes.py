@@ -0,0 +1,98 @@
+#!/usr/bin/env
+# -*- coding: utf-8 -*-
+"""
+Using filesystems and items from more than one process
+
+Pickling an item only sends its url and its filesystem, and pickling
+a filesystem only sends its class and what it was created with (see
+EzFsFilesystem._config()), rather than parents, caches and open
+files.  On the other side, filesystems come out of a per-process
+pool, so the thousands of items sent to a multiprocessing worker
+all share the one filesystem (and its connections) there.  (Except
+for filesystems that say they cannot be pooled, such as private
+memory volumes, where each pickle gets a new one.)
+
+After a fork, the child process starts over with its own pool, its
+own shared BlockCache, prefetcher, watchers and locks, and its own
+DiskCache connections and open cached files, since the parent's
+threads do not exist in the child, and its connections and file
+positions must not be shared.  (Watches need to be added again in
+the child.)
+"""
+import typing
+import os
+import threading
+import ezFs
+
+
+# (class,args,kwargs):filesystem
+_filesystems:typing.Dict[typing.Tuple,"ezFs.EzFsFilesystem"]={}
+_filesystemsLock=threading.Lock()
+
+
+def _rehydrateFilesystem(
+    cls:typing.Type["ezFs.EzFsFilesystem"],
+    args:typing.Tuple,
+    kwargs:typing.Dict[str,typing.Any],
+    poolable:bool=True
+    )->"ezFs.EzFsFilesystem":
+    """
+    unpickle a filesystem, reusing this process's one if there is one
+
+    :param poolable: False to always create a new one
+        (see EzFsFilesystem._poolable())
+    """
+    if not poolable:
+        return cls(*args,**kwargs)
+    try:
+        key=(cls,args,tuple(sorted(kwargs.items())))
+        hash(key)
+    except TypeError:
+        return cls(*args,**kwargs) # (cannot be pooled)
+    with _filesystemsLock:
+        filesystem=_filesystems.get(key)
+        if filesystem is None:
+            filesystem=cls(*args,**kwargs)
+            _filesystems[key]=filesystem
+        return filesystem
+
+
+def _rehydrateItem(
+    filesystem:typing.Optional["ezFs.EzFsFilesystem"],
+    url:str
+    )->"ezFs.EzFsItem":
+    """
+    unpickle an item by looking it up again
+    """
+    if filesystem is None:
+        return ezFs.EzFs().get(url)
+    return filesystem.get(url)
+
+
+def pooledFilesystems()->typing.List["ezFs.EzFsFilesystem"]:
+    """
+    the filesystems that have been unpickled in this process
+    """
+    with _filesystemsLock:
+        return list(_filesystems.values())
+
+
+def _afterFork()->None:
+    """
+    start the child process over with its own shared state
+    """
+    global _filesystemsLock # pylint: disable=global-statement
+    _filesystemsLock=threading.Lock()
+    _filesystems.clear()
+    # (the parent's threads are gone, and its locks may have been
+    # held by one of them at the time)
+    for cls in (ezFs.BlockCache,ezFs.Prefetcher,ezFs.EventDispatcher,
+        ezFs.InotifyWatcher):
+        cls._sharedLock=threading.Lock() # pylint: disable=protected-access
+        cls._shared=None # pylint: disable=protected-access
+    ezFs.handles._itemLocks=[threading.Lock() for _ in ezFs.handles._itemLocks] # noqa: E501 # pylint: disable=line-too-long,protected-access
+    ezFs.DiskCache._afterFork() # pylint: disable=protected-access
+
+
+if hasattr(os,'register_at_fork'):
+    os.register_at_fork(after_in_child=_afterFork)
@@ -0,0 +1,91 @@
+#!/usr/bin/env
+# -*- coding: utf-8 -*-
+"""
+Keep track of how much work has been done, and how fast
+"""
+import typing
+import sys
+import time
+import threading
+
+
+class Progress:
+    """
+    Keep track of how much work has been done, and how fast
+
+    Safe to update from multiple threads.
+    """
+
+    def __init__(self,
+        label:str='',
+        interval:float=0.5,
+        stream:typing.Optional[typing.TextIO]=None):
+        """
+        :param label: what to call this in the progress line
+        :param interval: minimum seconds between progress lines
+            (0=never print)
+        :param stream: where to print progress (default=stderr)
+        """
+        self.label=label
+        self.interval=interval
+        self.stream=stream
+        self.items:int=0
+        self.numBytes:int=0
+        self.errors:int=0
+        self.startTime:float=time.perf_counter()
+        self._lastReport:float=self.startTime
+        self._lock=threading.Lock()
+
+    def add(self,items:int=1,numBytes:int=0,errors:int=0)->None:
+        """
+        record some work being done
+        """
+        with self._lock:
+            self.items+=items
+            self.numBytes+=numBytes
+            self.errors+=errors
+            if not self.interval:
+                return
+            now=time.perf_counter()
+            if now-self._lastReport<self.interval:
+                return
+            self._lastReport=now
+        self.report()
+
+    @property
+    def elapsed(self)->float:
+        """
+        seconds since we started
+        """
+        return time.perf_counter()-self.startTime
+
+    @property
+    def itemsPerSecond(self)->float:
+        """
+        how many items per second
+        """
+        elapsed=self.elapsed
+        return self.items/elapsed if elapsed>0 else 0.0
+
+    @property
+    def bytesPerSecond(self)->float:
+        """
+        how many bytes per second
+        """
+        elapsed=self.elapsed
+        return self.numBytes/elapsed if elapsed>0 else 0.0
+
+    def __str__(self)->str:
+        errors='' if not self.errors else ' %d error(s)'%self.errors
+        return '%s%d item(s) %.1f MB in %.1fs (%.1f items/s, %.2f MB/s)%s'%(
+            self.label+' ' if self.label else '',
+            self.items,self.numBytes/1e6,self.elapsed,
+            self.itemsPerSecond,self.bytesPerSecond/1e6,errors)
+
+    def report(self,final:bool=False)->None:
+        """
+        print a progress line
+        """
+        stream=self.stream if self.stream is not None else sys.stderr
+        stream.write(('\r%s\n' if final else '\r%s')%self)
+        stream.flush()
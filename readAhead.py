@@ -0,0 +1,172 @@
+#!/usr/bin/env
+# -*- coding: utf-8 -*-
+"""
+Adaptive read-ahead for sequential reads of remote files
+
+Much like the kernel's readahead, each open file keeps track of
+whether it is being read sequentially.  While it is, the next window
+of the file is fetched into the BlockCache on a background thread,
+and the window doubles with every sequential read (up to the file's
+READ_AHEAD_MAX), so that a scan stops waiting on the network.  The
+first read that is not where the last one left off drops the window
+back to nothing.
+
+Only files that support ranged reads, and use the BlockCache, can
+read ahead (anything else would have to move the file position).
+
+The bytes being prefetched at any moment are limited per filesystem
+(EzFsFilesystem.PREFETCH_MAX_BYTES).  Once fetched, they are part of
+the BlockCache, which has its own limit.
+"""
+import typing
+import os
+import threading
+import concurrent.futures
+import ezFs
+
+
+# the window to start with once a file looks sequential
+READ_AHEAD_MIN=128*1024
+
+
+class Prefetcher:
+    """
+    Runs prefetches on a few background threads, keeping track of
+    how many bytes each filesystem has in flight
+
+    Use Prefetcher.shared() rather than creating your own.
+    """
+
+    _shared:typing.Optional["Prefetcher"]=None
+    _sharedLock=threading.Lock()
+
+    @classmethod
+    def shared(cls)->"Prefetcher":
+        """
+        the prefetcher for this process
+        """
+        with cls._sharedLock:
+            if cls._shared is None:
+                cls._shared=cls()
+            return cls._shared
+
+    def __init__(self,workers:int=4):
+        """
+        :param workers: most prefetches to run at the same time
+        """
+        self.prefetches=0
+        self.skipped=0
+        self._inFlight:typing.Dict[int,int]={} # id(filesystem):bytes
+        self._lock=threading.Lock()
+        self._pool=concurrent.futures.ThreadPoolExecutor(workers,
+            thread_name_prefix='ezFs-readahead')
+
+    def close(self)->None:
+        """
+        stop the background threads
+        """
+        self._pool.shutdown(wait=True)
+
+    def submit(self,
+        item:"ezFs.EzFsFile",
+        offset:int,
+        numBytes:int
+        )->typing.Optional[concurrent.futures.Future]:
+        """
+        start fetching part of a file into the BlockCache
+
+        :return: a future to wait on, or None if the filesystem
+            already has too much in flight
+        """
+        fs=item.filesystem
+        key=id(fs)
+        with self._lock:
+            inFlight=self._inFlight.get(key,0)
+            if inFlight+numBytes>fs.PREFETCH_MAX_BYTES:
+                self.skipped+=1
+                return None
+            self._inFlight[key]=inFlight+numBytes
+            self.prefetches+=1
+        def fetch()->None:
+            try:
+                ezFs.BlockCache.shared().read(item,offset,numBytes)
+            finally:
+                with self._lock:
+                    left=self._inFlight[key]-numBytes
+                    if left:
+                        self._inFlight[key]=left
+                    else:
+                        del self._inFlight[key]
+        return self._pool.submit(fetch)
+
+
+class ReadAhead:
+    """
+    The read-ahead state of one open file
+    """
+    __slots__=('nextOffset','window','prefetchedTo','future','futureStart',
+        'futurePid')
+
+    def __init__(self)->None:
+        """ """
+        self.nextOffset:int=0 # (so reading from the start is sequential)
+        self.window:int=0
+        self.prefetchedTo:int=0
+        self.future:typing.Optional[concurrent.futures.Future]=None
+        self.futureStart:int=0
+        # (a future from before a fork will never finish in the child)
+        self.futurePid:int=0
+
+    def wait(self,offset:int,numBytes:int)->None:
+        """
+        before reading, wait for a prefetch of the same bytes to finish
+        (rather than fetching them all over again)
+        """
+        future=self.future
+        if future is not None and offset<self.prefetchedTo \
+            and offset+numBytes>self.futureStart \
+            and self.futurePid==os.getpid():
+            try:
+                future.result()
+            except Exception: # pylint: disable=broad-except
+                pass # (the read will find out for itself)
+
+    def advance(self,
+        item:"ezFs.EzFsFile",
+        offset:int,
+        numBytes:int,
+        numRead:int
+        )->None:
+        """
+        after reading, grow or drop the window, and prefetch more
+        if we are getting close to the end of what has been fetched
+
+        :param numBytes: how much was asked for
+        :param numRead: how much was actually read
+        """
+        end=offset+numRead
+        sequential=offset==self.nextOffset
+        self.nextOffset=end
+        if not sequential:
+            self.window=0
+            self.prefetchedTo=end
+            return
+        if numRead<numBytes:
+            return # end of the file
+        limit=min(item.READ_AHEAD_MAX,ezFs.BlockCache.shared().maxBytes//4)
+        self.window=min(max(self.window*2,READ_AHEAD_MIN),limit)
+        if self.window<=0:
+            return
+        start=max(self.prefetchedTo,end)
+        if start-end>=self.window//2:
+            return # still plenty ahead of the reader
+        if self.future is not None and not self.future.done() \
+            and self.futurePid==os.getpid():
+            return
+        size=end+self.window-start
+        future=Prefetcher.shared().submit(item,start,size)
+        if future is not None:
+            self.future=future
+            self.futureStart=start
+            self.futurePid=os.getpid()
+            self.prefetchedTo=start+size
@@ -29,8 +29,11 @@ def cmdline(args):
         name:[]
     }
     package_dir={name:here}
+    entry_points={ # built-in filesystem plugins
+        'ezFs':['mem=ezFs.memoryFs:EzFsMemoryFilesystem']
+    }
     distclass=BinaryDistribution
-    setup(name=name,version=version,description=description,packages=packages,package_dir=package_dir,package_data=package_data,distclass=distclass)
+    setup(name=name,version=version,description=description,packages=packages,package_dir=package_dir,package_data=package_data,entry_points=entry_points,distclass=distclass)
 
 
 if __name__=='__main__':
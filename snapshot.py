@@ -0,0 +1,240 @@
+#!/usr/bin/env
+# -*- coding: utf-8 -*-
+"""
+Merkle-tree snapshots of directory trees, for cheap change detection
+
+Every directory in a snapshot has a digest of its entries (names,
+types, sizes and mtimes) and of the digests of its subdirectories.
+Comparing two snapshots only goes into subtrees whose digests differ,
+and the differences come out as structured ChangeEvents.
+
+Backends that can tell cheaply whether anything under a directory
+has changed (eg a version number, or an ETag for a prefix) should
+implement EzFsDirectory._treeDigest(), and re-snapshotting will skip
+whole unchanged subtrees without listing them.
+"""
+import typing
+import hashlib
+import ezFs
+
+
+class ChangeEvent(typing.NamedTuple):
+    """
+    Something that changed between two snapshots
+    """
+    kind:str # 'created', 'modified', 'deleted' or 'moved'
+    url:str
+    isDir:bool
+    oldUrl:typing.Optional[str]=None # where it was moved from
+
+    def __str__(self)->str:
+        if self.oldUrl is not None:
+            return f'{self.kind} {self.oldUrl} -> {self.url}'
+        return f'{self.kind} {self.url}'
+
+
+# what we remember about each item (isDir,size,mtime)
+Entry=typing.Tuple[bool,typing.Optional[int],typing.Optional[float]]
+
+
+class DirectorySnapshot:
+    """
+    A snapshot of a single directory and (recursively) everything in it
+    """
+    __slots__=('url','entries','children','digest','treeDigest')
+
+    def __init__(self,
+        url:str,
+        entries:typing.Dict[str,Entry],
+        children:typing.Dict[str,"DirectorySnapshot"],
+        treeDigest:typing.Optional[str]=None):
+        """
+        :param url: url of the directory (ending in '/')
+        :param entries: {name:(isDir,size,mtime)}
+        :param children: {name:snapshot} of the subdirectories
+        :param treeDigest: the backend's own digest, if it has one
+        """
+        self.url=url
+        self.entries=entries
+        self.children=children
+        self.treeDigest=treeDigest
+        h=hashlib.sha1()
+        for name in sorted(entries):
+            isDir,size,mtime=entries[name]
+            h.update(f'{name}\0{int(isDir)}\0{size}\0{mtime}\0'.encode('utf-8','surrogateescape')) # noqa: E501 # pylint: disable=line-too-long
+            child=children.get(name)
+            if child is not None:
+                h.update(child.digest)
+        self.digest:bytes=h.digest()
+
+    def __eq__(self,other:object)->bool:
+        return isinstance(other,DirectorySnapshot) and self.digest==other.digest # noqa: E501 # pylint: disable=line-too-long
+
+    def __hash__(self)->int:
+        return hash(self.digest)
+
+    def __len__(self)->int:
+        """
+        number of items in the whole tree
+        """
+        return len(self.entries)+sum(len(c) for c in self.children.values())
+
+
+def takeSnapshot(directory:"ezFs.EzFsDirectory",
+    previous:typing.Optional[DirectorySnapshot]=None
+    )->DirectorySnapshot:
+    """
+    take a snapshot of a directory tree
+
+    :param previous: an earlier snapshot of the same tree.  Subtrees
+        whose backend digest has not changed since then are reused
+        without being listed.
+    """
+    treeDigest=directory._treeDigest() # pylint: disable=protected-access
+    if previous is not None and treeDigest is not None \
+        and treeDigest==previous.treeDigest:
+        return previous
+    url=ezFs.childUrl(str(directory.url),'')
+    entries:typing.Dict[str,Entry]={}
+    children:typing.Dict[str,DirectorySnapshot]={}
+    for item in directory.children:
+        name=item.name
+        if isinstance(item,ezFs.EzFsDirectory):
+            entries[name]=(True,None,item.mtime)
+            old=None if previous is None else previous.children.get(name)
+            children[name]=takeSnapshot(item,old)
+        else:
+            entries[name]=(False,item.size,item.mtime)
+    return DirectorySnapshot(url,entries,children,treeDigest)
+
+
+def compareSnapshots(old:DirectorySnapshot,
+    new:DirectorySnapshot
+    )->typing.List[ChangeEvent]:
+    """
+    get everything that changed between two snapshots
+
+    Only goes into subtrees whose digests differ.  When a directory
+    is created or deleted there is one event for the directory, not
+    one for everything in it.  An item that was deleted in one place
+    and created in another with the same type, size and mtime (and,
+    for directories, the same contents) is reported as moved.
+    """
+    events:typing.List[ChangeEvent]=[]
+    if old.digest!=new.digest:
+        _compare(old,new,events)
+    return _findMoves(events,old,new)
+
+
+def _compare(old:DirectorySnapshot,
+    new:DirectorySnapshot,
+    events:typing.List[ChangeEvent]
+    )->None:
+    """
+    compare two snapshots of the same directory
+    """
+    for name,entry in new.entries.items():
+        before=old.entries.get(name)
+        if before is None:
+            events.append(ChangeEvent('created',_url(new,name,entry[0]),entry[0])) # noqa: E501 # pylint: disable=line-too-long
+        elif before[0]!=entry[0]:
+            events.append(ChangeEvent('deleted',_url(old,name,before[0]),before[0])) # noqa: E501 # pylint: disable=line-too-long
+            events.append(ChangeEvent('created',_url(new,name,entry[0]),entry[0])) # noqa: E501 # pylint: disable=line-too-long
+        elif entry[0]:
+            oldChild=old.children.get(name)
+            newChild=new.children.get(name)
+            if oldChild is not None and newChild is not None \
+                and oldChild.digest!=newChild.digest:
+                _compare(oldChild,newChild,events)
+        elif before!=entry:
+            events.append(ChangeEvent('modified',_url(new,name,False),False))
+    for name,before in old.entries.items():
+        if name not in new.entries:
+            events.append(ChangeEvent('deleted',_url(old,name,before[0]),before[0])) # noqa: E501 # pylint: disable=line-too-long
+
+
+def _url(snapshot:DirectorySnapshot,name:str,isDir:bool)->str:
+    """
+    url of an item in a snapshot
+    """
+    return snapshot.url+name+('/' if isDir else '')
+
+
+def _findMoves(events:typing.List[ChangeEvent],
+    old:DirectorySnapshot,
+    new:DirectorySnapshot
+    )->typing.List[ChangeEvent]:
+    """
+    pair up deletes and creates of the same thing into moves
+    """
+    deleted=[e for e in events if e.kind=='deleted']
+    if not deleted or len(deleted)==len(events):
+        return events
+    gone:typing.Dict[typing.Any,typing.List[ChangeEvent]]={}
+    for event in deleted:
+        key=_identity(old,event.url)
+        if key is not None:
+            gone.setdefault(key,[]).append(event)
+    if not gone:
+        return events
+    moved:typing.Set[ChangeEvent]=set()
+    ret:typing.List[ChangeEvent]=[]
+    for event in events:
+        if event.kind=='created':
+            candidates=gone.get(_identity(new,event.url))
+            if candidates:
+                source=candidates.pop(0)
+                moved.add(source)
+                ret.append(ChangeEvent('moved',event.url,event.isDir,source.url)) # noqa: E501 # pylint: disable=line-too-long
+                continue
+        ret.append(event)
+    return [e for e in ret if e not in moved]
+
+
+def _identity(snapshot:DirectorySnapshot,url:str)->typing.Any:
+    """
+    what makes an item the same item after it has been moved
+
+    :return: a key, or None if there is not enough to go on
+    """
+    isDir=url.endswith('/')
+    path=url[len(snapshot.url):].rstrip('/').split('/')
+    directory:typing.Optional[DirectorySnapshot]=snapshot
+    for name in path[:-1]:
+        directory=directory.children.get(name) # type: ignore
+        if directory is None:
+            return None
+    entry=directory.entries.get(path[-1]) # type: ignore
+    if entry is None:
+        return None
+    if isDir:
+        child=directory.children.get(path[-1]) # type: ignore
+        if child is None or not child.entries:
+            return None # (all empty directories look the same)
+        return (True,child.digest)
+    if entry[1] is None or entry[2] is None:
+        return None
+    return entry
+
+
+class TreeWatcher:
+    """
+    Keeps the latest snapshot of a directory tree and reports what
+    changed each time it is polled
+    """
+
+    def __init__(self,directory:"ezFs.EzFsDirectory"):
+        """ """
+        self.directory=directory
+        self.snapshot:DirectorySnapshot=takeSnapshot(directory)
+
+    def poll(self)->typing.List[ChangeEvent]:
+        """
+        take a new snapshot and return what changed since the last one
+        """
+        snapshot=takeSnapshot(self.directory,self.snapshot)
+        if snapshot is self.snapshot:
+            return []
+        events=compareSnapshots(self.snapshot,snapshot)
+        self.snapshot=snapshot
+        return events
@@ -0,0 +1,452 @@
+#!/usr/bin/env
+# -*- coding: utf-8 -*-
+"""
+rsync-style mirroring of one directory tree onto another
+
+Trees are compared using the listings (size and mtime, and optionally
+content hashes), so unchanged files are never read.  Copies keep the
+modified time of the source (where the destination can set it, see
+EzFsItem.setMtime()), so that a file is only considered changed when
+the times differ.  New files are copied, and changed files are copied
+too, unless they are big and the destination supports ranged writes
+(see EzFsFile.writeRange()), in which case only the parts that
+changed are written.
+
+That is done like rsync --inplace:
+    1. the old file is cut into blocks, and each block gets a strong
+       checksum
+    2. the new file is cut into blocks the same way, and a block whose
+       checksum is the same as the old one at the same offset is kept
+    3. everything else is written
+
+Since the destination is overwritten as it goes, a block that has
+moved (eg after something was inserted) has to be written again
+anyway, so there is no point in looking for it elsewhere in the old
+file.  And once nothing has matched for MAX_SEARCH_BYTES, the rest of
+the file is simply copied.
+"""
+import typing
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor,Future
+import ezFs
+
+
+# files smaller than this are simply copied
+DELTA_MIN_SIZE=1<<20
+
+# limits on the block size used to compare files
+MIN_BLOCK_SIZE=2048
+MAX_BLOCK_SIZE=1<<17
+
+# how much of the source file to read at a time
+READ_SIZE=1<<20
+
+# give up looking for matching blocks after this many bytes without one
+# (the rest of the file is written as-is)
+MAX_SEARCH_BYTES=1<<20
+
+# modified times closer than this are the same (backends keep them to
+# different precisions)
+MTIME_WINDOW=0.001
+
+
+def blockSizeFor(size:int)->int:
+    """
+    pick a block size for a file (about the square root of its size,
+    as rsync does)
+    """
+    blockSize=MIN_BLOCK_SIZE
+    while blockSize*blockSize<size and blockSize<MAX_BLOCK_SIZE:
+        blockSize*=2
+    return blockSize
+
+
+def strongChecksum(block:bytes)->bytes:
+    """
+    the strong checksum of a block
+    """
+    return hashlib.blake2b(block,digest_size=16).digest()
+
+
+def blockSignatures(item:"ezFs.EzFsFile",
+    blockSize:int
+    )->typing.List[bytes]:
+    """
+    checksum every block of a file
+
+    :return: the checksum of each block, in order
+    """
+    signatures:typing.List[bytes]=[]
+    for chunk in _readChunks(item,READ_SIZE-READ_SIZE%blockSize):
+        with memoryview(chunk) as view:
+            for i in range(0,len(chunk),blockSize):
+                signatures.append(strongChecksum(view[i:i+blockSize])) # type: ignore # noqa: E501 # pylint: disable=line-too-long
+    return signatures
+
+
+def computeDelta(source:typing.Iterable[bytes],
+    signatures:typing.List[bytes],
+    blockSize:int
+    )->typing.Generator[typing.Tuple[int,typing.Union[int,bytes]],None,None]: # noqa: E501 # pylint: disable=line-too-long
+    """
+    work out how to turn the old file into the new one in place
+
+    :param source: the new file, in chunks
+    :param signatures: from blockSignatures() of the old file
+    :return: (offset,block number) where a block of the old file
+        is already right, or (offset,data) for new data, in order
+    """
+    buf=bytearray()
+    chunks=iter(source)
+    eof=False
+    base=0 # offset in the new file of buf[0] (always a block boundary)
+    start=0 # start of the next block to compare, in buf
+    literal=0 # start of the data not sent yet, in buf
+    sinceMatch=0
+    while not eof and sinceMatch<=MAX_SEARCH_BYTES:
+        chunk=next(chunks,None)
+        if chunk is None:
+            eof=True
+        else:
+            buf+=chunk
+        while len(buf)-start>=blockSize or (eof and start<len(buf)):
+            end=min(start+blockSize,len(buf))
+            number=(base+start)//blockSize
+            if number<len(signatures) \
+                and signatures[number]==strongChecksum(bytes(buf[start:end])): # noqa: E501 # pylint: disable=line-too-long
+                if literal<start:
+                    yield base+literal,bytes(buf[literal:start])
+                yield base+start,number
+                literal=end
+                sinceMatch=0
+            else:
+                sinceMatch+=end-start
+            start=end
+            if sinceMatch>MAX_SEARCH_BYTES:
+                break # not worth looking any more
+            if start-literal>=READ_SIZE:
+                # don't keep too much unsent data around
+                yield base+literal,bytes(buf[literal:start])
+                literal=start
+        if literal>0:
+            del buf[:literal]
+            base+=literal
+            start-=literal
+            literal=0
+    # whatever is left is new data
+    if buf:
+        yield base,bytes(buf)
+    base+=len(buf)
+    for chunk in chunks:
+        if chunk:
+            yield base,chunk
+            base+=len(chunk)
+
+
+def _readChunks(item:"ezFs.EzFsFile",
+    chunkSize:int=READ_SIZE
+    )->typing.Generator[bytes,None,None]:
+    """
+    read a whole file, a chunk at a time
+
+    (every chunk but the last is exactly chunkSize, if the backend
+    reads as much as it is asked for)
+    """
+    mode=item.fileAccessMode
+    item.open('rb')
+    try:
+        while True:
+            chunk=item.read(chunkSize)
+            if not chunk:
+                break
+            if isinstance(chunk,str):
+                chunk=chunk.encode('utf-8')
+            yield chunk
+    finally:
+        item.close()
+        item.fileAccessMode=mode
+
+
+def deltaUpdate(source:"ezFs.EzFsFile",
+    destination:"ezFs.EzFsFile"
+    )->int:
+    """
+    update the destination file in place, so that it is the same as
+    the source, writing as little as possible
+
+    :return: number of bytes written
+    """
+    oldSize=destination.size or 0
+    blockSize=blockSizeFor(oldSize)
+    signatures=blockSignatures(destination,blockSize)
+    written=0
+    newSize=0
+    for offset,what in computeDelta(_readChunks(source),signatures,blockSize): # noqa: E501 # pylint: disable=line-too-long
+        if isinstance(what,int):
+            # already there
+            newSize=offset+min(blockSize,oldSize-offset)
+        else:
+            written+=destination.writeRange(offset,what)
+            newSize=offset+len(what)
+    if newSize<oldSize:
+        destination.truncate(newSize)
+    return written
+
+
+class SyncResult:
+    """
+    What a sync did (safe to update from multiple threads)
+    """
+
+    def __init__(self)->None:
+        """ """
+        self.created:int=0
+        self.updated:int=0
+        self.deltaUpdated:int=0
+        self.unchanged:int=0
+        self.deleted:int=0
+        self.directories:int=0
+        self.bytesWritten:int=0
+        self.errors:typing.List[typing.Tuple[str,BaseException]]=[]
+        self._lock=threading.Lock()
+
+    def add(self,what:str,count:int=1,numBytes:int=0)->None:
+        """
+        count something being done
+        """
+        with self._lock:
+            setattr(self,what,getattr(self,what)+count)
+            self.bytesWritten+=numBytes
+
+    def __str__(self)->str:
+        return ('%d created, %d updated (%d by delta), %d unchanged, '
+            '%d deleted, %d directories, %.1f MB written%s')%(
+            self.created,self.updated,self.deltaUpdated,self.unchanged,
+            self.deleted,self.directories,self.bytesWritten/1e6,
+            '' if not self.errors else ', %d error(s)'%len(self.errors))
+
+
+def syncTrees(source:"ezFs.EzFsItem",
+    destination:"ezFs.EzFsDirectory",
+    checksum:bool=False,
+    delete:bool=False,
+    jobs:int=1,
+    progress:typing.Optional["ezFs.Progress"]=None,
+    dryRun:bool=False
+    )->SyncResult:
+    """
+    make the destination directory the same as the source
+
+    A file is considered changed if its size or its modified time is
+    different.
+
+    :param source: a directory (whose contents are synced) or a file
+    :param checksum: also compare the contents of files that look the
+        same (they both have to be read)
+    :param delete: delete anything in the destination that is not in
+        the source
+    :param jobs: how many files to transfer at the same time
+    :param progress: keeps track of what has been transferred
+    :param dryRun: work out what would be done, but don't do it
+    :return: what was done (or, for a dry run, what would have been)
+    """
+    syncer=_Syncer(checksum,delete,progress,dryRun)
+    pool:typing.Optional[ThreadPoolExecutor]=None
+    if jobs>1:
+        pool=ThreadPoolExecutor(jobs,thread_name_prefix='ezFs sync')
+    try:
+        syncer.pool=pool
+        if isinstance(source,ezFs.EzFsDirectory):
+            syncer.syncDirectory(source,destination)
+        else:
+            existing={item.name:item for item in destination.children}
+            syncer.syncFile(source,destination,existing.get(source.name))
+        for future in syncer.pending:
+            future.result()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return syncer.result
+
+
+class _Syncer:
+    """
+    the state of a sync that is in progress
+    """
+
+    def __init__(self,
+        checksum:bool,
+        delete:bool,
+        progress:typing.Optional["ezFs.Progress"],
+        dryRun:bool):
+        """ """
+        self.checksum=checksum
+        self.delete=delete
+        self.progress=progress
+        self.dryRun=dryRun
+        self.result=SyncResult()
+        self.pool:typing.Optional[ThreadPoolExecutor]=None
+        self.pending:typing.List[Future]=[]
+
+    def syncDirectory(self,
+        source:"ezFs.EzFsDirectory",
+        destination:"ezFs.EzFsDirectory"
+        )->None:
+        """
+        sync the contents of a directory
+        """
+        existing={item.name:item for item in destination.children}
+        for item in source.children:
+            other=existing.pop(item.name,None)
+            if isinstance(item,ezFs.EzFsDirectory):
+                if other is not None and not isinstance(other,ezFs.EzFsDirectory): # noqa: E501 # pylint: disable=line-too-long
+                    self.remove(other)
+                    other=None
+                if other is None:
+                    self.result.add('directories')
+                    if self.dryRun:
+                        self.countNew(item)
+                        continue
+                    destination.mkdir(item.name,errorIfExists=False)
+                    other=destination.get(item.name)
+                if isinstance(other,ezFs.EzFsMountPoint):
+                    other=other.target
+                self.syncDirectory(item,typing.cast(ezFs.EzFsDirectory,other)) # noqa: E501 # pylint: disable=line-too-long
+            else:
+                if isinstance(other,ezFs.EzFsDirectory):
+                    self.remove(other)
+                    other=None
+                if self.pool is not None:
+                    self.pending.append(self.pool.submit(
+                        self.syncFile,item,destination,other))
+                else:
+                    self.syncFile(item,destination,other)
+        if self.delete:
+            for other in existing.values():
+                self.remove(other)
+
+    def countNew(self,source:"ezFs.EzFsDirectory")->None:
+        """
+        count what a dry run would create under a new directory
+        """
+        for item in source.getAll():
+            if isinstance(item,ezFs.EzFsDirectory):
+                self.result.add('directories')
+            else:
+                self.result.add('created',1,item.size or 0)
+                if self.progress is not None:
+                    self.progress.add(1,item.size or 0)
+
+    def remove(self,item:"ezFs.EzFsItem")->None:
+        """
+        delete something from the destination
+        """
+        self.result.add('deleted')
+        if not self.dryRun:
+            item.delete()
+
+    def changed(self,
+        source:"ezFs.EzFsItem",
+        destination:"ezFs.EzFsItem"
+        )->bool:
+        """
+        is the destination file out of date?
+        """
+        if source.size!=destination.size:
+            return True
+        if self.checksum:
+            return ezFs.hashItem(source)!=ezFs.hashItem(destination)
+        sourceTime,destinationTime=source.mtime,destination.mtime
+        if sourceTime is None or destinationTime is None:
+            return False
+        return abs(sourceTime-destinationTime)>MTIME_WINDOW
+
+    def syncFile(self,
+        source:"ezFs.EzFsItem",
+        directory:"ezFs.EzFsDirectory",
+        existing:typing.Optional["ezFs.EzFsItem"]
+        )->None:
+        """
+        sync a single file
+        """
+        try:
+            if existing is None:
+                numBytes=source.size or 0
+                if not self.dryRun:
+                    numBytes=_copyFile(source,directory)
+                self.result.add('created',1,numBytes)
+            elif not self.changed(source,existing):
+                self.result.add('unchanged')
+                return
+            elif self.dryRun:
+                self.result.add('updated',1,source.size or 0)
+            elif isinstance(existing,ezFs.EzFsFile) \
+                and existing.supportsRangedWrite \
+                and (existing.size or 0)>=DELTA_MIN_SIZE:
+                numBytes=deltaUpdate(typing.cast(ezFs.EzFsFile,source),existing) # noqa: E501 # pylint: disable=line-too-long
+                mtime=source.mtime
+                if mtime is not None:
+                    existing.setMtime(mtime)
+                self.result.add('updated',1,numBytes)
+                self.result.add('deltaUpdated')
+            else:
+                numBytes=_copyFile(source,directory)
+                self.result.add('updated',1,numBytes)
+            if self.progress is not None:
+                self.progress.add(1,source.size or 0)
+        except OSError as e:
+            with self.result._lock: # pylint: disable=protected-access
+                self.result.errors.append((str(source.url),e))
+            if self.progress is not None:
+                self.progress.add(1,0,1)
+
+
+def _copyFile(source:"ezFs.EzFsItem",
+    directory:"ezFs.EzFsDirectory",
+    name:typing.Optional[str]=None,
+    progress:typing.Optional["ezFs.Progress"]=None
+    )->int:
+    """
+    copy a file into a directory, replacing what is there, and keeping
+    its modified time
+
+    (also used by EzFs.copy())
+
+    :param name: what to call the copy (default=the same name)
+    :param progress: has each chunk's bytes added as it is copied
+        (but not the item itself)
+    :return: number of bytes written
+    """
+    if name is None:
+        name=source.name
+    fs=source.filesystem
+    target=directory.get(name)
+    if directory.filesystem is fs:
+        if target.exists:
+            target.delete()
+        fs._copy(source,ezFs.childUrl(directory.url,name)) # pylint: disable=protected-access
+        numBytes=source.size or 0
+        target=directory.get(name)
+        if progress is not None:
+            progress.add(0,numBytes)
+    else:
+        if isinstance(target,ezFs.EzFsDirectory):
+            raise FileExistsError(str(target.url))
+        target=typing.cast(ezFs.EzFsFile,target)
+        numBytes=0
+        mode=target.fileAccessMode
+        target.open('wb')
+        try:
+            for chunk in _readChunks(typing.cast(ezFs.EzFsFile,source)):
+                target.write(chunk)
+                numBytes+=len(chunk)
+                if progress is not None:
+                    progress.add(0,len(chunk))
+        finally:
+            target.close()
+            target.fileAccessMode=mode
+    mtime=source.mtime
+    if mtime is not None:
+        target.setMtime(mtime)
+    return numBytes
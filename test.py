@@ -9,6 +9,10 @@ See:
 import typing
 import unittest
 import os
+import io
+import zlib
+import hashlib
+import ezFs
 
 
 __HERE__=os.path.abspath(__file__).rsplit(os.sep,1)[0]+os.sep
@@ -36,12 +40,1252 @@ class Test(unittest.TestCase):
         assert not True
 
 
+class MemoryFsTest(unittest.TestCase):
+    """
+    Test the in-memory filesystem
+    """
+
+    def setUp(self):
+        """
+        Set up the test
+        """
+        self.fs=ezFs.EzFsMemoryFilesystem(volume=None)
+        self.fs.mkdir('dir')
+        self.fs.get('dir/file.txt').write('hello')
+
+    def testReadWrite(self):
+        """
+        Write a file and read it back
+        """
+        f=self.fs.get('dir/file.txt')
+        assert f.exists
+        assert f.read()==b'hello'
+        assert f.read(encoding='utf-8')=='hello'
+        with self.fs.open('dir/file.txt','r') as f:
+            assert f.read(2)==b'he'
+            assert f.tell()==2
+
+    def testMove(self):
+        """
+        Moving relinks the node rather than copying it
+        """
+        self.fs._move(self.fs.get('dir/file.txt'),'/moved.txt') # pylint: disable=protected-access
+        assert not self.fs.get('dir/file.txt').exists
+        assert self.fs.get('moved.txt').read()==b'hello'
+
+    def testGetAll(self):
+        """
+        getAll reaches every level, and the items are compact
+        """
+        self.fs.get('dir').mkdir('sub')
+        self.fs.get('dir/sub/deep.txt').write('deep')
+        items=list(self.fs.getAll())
+        assert sorted(item.name for item in items)==[
+            'deep.txt','dir','file.txt','sub']
+        deep=[item for item in items if item.name=='deep.txt'][0]
+        assert deep._parent is not None # pylint: disable=protected-access
+        assert deep._parent.name=='sub' # pylint: disable=protected-access
+        assert not hasattr(deep,'__dict__')
+        assert deep==self.fs.get('dir/sub/deep.txt')
+
+    def testPaging(self):
+        """
+        Listings come a page at a time and counting does not list
+        """
+        directory=self.fs.get('dir')
+        for i in range(5):
+            self.fs.get(f'dir/page{i}.txt').write('x')
+        page,cursor=directory.listPage(None,4)
+        assert len(page)==4 and cursor is not None
+        rest,cursor=directory.listPage(cursor,4)
+        assert len(rest)==2 and cursor is None
+        assert [item.name for item in page+rest]==[
+            item.name for item in directory.children]
+        assert len(directory)==6
+        assert directory[-1].name=='page4.txt'
+
+    def testPrefix(self):
+        """
+        Prefix/range listings and globs only see what they ask for
+        """
+        directory=self.fs.get('dir')
+        for name in ('a1.txt','a2.txt','b1.txt','b2.log'):
+            self.fs.get('dir/'+name).write('x')
+        assert [item.name for item in directory.listPrefix('a')]==[
+            'a1.txt','a2.txt']
+        assert [item.name for item in directory.listRange('a2','b2')]==[
+            'a2.txt','b1.txt']
+        assert sorted(item.name for item in self.fs.glob('dir/b*.txt'))==[
+            'b1.txt']
+        assert [item.name for item in self.fs.glob('dir/file.txt')]==[
+            'file.txt']
+        # a precompiled pattern that ignores case does not narrow by case
+        import re
+        self.fs.get('dir/ABC.txt').write('x')
+        self.fs.get('dir/abd.txt').write('x')
+        found=self.fs.get('dir').regexFind(re.compile(r'ab.\.txt',re.I))
+        assert sorted(item.name for item in found)==['ABC.txt','abd.txt']
+
+    def testSlots(self):
+        """
+        Items that mix in PollingItem do not need to declare its slots
+        """
+        class File(ezFs.EzFsFile,ezFs.PollingItem):
+            """ a watchable file on some other backend """
+            __slots__=()
+            def __init__(self,url,filesystem):
+                ezFs.EzFsFile.__init__(self,url,filesystem)
+                ezFs.PollingItem.__init__(self)
+            def poll(self):
+                return False
+        item=File('mem:///watched.txt',self.fs)
+        assert not hasattr(item,'__dict__')
+        def watchFn(_):
+            pass
+        ezFs.PollingItem.addWatch(item,watchFn,60)
+        assert len(item._watches)==1 # pylint: disable=protected-access
+        ezFs.PollingItem.removeWatch(item,watchFn)
+        assert not item._watches # pylint: disable=protected-access
+
+    def testReadBack(self):
+        """
+        A file can be found right after it is written, even when the
+        backend cannot list by prefix
+        """
+        class Directory(ezFs.EzFsMemoryDirectory):
+            """ no pushdown, and the generic get() """
+            __slots__=()
+            get=ezFs.EzFsDirectory.get
+            def _listPrefix(self,prefix):
+                return None
+            def _listRange(self,start,stop):
+                return None
+        class Filesystem(ezFs.EzFsMemoryFilesystem):
+            """ uses the directories above """
+            DIRECTORY_CLASS=Directory
+        other=ezFs.EzFsMemoryFilesystem(volume='readBack')
+        other.mkdir('dir')
+        fs=Filesystem(volume='readBack')
+        directory=fs.get('/dir')
+        assert not list(directory.listPrefix('new'))
+        other.get('/dir/new.txt').write(b'new')
+        assert fs.get('/dir/new.txt').read()==b'new'
+        assert [item.name for item in directory.listPrefix('new')]==['new.txt']
+        assert [item.name for item in fs.glob('dir/new*')]==['new.txt']
+
+    def testFind(self):
+        """
+        find() by predicate, both natively and by walking the tree
+        """
+        self.fs.get('dir').mkdir('sub')
+        self.fs.get('dir/sub/big.txt').write('x'*100)
+        self.fs.get('dir/sub/small.log').write('x')
+        where=ezFs.NameMatches('*.txt')&ezFs.SizeBetween(10)
+        assert [item.name for item in self.fs.find(where=where)]==['big.txt']
+        directory=self.fs.get('dir')
+        walked=ezFs.EzFsDirectory.find(directory,where=where) # no pushdown
+        assert [item.name for item in walked]==['big.txt']
+        shallow=self.fs.find(where=ezFs.DepthBetween(maxDepth=2)&~ezFs.TypeIs('dir')) # noqa: E501 # pylint: disable=line-too-long
+        assert sorted(item.name for item in shallow)==['file.txt']
+        pruned=self.fs.find(where=ezFs.TypeIs('file'),
+            prune=ezFs.NameMatches('sub'))
+        assert [item.name for item in pruned]==['file.txt']
+        # plain functions get real items, and glob matches their depth
+        big=self.fs.find(where=lambda item:not item.isDir and item.read()==b'x'*100) # noqa: E501 # pylint: disable=line-too-long
+        assert [str(item.url) for item in big]==['mem:///dir/sub/big.txt']
+        globbed=self.fs.find('dir/sub/*',where=ezFs.DepthBetween(3,3))
+        assert sorted(item.name for item in globbed)==['big.txt','small.log']
+
+    def testWatchEvents(self):
+        """
+        Directory watchers can get exactly what changed
+        """
+        self.fs.mkdir('other')
+        root=self.fs.get('/')
+        events=[]
+        root.addWatch(lambda item,changes:events.extend(changes),0,True)
+        self.fs.get('dir/new.txt').write('new')
+        self.fs._move(self.fs.get('dir/file.txt'),'/other/file.txt') # pylint: disable=protected-access
+        root._test_poll() # pylint: disable=protected-access
+        assert sorted((e.kind,e.url,e.oldUrl) for e in events)==[
+            ('created','mem:///dir/new.txt',None),
+            ('moved','mem:///other/file.txt','mem:///dir/file.txt')]
+
+    def testEviction(self):
+        """
+        Clean files are evicted to make room, dirty ones are not
+        """
+        fs=ezFs.EzFsMemoryFilesystem(maxBytes=10,volume=None)
+        clean=fs.get('clean.txt')
+        clean.write(b'12345')
+        clean.markClean()
+        fs.get('new.txt').write(b'1234567')
+        assert not fs.get('clean.txt').exists
+        self.assertRaises(ezFs.NoSpaceException,
+            fs.get('big.txt').write,b'x'*20)
+        # copying does not evict what is being copied
+        fs.get('new.txt').markClean()
+        self.assertRaises(ezFs.NoSpaceException,
+            fs._copy,fs.get('new.txt'),'/copy.txt') # pylint: disable=protected-access
+        assert fs.get('new.txt').read()==b'1234567'
+        # truncating counts as a change, just like writing
+        fs.get('new.txt').truncate(2)
+        assert fs.store.usedBytes==2
+        self.assertRaises(ezFs.NoSpaceException,
+            fs.get('big.txt').write,b'x'*9)
+        assert fs.get('new.txt').read()==b'12'
+
+
+class MountTest(unittest.TestCase):
+    """
+    Test mounting one filesystem inside of another
+    """
+
+    def setUp(self):
+        """
+        Set up the test
+        """
+        self.host=ezFs.EzFsMemoryFilesystem(volume=None)
+        self.host.mkdir('mnt')
+        self.other=ezFs.EzFsMemoryFilesystem(volume=None)
+        self.other.mkdir('sub')
+        self.other.get('sub/file.txt').write('mounted')
+        self.other.mount('/mnt/other',self.host)
+
+    def testGet(self):
+        """
+        Items beneath a mount point come from the mounted filesystem
+        """
+        assert self.host.get('/mnt/other/sub/file.txt').read()==b'mounted'
+        # a case-insensitive host still passes on the names as given
+        host=ezFs.EzFsMemoryFilesystem(volume=None)
+        host.caseSensitive=False
+        host.mkdir('mnt')
+        self.other.get('sub/Mixed.txt').write('mixed')
+        self.other.mount('/mnt/other',host)
+        assert host.get('/MNT/Other/sub/Mixed.txt').read()==b'mixed'
+
+    def testListing(self):
+        """
+        Mount points show up in directory listings
+        """
+        names=[item.name for item in self.host.get('mnt').children]
+        assert names==['other']
+
+    def testUnmount(self):
+        """
+        Unmounting makes it go away again
+        """
+        self.host.unmount('/mnt/other')
+        assert not list(self.host.get('mnt').children)
+
+
+class MetricsTest(unittest.TestCase):
+    """
+    Test per-operation metrics
+    """
+
+    def testSnapshot(self):
+        """
+        Reads are counted along with their bytes
+        """
+        fs=ezFs.EzFsMemoryFilesystem(volume=None)
+        fs.get('file.txt').write(b'12345')
+        sink=ezFs.addMetricsSink(ezFs.SnapshotMetricsSink())
+        try:
+            fs.get('file.txt').read()
+        finally:
+            ezFs.removeMetricsSink(sink)
+        fs.get('file.txt').read() # no longer counted
+        stats=sink.snapshot()['EzFsMemoryFilesystem mem:// read']
+        assert stats['count']==1
+        assert stats['bytes']==5
+
+    def testMeasuring(self):
+        """
+        Measured listings keep their type, and a broken sink does not
+        stop anything else from being measured
+        """
+        class Directory(ezFs.EzFsMemoryDirectory):
+            """
+            lists its children as a dict
+            """
+            __slots__=()
+            @property
+            def children(self):
+                return {item.name:item for item in ezFs.EzFsMemoryDirectory.children.fget(self)} # type: ignore # noqa: E501 # pylint: disable=line-too-long
+        class BrokenSink(ezFs.MetricsSink):
+            """
+            fails to begin
+            """
+            def begin(self,operation,fsClass,protocol):
+                raise RuntimeError('broken')
+            def end(self,context,event):
+                pass
+        fs=ezFs.EzFsMemoryFilesystem(volume=None)
+        fs.get('file.txt').write(b'12345')
+        broken=ezFs.addMetricsSink(BrokenSink())
+        sink=ezFs.addMetricsSink(ezFs.SnapshotMetricsSink())
+        try:
+            directory=Directory('mem:///',fs)
+            assert [item.name for item in directory.children.values()]==['file.txt'] # noqa: E501 # pylint: disable=line-too-long
+            fs.get('file.txt').read()
+            fs.get('file.txt').read()
+        finally:
+            ezFs.removeMetricsSink(broken)
+            ezFs.removeMetricsSink(sink)
+        snapshot=sink.snapshot()
+        assert snapshot['EzFsMemoryFilesystem mem:// children']['items']==1
+        assert snapshot['EzFsMemoryFilesystem mem:// read']['count']==2
+
+
+class CatalogTest(unittest.TestCase):
+    """
+    Test the sqlite catalog
+    """
+
+    def setUp(self):
+        """
+        Set up the test
+        """
+        self.fs=ezFs.EzFsMemoryFilesystem(volume=None)
+        for name in ('a','b'):
+            self.fs.mkdir(name)
+            self.fs.get(f'{name}/small.txt').write('x')
+            self.fs.get(f'{name}/big.txt').write('x'*100)
+        self.catalog=ezFs.Catalog(self.fs.get('/'))
+        self.catalog.scan()
+
+    def tearDown(self):
+        """
+        Clean up after the test
+        """
+        self.catalog.close()
+
+    def testQueries(self):
+        """
+        Queries are answered from the catalog
+        """
+        assert len(self.catalog)==6
+        assert [e.path for e in self.catalog.glob('*/b*.txt')]==[
+            'a/big.txt','b/big.txt']
+        assert [e.path for e in self.catalog.regexFind(r'sm.*')]==[
+            'a/small.txt','b/small.txt']
+        where=ezFs.SizeBetween(10)&~ezFs.NameMatches('a*')
+        assert [e.path for e in self.catalog.find(where=where)]==[
+            'a/big.txt','b/big.txt']
+        pruned=self.catalog.find(where=ezFs.TypeIs('file'),
+            prune=ezFs.NameMatches('a'))
+        assert [e.path for e in pruned]==['b/big.txt','b/small.txt']
+
+    def testPruneSiblings(self):
+        """
+        Pruning works when one directory name is the start of another
+        """
+        self.fs.mkdir('a-b')
+        self.fs.get('a-b/other.txt').write('x')
+        self.catalog.refresh()
+        pruned=self.catalog.find(where=ezFs.TypeIs('file'),
+            prune=ezFs.NameMatches('a*'))
+        assert [e.path for e in pruned]==['b/big.txt','b/small.txt']
+
+    def testRefresh(self):
+        """
+        Refreshing picks up new and removed items
+        """
+        self.fs.get('a/new.txt').write('new')
+        self.fs._delete(self.fs.get('b/small.txt')) # pylint: disable=protected-access
+        self.catalog.refresh()
+        assert [e.path for e in self.catalog.glob('*/*.txt')]==[
+            'a/big.txt','a/new.txt','a/small.txt','b/big.txt']
+
+
+class HashTest(unittest.TestCase):
+    """
+    Test content hashing
+    """
+
+    def testHashMany(self):
+        """
+        Hashes are right, cached, and redone when a file changes
+        """
+        fs=ezFs.EzFsMemoryFilesystem(volume=None)
+        for i in range(5):
+            fs.get(f'f{i}.txt').write(str(i)*1000)
+        with ezFs.HashCache() as cache:
+            digests={str(item.url):digest
+                for item,digest in fs.hashMany(cache=cache)}
+            assert digests['mem:///f3.txt']==hashlib.sha256(b'3'*1000).hexdigest() # noqa: E501 # pylint: disable=line-too-long
+            assert len(cache)==5
+            fs.get('f3.txt').write('changed')
+            assert fs.get('f3.txt').hash(cache=cache)==hashlib.sha256(b'changed').hexdigest() # noqa: E501 # pylint: disable=line-too-long
+            assert fs.get('f2.txt').hash(cache=cache)==digests['mem:///f2.txt'] # noqa: E501 # pylint: disable=line-too-long
+            assert cache.hits==1
+        assert fs.get('f1.txt').hash('crc32')=='%08x'%zlib.crc32(b'1'*1000)
+
+    def testHashOpenFile(self):
+        """
+        Hashing a file that is open leaves it open where it was
+        """
+        fs=ezFs.EzFsMemoryFilesystem(volume=None)
+        fs.get('data.txt').write(b'0123456789')
+        f=fs.get('data.txt')
+        f.open('rb')
+        try:
+            assert f.read(3)==b'012'
+            assert f.hash('md5')==hashlib.md5(b'0123456789').hexdigest()
+            assert f.isOpen
+            assert f.read(3)==b'345'
+        finally:
+            f.close()
+
+
+class DuplicatesTest(unittest.TestCase):
+    """
+    Test the duplicate finder
+    """
+
+    def testFindDuplicates(self):
+        """
+        Only files with the same contents are grouped, even when they
+        are the same size and start and end the same
+        """
+        fs=ezFs.EzFsMemoryFilesystem(volume=None)
+        other=ezFs.EzFsMemoryFilesystem(volume=None)
+        big=b'x'*100000
+        fs.get('a.bin').write(big)
+        fs.get('b.bin').write(big[:50000]+b'y'+big[50001:])
+        other.get('c.bin').write(big)
+        fs.get('small1.txt').write('same')
+        fs.get('small2.txt').write('same')
+        fs.get('unique.txt').write('diff')
+        fs.get('empty1.txt').write('')
+        fs.get('empty2.txt').write('')
+        groups=list(ezFs.findDuplicates([fs.get('/'),other.get('/')]))
+        assert sorted([str(i.url) for i in group] for group in groups)==[
+            ['mem:///a.bin','mem:///c.bin'],
+            ['mem:///small1.txt','mem:///small2.txt']]
+        # a candidate that is open stays open where it was
+        f=fs.get('a.bin')
+        f.open('rb')
+        try:
+            assert f.read(3)==b'xxx'
+            assert ezFs.partialHash(f,1000)==ezFs.partialHash(other.get('c.bin'),1000) # noqa: E501 # pylint: disable=line-too-long
+            assert f.isOpen and f.tell()==3
+        finally:
+            f.close()
+
+
+class SyncTest(unittest.TestCase):
+    """
+    Test mirroring one tree onto another
+    """
+
+    def testSync(self):
+        """
+        Only changes are transferred, and big files only in part
+        """
+        import random
+        import time
+        source=ezFs.EzFsMemoryFilesystem(volume=None)
+        destination=ezFs.EzFsMemoryFilesystem(volume=None)
+        source.mkdir('dir')
+        big=random.Random(1).randbytes(2<<20)
+        source.get('dir/big.bin').write(big)
+        source.get('small.txt').write('small')
+        destination.get('extra.txt').write('extra')
+        result=ezFs.syncTrees(source.get('/'),destination.get('/'),delete=True)
+        assert (result.created,result.deleted,result.directories)==(2,1,1)
+        result=ezFs.syncTrees(source.get('/'),destination.get('/'))
+        assert result.unchanged==2 and result.bytesWritten==0
+        time.sleep(0.01)
+        changed=big[:100000]+b'changed'+big[100007:]+b'appended'
+        source.get('dir/big.bin').write(changed)
+        result=ezFs.syncTrees(source.get('/'),destination.get('/'))
+        assert result.deltaUpdated==1
+        assert result.bytesWritten<20000
+        assert destination.get('dir/big.bin').read()==changed
+        result=ezFs.syncTrees(source.get('/'),destination.get('/'))
+        assert result.unchanged==2 and result.updated==0
+        inserted=changed[:1000]+b'inserted'+changed[1000:]
+        source.get('dir/big.bin').write(inserted)
+        result=ezFs.syncTrees(source.get('/'),destination.get('/'))
+        assert destination.get('dir/big.bin').read()==inserted
+
+    def testChanges(self):
+        """
+        Dry runs count whole new trees, and copies keep their mtime
+        """
+        import time
+        source=ezFs.EzFsMemoryFilesystem(volume=None)
+        destination=ezFs.EzFsMemoryFilesystem(volume=None)
+        source.mkdir('dir')
+        source.get('dir').mkdir('sub')
+        source.get('dir/sub/a.txt').write('a')
+        source.get('dir/b.txt').write('b')
+        result=ezFs.syncTrees(source.get('/'),destination.get('/'),dryRun=True) # noqa: E501 # pylint: disable=line-too-long
+        assert (result.created,result.directories)==(2,2)
+        ezFs.syncTrees(source.get('/'),destination.get('/'))
+        assert destination.get('dir/b.txt').mtime==source.get('dir/b.txt').mtime # noqa: E501 # pylint: disable=line-too-long
+        time.sleep(0.01)
+        destination.get('dir/b.txt').write('x') # newer, but still wrong
+        result=ezFs.syncTrees(source.get('/'),destination.get('/'))
+        assert (result.updated,result.unchanged)==(1,1)
+        assert destination.get('dir/b.txt').read()==b'b'
+
+
+class CmdlineTest(unittest.TestCase):
+    """
+    Test the command line and what it reports
+    """
+
+    def setUp(self):
+        """
+        Set up the test
+        """
+        self.fs=ezFs.EzFsMemoryFilesystem() # (what mem:/// urls get)
+        self.fs.mkdir('cmdline')
+        self.fs.get('cmdline').mkdir('src')
+        self.fs.get('cmdline/src').mkdir('sub')
+        self.fs.get('cmdline/src/a.txt').write('hello')
+        self.fs.get('cmdline/src/sub/b.txt').write('xy')
+
+    def tearDown(self):
+        """
+        Clean up after the test
+        """
+        self.fs.get('cmdline').delete()
+
+    def runCmdline(self,*args:str)->str:
+        """
+        run the command line and return what it printed
+        """
+        import contextlib
+        out=io.StringIO()
+        with contextlib.redirect_stdout(out),contextlib.redirect_stderr(out):
+            try:
+                assert ezFs._ezFs.cmdline(args)==0 # pylint: disable=protected-access
+            finally:
+                self.output=out.getvalue() # pylint: disable=attribute-defined-outside-init
+        return self.output
+
+    def testProgress(self):
+        """
+        Progress lines go to the given stream, the last one on its own line
+        """
+        stream=io.StringIO()
+        progress=ezFs.Progress('copied',0,stream)
+        progress.add(2,3000000)
+        progress.add(0,errors=1)
+        assert stream.getvalue()=='' # (interval=0 never prints by itself)
+        progress.report(True)
+        line=stream.getvalue()
+        assert line.startswith('\rcopied 2 item(s) 3.0 MB in ') and line.endswith(' 1 error(s)\n') # noqa: E501 # pylint: disable=line-too-long
+
+    def testDiskUsage(self):
+        """
+        Listing in parallel adds up to the same as listing one at a time
+        """
+        fs=ezFs.EzFs('mem:///cmdline/')
+        assert fs.diskUsage('src')==(3,7)
+        progress=ezFs.Progress(interval=0)
+        assert fs.diskUsage('src',jobs=4,progress=progress)==(3,7)
+        assert (progress.items,progress.numBytes)==(3,7)
+
+    def testCopy(self):
+        """
+        Copying in parallel copies everything and counts the files
+        """
+        fs=ezFs.EzFs('mem:///cmdline/')
+        progress=ezFs.Progress(interval=0)
+        fs.copy('src','copy',jobs=4,progress=progress)
+        assert self.fs.get('cmdline/copy/sub/b.txt').read()==b'xy'
+        assert (progress.items,progress.numBytes)==(2,7)
+        # and onto another filesystem, keeping the modified times
+        other=ezFs.EzFsMemoryFilesystem(volume=None)
+        other.mount('/cmdline/other',fs)
+        progress=ezFs.Progress(interval=0)
+        fs.copy('src','other/copy',jobs=4,progress=progress)
+        copied=other.get('copy/sub/b.txt')
+        assert copied.read()==b'xy'
+        assert copied.mtime==self.fs.get('cmdline/src/sub/b.txt').mtime
+        assert (progress.items,progress.numBytes)==(2,7)
+
+    def testCmdline(self):
+        """
+        Commands print their results, and --stats the operations
+        """
+        output=self.runCmdline('--stats','--jobs=2',
+            '--du=mem:///cmdline/src',
+            '--copy=mem:///cmdline/src,mem:///cmdline/copy')
+        assert '\n$ du mem:///cmdline/src\n' in output
+        assert '\rcounted 3 item(s) 0.0 MB in ' in output
+        assert '\rcopied 2 item(s) 0.0 MB in ' in output
+        assert '\nStatistics:\noperation ' in output
+        assert self.fs.get('cmdline/copy/a.txt').read()==b'hello'
+        assert not ezFs.metricsEnabled()
+
+    def testCmdlineFails(self):
+        """
+        The stats are still printed (and the sink removed) when a
+        command fails
+        """
+        with self.assertRaises(FileNotFoundError):
+            self.runCmdline('--stats',
+                '--copy=mem:///cmdline/src,mem:///cmdline/nowhere/copy')
+        assert '\nStatistics:\n' in self.output
+        assert not ezFs.metricsEnabled()
+
+
+class LatencyFsTest(unittest.TestCase):
+    """
+    Test the fake "remote" filesystem
+    """
+
+    def testDelay(self):
+        """
+        Backend calls are counted and take as long as they should
+        """
+        import time
+        from ezFs.latencyFs import EzFsLatencyFilesystem
+        fs=EzFsLatencyFilesystem(bandwidth=1e6)
+        fs.get('/data.bin').write(b'x'*10000)
+        assert fs.calls['write']==1 and fs.bytesTransferred==10000
+        fs.resetCounters()
+        fs.latency=0.01
+        start=time.perf_counter()
+        assert fs.get('/data.bin').read()==b'x'*10000
+        elapsed=time.perf_counter()-start
+        assert fs.calls.get('read')==1
+        assert fs.bytesTransferred==10000
+        assert elapsed>=0.02 # (latency plus 10000 bytes at 1MB/s)
+        # and it comes back on the other side of a pickle the same
+        import pickle
+        other=pickle.loads(pickle.dumps(fs))
+        assert (other.latency,other.bandwidth)==(0.01,1e6)
+
+
+class BenchmarkTest(unittest.TestCase):
+    """
+    Test the benchmark suite
+    """
+
+    def testCompare(self):
+        """
+        Only benchmarks that got slower by more than the threshold
+        are regressions
+        """
+        from ezFs.benchmark import compare
+        def results(**medians:float)->typing.Dict[str,typing.Any]:
+            return {'results':{name:{'median':median}
+                for name,median in medians.items()}}
+        baseline=results(same=1.0,slower=1.0,faster=1.0,zero=0.0)
+        current=results(same=1.05,slower=1.5,faster=0.5,zero=1.0,new=1.0)
+        assert compare(baseline,current,0.1,False)==['slower']
+        assert compare(baseline,current,0.01,False)==['same','slower']
+
+    def testOnly(self):
+        """
+        Only the fixtures for the benchmarks being run are built
+        """
+        from ezFs.benchmark import BenchmarkSuite
+        suite=BenchmarkSuite(scales=[(2,3)],repeat=1)
+        built=[]
+        makeFs=suite.makeFs
+        def countingMakeFs():
+            built.append(1)
+            return makeFs()
+        suite.makeFs=countingMakeFs # type: ignore
+        results=suite.run('get[',False)
+        assert list(results['results'])==['get[depth=2,width=3]']
+        assert results['results']['get[depth=2,width=3]']['runs']==1
+        assert len(built)==1
+
+
+class BlockCacheTest(unittest.TestCase):
+    """
+    Test caching ranged reads
+    """
+
+    def testRandomReads(self):
+        """
+        Small reads share round trips and writes are never stale
+        """
+        import random
+        from ezFs.latencyFs import EzFsLatencyFilesystem
+        fs=EzFsLatencyFilesystem()
+        data=random.Random(1).randbytes(1<<20)
+        fs.get('/big.bin').write(data)
+        fs.resetCounters()
+        item=fs.get('/big.bin')
+        rand=random.Random(2)
+        for _ in range(500):
+            offset=rand.randrange(len(data))
+            numBytes=rand.randrange(100000)
+            assert item.readRange(offset,numBytes)==data[offset:offset+numBytes] # noqa: E501 # pylint: disable=line-too-long
+        assert fs.calls['readRange']<=len(data)//ezFs.BlockCache.shared().blockSize # noqa: E501 # pylint: disable=line-too-long
+        with fs.open('/big.bin','r') as f:
+            f.seek(1000)
+            assert f.read(100)+f.read(50)==data[1000:1150]
+            assert f.tell()==1150
+        item.writeRange(0,b'changed')
+        assert item.readRange(0,10)==b'changed'+data[7:10]
+        item.write(b'short')
+        assert item.readRange(0,100)==b'short'
+
+    def testSameUrls(self):
+        """
+        Files with the same url on different filesystems are cached
+        separately, and forgotten along with their filesystem
+        """
+        import gc
+        from ezFs.latencyFs import EzFsLatencyFilesystem
+        first=EzFsLatencyFilesystem()
+        second=EzFsLatencyFilesystem()
+        first.get('/same.bin').write(b'1'*1000)
+        second.get('/same.bin').write(b'2'*1000)
+        assert first.get('/same.bin').readRange(0,10)==b'1'*10
+        assert second.get('/same.bin').readRange(0,10)==b'2'*10
+        firstId=id(first)
+        del first
+        gc.collect()
+        cache=ezFs.BlockCache.shared()
+        cache.clear()
+        assert firstId not in cache._filesystems # pylint: disable=protected-access
+
+    def testReadRanges(self):
+        """
+        Several ranges come back as views, in one request if possible
+        """
+        import random
+        from ezFs.latencyFs import EzFsLatencyFilesystem
+        data=random.Random(1).randbytes(1<<20)
+        for fs in (ezFs.EzFsMemoryFilesystem(volume=None),EzFsLatencyFilesystem()): # noqa: E501 # pylint: disable=line-too-long
+            fs.get('/big.bin').write(data)
+            item=fs.get('/big.bin')
+            ranges=[(900000,200000),(10,5),(500000,100),(0,20),(500050,100)]
+            views=item.readRanges(ranges)
+            for (offset,numBytes),view in zip(ranges,views):
+                assert isinstance(view,memoryview)
+                assert view==data[offset:offset+numBytes]
+        assert fs.calls['readRanges']==1
+
+    def testReadAhead(self):
+        """
+        Sequential reads prefetch ever bigger windows, random ones don't
+        """
+        import random
+        from ezFs.latencyFs import EzFsLatencyFilesystem
+        ezFs.BlockCache.shared().clear()
+        prefetcher=ezFs.Prefetcher.shared()
+        fs=EzFsLatencyFilesystem()
+        data=random.Random(1).randbytes(4<<20)
+        fs.get('/big.bin').write(data)
+        chunks=[]
+        before=prefetcher.prefetches
+        with fs.open('/big.bin','rb') as f:
+            while True:
+                chunk=f.read(64*1024)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        assert b''.join(chunks)==data
+        assert prefetcher.prefetches>before
+        assert fs.calls['readRange']<len(chunks)//4
+        ezFs.BlockCache.shared().clear()
+        before=prefetcher.prefetches
+        rand=random.Random(2)
+        with fs.open('/big.bin','rb') as f:
+            for _ in range(50):
+                offset=rand.randrange(len(data))
+                f.seek(offset)
+                assert f.read(100)==data[offset:offset+100]
+        assert prefetcher.prefetches==before
+
+
+class WriteBufferTest(unittest.TestCase):
+    """
+    Test write-behind buffering
+    """
+
+    def testAppends(self):
+        """
+        Small appends and writelines become a few backend writes
+        """
+        from ezFs.latencyFs import EzFsLatencyFilesystem
+        fs=EzFsLatencyFilesystem()
+        expected=''.join(f'line {i}\n' for i in range(10000)).encode('ascii') # noqa: E501 # pylint: disable=line-too-long
+        with fs.open('/log.txt','a') as f:
+            for i in range(10000):
+                f.append(f'line {i}\n')
+        assert fs.calls['write']<=len(expected)//ezFs.EzFsFile.WRITE_BUFFER_SIZE+1 # noqa: E501 # pylint: disable=line-too-long
+        assert fs.get('/log.txt').read()==expected
+        fs.resetCounters()
+        fs.get('/lines.txt').writelines(f'line {i}' for i in range(10000))
+        assert fs.calls['write']<=len(expected)//ezFs.EzFsFile.WRITE_BUFFER_SIZE+1 # noqa: E501 # pylint: disable=line-too-long
+        assert fs.get('/lines.txt').read()+b'\n'==expected
+        with fs.open('/position.bin','w') as f:
+            f.write(b'abc')
+            assert f.tell()==3
+            f.write(b'def')
+            f.seek(1)
+            f.write(b'X')
+        assert fs.get('/position.bin').read()==b'aXcdef'
+
+
+class DiskCacheTest(unittest.TestCase):
+    """
+    Test the local disk cache tier
+    """
+
+    def testCaching(self):
+        """
+        Files are fetched once, revalidated, and evicted oldest first
+        """
+        import mmap
+        import tempfile
+        import time
+        from ezFs.latencyFs import EzFsLatencyFilesystem
+        remote=EzFsLatencyFilesystem()
+        for name in ('a','b','c'):
+            remote.get(f'/{name}.bin').write(name.encode('ascii')*1000)
+        with tempfile.TemporaryDirectory() as directory:
+            fs=ezFs.EzFsCachingFilesystem(remote,directory,maxBytes=2500,
+                revalidate=0)
+            with fs.open('/a.bin','rb') as f:
+                with mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ) as m:
+                    assert m[:]==b'a'*1000
+            remote.resetCounters()
+            assert fs.get('/a.bin').read()==b'a'*1000
+            assert remote.bytesTransferred==0
+            # another process sharing the directory sees the same cache
+            other=ezFs.EzFsCachingFilesystem(remote,directory,
+                maxBytes=2500,revalidate=None)
+            assert other.get('/a.bin').read(1)==b'a'
+            assert (other.cache.hits,other.cache.misses)==(1,0)
+            time.sleep(0.01)
+            remote.get('/a.bin').write(b'A'*1000)
+            assert fs.get('/a.bin').read()==b'A'*1000
+            fs.get('/b.bin').read()
+            fs.get('/c.bin').read()
+            assert len(fs.cache)==2 and fs.cache.usedBytes<=2500
+            remote.resetCounters()
+            fs.get('/b.bin').read()
+            assert remote.bytesTransferred==0
+            fs.get('/c.bin').write(b'written')
+            assert remote.get('/c.bin').read()==b'written'
+            assert fs.get('/c.bin').read()==b'written'
+            fs.cache.close()
+            other.cache.close()
+
+
+class CompressionTest(unittest.TestCase):
+    """
+    Test transparent compression in open()
+    """
+
+    def testRoundTrip(self):
+        """
+        Each codec reads back what was written, in parallel too
+        """
+        import gzip
+        fs=ezFs.EzFsMemoryFilesystem(volume=None)
+        lines=[f'line {i}\n' for i in range(50000)]
+        for name in ('/log.gz','/log.xz','/log.bz2'):
+            with fs.open(name,'wt',compression='infer') as f:
+                f.writelines(lines)
+            with fs.open(name,'rt',compression='infer') as f:
+                assert list(f)==lines
+        with ezFs.openCompressed(fs.get('/parallel.gz'),'wb','gzip',
+            workers=4) as f:
+            f.write(''.join(lines).encode('ascii'))
+        data=fs.get('/parallel.gz').read()
+        assert gzip.decompress(data)==''.join(lines).encode('ascii')
+        with self.assertRaises(ValueError):
+            fs.open('/log.zst','rb',compression='zstd')
+
+    def testGzipSeek(self):
+        """
+        Seeking a gzip file restarts from the nearest checkpoint
+        """
+        import gzip
+        import random
+        data=random.Random(0).randbytes(200000)
+        payload=gzip.compress(data[:100000])+gzip.compress(data[100000:])
+        raw=ezFs.GzipReader(io.BytesIO(payload),checkpointInterval=32*1024)
+        with io.BufferedReader(raw) as f:
+            f.read()
+            assert len(raw._checkpoints)>2 # pylint: disable=protected-access
+            for offset in (150000,10,99990,199999,50000):
+                f.seek(offset)
+                assert f.read(20)==data[offset:offset+20]
+        # checkpoints are spaced out rather than piling up
+        raw=ezFs.GzipReader(io.BytesIO(payload),checkpointInterval=512)
+        with io.BufferedReader(raw) as f:
+            f.read()
+            assert len(raw._checkpoints)<=ezFs.compression.MAX_CHECKPOINTS # pylint: disable=protected-access
+            f.seek(123456)
+            assert f.read(20)==data[123456:123476]
+        # and compressed files cannot be read and written at once
+        fs=ezFs.EzFsMemoryFilesystem(volume=None)
+        fs.get('/data.gz').write(gzip.compress(b'data'))
+        for mode in ('r+','rb+','rw'):
+            with self.assertRaises(ValueError):
+                fs.open('/data.gz',mode,'gzip')
+        assert gzip.decompress(fs.get('/data.gz').read())==b'data'
+
+
+class TextStreamTest(unittest.TestCase):
+    """
+    Test incremental text decoding
+    """
+
+    def testLines(self):
+        """
+        Characters and line endings cut by chunk boundaries come out whole
+        """
+        fs=ezFs.EzFsMemoryFilesystem(volume=None)
+        text='caf\u00e9\r\n\u20ac5\r\rx\U0001f600\n'*100
+        fs.get('/utf16.txt').write(text.encode('utf-16'))
+        for newline in (None,'','\r\n'):
+            expected=list(io.TextIOWrapper(io.BytesIO(text.encode('utf-16')),
+                'utf-16',newline=newline))
+            item=fs.get('/utf16.txt')
+            assert list(item.iterLines('utf-16',newline=newline,
+                chunkSize=3))==expected
+            with item.openText('utf-16',newline=newline) as f:
+                assert list(f)==expected
+        pieces=list(fs.get('/utf16.txt').iterLines('utf-16',chunkSize=5,
+            maxLineLength=4))
+        assert max(len(piece) for piece in pieces)==4
+        assert ''.join(pieces)==text.replace('\r\n','\n').replace('\r','\n') # noqa: E501 # pylint: disable=line-too-long
+
+
+class ThreadSafeTest(unittest.TestCase):
+    """
+    Test sharing one filesystem between threads
+    """
+
+    def testSharedFilesystem(self):
+        """
+        Each thread gets its own working directory and file positions
+        """
+        import concurrent.futures
+        fs=ezFs.EzFsMemoryFilesystem(volume=None)
+        fs.THREAD_SAFE=True
+        data=bytes(range(256))*1000
+        fs.get('/data.bin').write(data)
+        for name in ('a','b'):
+            fs.mkdir(name)
+            fs.get(f'/{name}/name.txt').write(name.encode('ascii'))
+        def work(i:int)->None:
+            name='ab'[i%2]
+            fs.resetWorkingDirectory()
+            assert fs.cwd.url==fs.get('/').url
+            fs.cd(f'/{name}')
+            with fs.open('/data.bin','rb') as f:
+                for offset in range(i,len(data),25000):
+                    f.seek(offset)
+                    assert f.read(100)==data[offset:offset+100]
+            with fs.open('name.txt','rb') as f:
+                assert f.read()==name.encode('ascii')
+            with fs.open('/log.txt','a') as f:
+                f.write(b'%d\n'%i)
+        with concurrent.futures.ThreadPoolExecutor(8) as pool:
+            list(pool.map(work,range(16)))
+        assert fs.cwd.url==fs.get('/').url
+        logged=sorted(int(line) for line in fs.get('/log.txt').read().split())
+        assert logged==list(range(16))
+        with self.assertRaises(ValueError):
+            fs.cwd.open('/data.bin') # (the default is 'rw')
+
+
+class ProcessTest(unittest.TestCase):
+    """
+    Test using items from other processes
+    """
+
+    def testPickling(self):
+        """
+        Items pickle small, and share a pooled filesystem when unpickled
+        """
+        import pickle
+        from ezFs.latencyFs import EzFsLatencyFilesystem
+        fs=EzFsLatencyFilesystem(latency=0.001,volume='pickling')
+        for i in range(100):
+            fs.get(f'/file{i}.txt').write(b'x'*i)
+        items=list(fs.get('/').children)
+        data=pickle.dumps(items)
+        assert len(data)<len(items)*100
+        unpickled=pickle.loads(data)
+        assert unpickled==items
+        assert unpickled[0].filesystem is unpickled[-1].filesystem
+        assert unpickled[0].filesystem.latency==0.001
+        assert unpickled[5].read()==items[5].read()
+        assert pickle.loads(data)[0].filesystem is unpickled[0].filesystem
+        # private volumes are never mixed up with each other
+        first=ezFs.EzFsMemoryFilesystem(volume=None)
+        second=ezFs.EzFsMemoryFilesystem(volume=None)
+        first.get('/a.txt').write('a')
+        a,root=pickle.loads(pickle.dumps([first.get('/a.txt'),second.get('/')])) # noqa: E501 # pylint: disable=line-too-long
+        assert a.filesystem is not root.filesystem
+        assert pickle.loads(pickle.dumps(second)) is not root.filesystem
+
+    @unittest.skipUnless(hasattr(os,'fork'),'needs os.fork()')
+    def testFork(self):
+        """
+        A forked child gets its own cached file positions and caches
+        """
+        import tempfile
+        fs=ezFs.EzFsMemoryFilesystem(volume=None)
+        fs.get('/data.bin').write(b'0123456789')
+        with tempfile.TemporaryDirectory() as directory:
+            cached=ezFs.EzFsCachingFilesystem(fs.get('/'),directory)
+            with cached.open('/data.bin','rb') as f:
+                assert f.read(2)==b'01'
+                ezFs.BlockCache.shared()
+                readFd,writeFd=os.pipe()
+                pid=os.fork()
+                if pid==0:
+                    try:
+                        ok=f.read(2)==b'23' and len(cached.cache)==1 \
+                            and ezFs.BlockCache._shared is None # pylint: disable=protected-access # noqa: E501
+                        os.write(writeFd,b'y' if ok else b'n')
+                    finally:
+                        os._exit(0) # pylint: disable=protected-access
+                os.close(writeFd)
+                assert os.read(readFd,1)==b'y'
+                os.close(readFd)
+                os.waitpid(pid,0)
+                assert f.read(2)==b'23'
+            cached.cache.close()
+
+
+class DispatcherTest(unittest.TestCase):
+    """
+    Test debounced event delivery
+    """
+
+    def setUp(self):
+        """
+        Set up the test
+        """
+        self.dispatcher=ezFs.EventDispatcher(maxQueued=3)
+        self.batches:typing.List[typing.List[ezFs.ChangeEvent]]=[]
+
+    def tearDown(self):
+        """
+        Clean up after the test
+        """
+        self.dispatcher.close()
+
+    def watchFn(self,_,events):
+        """
+        record what was delivered
+        """
+        self.batches.append(events)
+
+    def testCoalesce(self):
+        """
+        A burst of events is merged into one batch
+        """
+        ChangeEvent=ezFs.ChangeEvent
+        self.dispatcher.submit(self,self.watchFn,True,[
+            ChangeEvent('created','mem:///a',False),
+            ChangeEvent('modified','mem:///a',False),
+            ChangeEvent('created','mem:///tmp',False),
+            ChangeEvent('moved','mem:///b',False,'mem:///a')],0.05)
+        self.dispatcher.submit(self,self.watchFn,True,[
+            ChangeEvent('deleted','mem:///tmp',False)],0.05)
+        assert self.dispatcher.flush(5)
+        assert self.batches==[[ChangeEvent('created','mem:///a',False),
+            ChangeEvent('moved','mem:///b',False,'mem:///a')]]
+
+    def testCancel(self):
+        """
+        Nothing is delivered to a watcher after it is cancelled
+        """
+        self.dispatcher.submit(self,self.watchFn,True,[
+            ezFs.ChangeEvent('created','mem:///a',False)],0.2)
+        self.dispatcher.cancel(self,self.watchFn)
+        assert self.dispatcher.queued==0
+        assert self.dispatcher.flush(5)
+        assert self.batches==[]
+
+    def testOverflow(self):
+        """
+        Too many events collapse into one for the whole item
+        """
+        self.url='mem:///dir/' # pylint: disable=attribute-defined-outside-init
+        self.dispatcher.submit(self,self.watchFn,True,[
+            ezFs.ChangeEvent('created',f'mem:///dir/{i}',False)
+            for i in range(10)],0.05)
+        assert self.dispatcher.flush(5)
+        assert self.batches==[[ezFs.ChangeEvent('modified',self.url,True)]]
+        assert self.dispatcher.collapsed==1
+
+
+class _LocalItem(ezFs.PollingItem):
+    """
+    Just enough of a local item to watch
+    """
+
+    def __init__(self,localPath:str):
+        """ """
+        ezFs.PollingItem.__init__(self)
+        self.localPath=localPath
+        self.url='file://'+localPath+'/'
+        self.polls=0
+
+    def poll(self)->bool:
+        self.polls+=1
+        return False
+
+
+@unittest.skipUnless(ezFs.canNotify(__HERE__),'no inotify here')
+class InotifyTest(unittest.TestCase):
+    """
+    Test kernel-pushed watches
+    """
+
+    def testEvents(self):
+        """
+        Changes are pushed to the watcher without polling
+        """
+        import tempfile
+        import threading
+        import time
+        received:typing.List[ezFs.ChangeEvent]=[]
+        changed=threading.Event()
+        def watchFn(_,events):
+            received.extend(events)
+            changed.set()
+        with tempfile.TemporaryDirectory() as directory:
+            item=_LocalItem(directory)
+            item.addWatch(watchFn,withEvents=True)
+            try:
+                assert item.polls==0
+                os.mkdir(os.path.join(directory,'sub'))
+                time.sleep(0.1) # (so the new directory gets watched)
+                with open(os.path.join(directory,'sub','a.txt'),'w') as f:
+                    f.write('x')
+                os.rename(os.path.join(directory,'sub','a.txt'),
+                    os.path.join(directory,'b.txt'))
+                deadline=time.time()+5
+                while time.time()<deadline:
+                    if any(e.kind=='moved' for e in received):
+                        break
+                    changed.wait(0.1)
+                    changed.clear()
+            finally:
+                item.removeWatch(watchFn)
+            url=item.url
+            assert ezFs.ChangeEvent('created',url+'sub/',True) in received
+            assert ezFs.ChangeEvent('created',url+'sub/a.txt',False) in received
+            assert ezFs.ChangeEvent('moved',url+'b.txt',False,
+                url+'sub/a.txt') in received
+            assert item.polls==0
+            assert not ezFs.InotifyWatcher.shared().isWatching(item)
+
+    def testMovedDirectory(self):
+        """
+        Events under a directory that was moved use its new path, and
+        a directory moved away is no longer watched
+        """
+        import tempfile
+        import threading
+        import time
+        received:typing.List[ezFs.ChangeEvent]=[]
+        changed=threading.Event()
+        def watchFn(_,events):
+            received.extend(events)
+            changed.set()
+        def waitFor(event:ezFs.ChangeEvent)->bool:
+            deadline=time.time()+5
+            while event not in received and time.time()<deadline:
+                changed.wait(0.1)
+                changed.clear()
+            return event in received
+        with tempfile.TemporaryDirectory() as directory, \
+            tempfile.TemporaryDirectory() as outside:
+            item=_LocalItem(directory)
+            item.addWatch(watchFn,withEvents=True)
+            url=item.url
+            watcher=ezFs.InotifyWatcher.shared()
+            try:
+                os.mkdir(os.path.join(directory,'sub'))
+                assert waitFor(ezFs.ChangeEvent('created',url+'sub/',True))
+                os.rename(os.path.join(directory,'sub'),
+                    os.path.join(directory,'renamed'))
+                assert waitFor(ezFs.ChangeEvent('moved',url+'renamed/',True,
+                    url+'sub/'))
+                with open(os.path.join(directory,'renamed','a.txt'),'w') as f:
+                    f.write('x')
+                assert waitFor(ezFs.ChangeEvent('created',url+'renamed/a.txt',False)) # noqa: E501 # pylint: disable=line-too-long
+                os.rename(os.path.join(directory,'renamed'),
+                    os.path.join(outside,'gone'))
+                assert waitFor(ezFs.ChangeEvent('deleted',url+'renamed/',True))
+                with watcher._lock: # pylint: disable=protected-access
+                    paths=list(watcher._wds) # pylint: disable=protected-access
+                assert paths==[os.path.abspath(directory)]
+            finally:
+                item.removeWatch(watchFn)
+
+
 def testSuite():
     """
     Combine unit tests into an entire suite
     """
     testSuite = unittest.TestSuite()
     testSuite.addTest(Test("testName"))
+    testSuite.addTest(MemoryFsTest("testReadWrite"))
+    testSuite.addTest(MemoryFsTest("testMove"))
+    testSuite.addTest(MemoryFsTest("testGetAll"))
+    testSuite.addTest(MemoryFsTest("testPaging"))
+    testSuite.addTest(MemoryFsTest("testPrefix"))
+    testSuite.addTest(MemoryFsTest("testSlots"))
+    testSuite.addTest(MemoryFsTest("testReadBack"))
+    testSuite.addTest(MemoryFsTest("testFind"))
+    testSuite.addTest(MemoryFsTest("testWatchEvents"))
+    testSuite.addTest(MemoryFsTest("testEviction"))
+    testSuite.addTest(MountTest("testGet"))
+    testSuite.addTest(MountTest("testListing"))
+    testSuite.addTest(MountTest("testUnmount"))
+    testSuite.addTest(MetricsTest("testSnapshot"))
+    testSuite.addTest(MetricsTest("testMeasuring"))
+    testSuite.addTest(CatalogTest("testQueries"))
+    testSuite.addTest(CatalogTest("testPruneSiblings"))
+    testSuite.addTest(CatalogTest("testRefresh"))
+    testSuite.addTest(HashTest("testHashMany"))
+    testSuite.addTest(HashTest("testHashOpenFile"))
+    testSuite.addTest(DuplicatesTest("testFindDuplicates"))
+    testSuite.addTest(SyncTest("testSync"))
+    testSuite.addTest(SyncTest("testChanges"))
+    testSuite.addTest(BlockCacheTest("testRandomReads"))
+    testSuite.addTest(BlockCacheTest("testSameUrls"))
+    testSuite.addTest(BlockCacheTest("testReadRanges"))
+    testSuite.addTest(BlockCacheTest("testReadAhead"))
+    testSuite.addTest(WriteBufferTest("testAppends"))
+    testSuite.addTest(DiskCacheTest("testCaching"))
+    testSuite.addTest(CompressionTest("testRoundTrip"))
+    testSuite.addTest(CompressionTest("testGzipSeek"))
+    testSuite.addTest(TextStreamTest("testLines"))
+    testSuite.addTest(ThreadSafeTest("testSharedFilesystem"))
+    testSuite.addTest(ProcessTest("testPickling"))
+    testSuite.addTest(ProcessTest("testFork"))
+    testSuite.addTest(CmdlineTest("testProgress"))
+    testSuite.addTest(CmdlineTest("testDiskUsage"))
+    testSuite.addTest(CmdlineTest("testCopy"))
+    testSuite.addTest(CmdlineTest("testCmdline"))
+    testSuite.addTest(CmdlineTest("testCmdlineFails"))
+    testSuite.addTest(LatencyFsTest("testDelay"))
+    testSuite.addTest(BenchmarkTest("testCompare"))
+    testSuite.addTest(BenchmarkTest("testOnly"))
+    testSuite.addTest(DispatcherTest("testCoalesce"))
+    testSuite.addTest(DispatcherTest("testCancel"))
+    testSuite.addTest(DispatcherTest("testOverflow"))
+    testSuite.addTest(InotifyTest("testEvents"))
+    testSuite.addTest(InotifyTest("testMovedDirectory"))
     return testSuite
 
 
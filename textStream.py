@@ -0,0 +1,121 @@
+#!/usr/bin/env
+# -*- coding: utf-8 -*-
+"""
+Decoding huge files as text, a chunk at a time
+
+EzFsFile.read(encoding=...) decodes everything at once, which is no
+good for a file bigger than memory.  Instead, these decode a stream
+of byte chunks with an incremental decoder, so that a character cut
+in two by a chunk boundary (or a '\\r\\n' cut in two) comes out whole,
+and only about one chunk is ever held at a time.
+
+(See EzFsFile.iterText(), iterLines() and openText())
+"""
+import typing
+import re
+import io
+import codecs
+
+
+# how many bytes to read and decode at a time
+TEXT_CHUNK_SIZE=1<<20
+
+# newline:what a line ends with when reading
+_LINE_ENDS:typing.Dict[typing.Optional[str],typing.Pattern]={
+    None:re.compile('\n'),
+    '':re.compile('\r\n|\r|\n'),
+    '\n':re.compile('\n'),
+    '\r':re.compile('\r'),
+    '\r\n':re.compile('\r\n')}
+
+
+def decodeChunks(chunks:typing.Iterable[bytes],
+    encoding:str='utf-8',
+    errors:str='ignore',
+    newline:typing.Optional[str]=None
+    )->typing.Iterator[str]:
+    """
+    decode a stream of byte chunks into a stream of text chunks
+
+    Each text chunk is no more characters than its byte chunk was
+    bytes (give or take a character held back from the one before).
+
+    :param newline: the same as for open(): None=any line ending
+        becomes '\\n', ''=any line ending is left alone, otherwise
+        only that line ending counts and is left alone
+    """
+    if newline not in _LINE_ENDS:
+        raise ValueError(f'illegal newline value: {newline!r}')
+    decoder=codecs.getincrementaldecoder(encoding)(errors)
+    if newline is None or newline=='':
+        # (this holds back a trailing '\r' in case a '\n' comes next)
+        decoder=io.IncrementalNewlineDecoder(decoder,newline is None)
+    for chunk in chunks:
+        text=decoder.decode(chunk)
+        if text:
+            yield text
+    text=decoder.decode(b'',True)
+    if text:
+        yield text
+
+
+def splitLines(texts:typing.Iterable[str],
+    newline:typing.Optional[str]=None,
+    maxLineLength:typing.Optional[int]=None
+    )->typing.Iterator[str]:
+    """
+    split a stream of text chunks (eg from decodeChunks()) into lines,
+    each keeping its line ending
+
+    :param newline: what the text chunks were decoded with
+    :param maxLineLength: cut lines longer than this into pieces,
+        so that a file with no line endings cannot use up all memory
+    """
+    lineEnd=_LINE_ENDS[newline]
+    partial:typing.List[str]=[]
+    partialLength=0
+    for text in texts:
+        if newline=='\r\n' and partial and text \
+            and partial[-1][-1]=='\r' and text[0]=='\n':
+            # a '\r\n' cut in two by the chunk boundary
+            partial[-1]=partial[-1][:-1]
+            text='\r'+text
+        start=0
+        for match in lineEnd.finditer(text):
+            end=match.end()
+            if partial:
+                partial.append(text[start:end])
+                line=''.join(partial)
+                partial=[]
+                partialLength=0
+            else:
+                line=text[start:end]
+            yield from _cut(line,maxLineLength)
+            start=end
+        if start<len(text):
+            partial.append(text[start:])
+            partialLength+=len(text)-start
+            if maxLineLength is not None and partialLength>=maxLineLength:
+                rest=''.join(partial)
+                cut=len(rest)-len(rest)%maxLineLength
+                if newline=='\r\n' and cut==len(rest) and rest[-1]=='\r':
+                    cut-=maxLineLength # (might be half a '\r\n')
+                yield from _cut(rest[:cut],maxLineLength)
+                partial=[rest[cut:]] if cut<len(rest) else []
+                partialLength=len(rest)-cut
+    if partial:
+        yield from _cut(''.join(partial),maxLineLength)
+
+
+def _cut(line:str,
+    maxLineLength:typing.Optional[int]
+    )->typing.Iterator[str]:
+    """
+    cut a line into pieces no longer than maxLineLength
+    """
+    if maxLineLength is None or len(line)<=maxLineLength:
+        if line:
+            yield line
+        return
+    for start in range(0,len(line),maxLineLength):
+        yield line[start:start+maxLineLength]
@@ -3,7 +3,7 @@
 """
 ezFS base classes
 """
-#import typing
+import typing
 import ezFs
 
 
@@ -27,3 +27,13 @@ def printTree(treeItem:ezFs.EzFsItem)->None:
             ret.append(_treeStr(c,indent+'  |'))
         return ('\n'+indent+'- ').join(ret)
     print(_treeStr(treeItem))
+
+
+def childUrl(parentUrl:typing.Any,name:str)->str:
+    """
+    get the url string of something named `name` inside of a directory
+    """
+    base=str(parentUrl)
+    if not base.endswith(PATH_SEP):
+        base+=PATH_SEP
+    return base+name